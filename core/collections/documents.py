@@ -3,6 +3,7 @@ from django_elasticsearch_dsl.registries import registry
 from pydash import get
 
 from core.collections.models import Collection
+from core.common.search import get_ngram_subfields
 from core.common.utils import jsonify_safe
 
 
@@ -12,6 +13,7 @@ class CollectionDocument(Document):
         name = 'collections'
         settings = {'number_of_shards': 1, 'number_of_replicas': 0}
 
+    db_id = fields.KeywordField(attr='id')
     last_update = fields.DateField(attr='updated_at')
     public_can_view = fields.TextField(attr='public_can_view')
     locale = fields.ListField(fields.KeywordField())
@@ -20,9 +22,9 @@ class CollectionDocument(Document):
     collection_type = fields.KeywordField(attr='collection_type', normalizer='lowercase')
     is_active = fields.KeywordField(attr='is_active')
     version = fields.KeywordField(attr='version')
-    name = fields.KeywordField(attr='name', normalizer='lowercase')
+    name = fields.KeywordField(attr='name', normalizer='lowercase', fields=get_ngram_subfields())
     canonical_url = fields.KeywordField(attr='canonical_url', normalizer='lowercase')
-    mnemonic = fields.KeywordField(attr='mnemonic', normalizer='lowercase')
+    mnemonic = fields.KeywordField(attr='mnemonic', normalizer='lowercase', fields=get_ngram_subfields())
     extras = fields.ObjectField()
     identifier = fields.ObjectField()
     publisher = fields.KeywordField(attr='publisher', normalizer='lowercase')
@@ -9,6 +9,8 @@ class CollectionSearch(CommonSearch):
     doc_types = [Collection]
     fields = ['collection_type', 'locale', 'owner', 'owner_type', 'is_active', 'version']
 
+    ngram_fields = ['name', 'mnemonic']
+
     facets = {
         'collectionType': TermsFacet(field='collection_type'),
         'locale': TermsFacet(field='locale'),
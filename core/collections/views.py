@@ -42,7 +42,8 @@ from core.common.permissions import (
     CanViewConceptDictionaryVersion
 )
 from core.common.swagger_parameters import q_param, compress_header, page_param, verbose_param, exact_match_param, \
-    include_facets_header, sort_asc_param, sort_desc_param, updated_since_param, include_retired_param, limit_param
+    include_facets_header, sort_asc_param, sort_desc_param, updated_since_param, include_retired_param, limit_param, \
+    cursor_param
 from core.common.tasks import add_references, export_collection
 from core.common.utils import compact_dict_by_values, parse_boolean_query_param
 from core.common.views import BaseAPIView, BaseLogoView
@@ -123,8 +124,8 @@ class CollectionListView(CollectionBaseView, ConceptDictionaryCreateMixin, ListW
     is_searchable = True
     es_fields = {
         'collection_type': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
-        'mnemonic': {'sortable': True, 'filterable': True, 'exact': True},
-        'name': {'sortable': True, 'filterable': True, 'exact': True},
+        'mnemonic': {'sortable': True, 'filterable': True, 'exact': True, 'ngram': True},
+        'name': {'sortable': True, 'filterable': True, 'exact': True, 'ngram': True},
         'last_update': {'sortable': True, 'filterable': False, 'default': 'desc'},
         'locale': {'sortable': False, 'filterable': True, 'facet': True},
         'owner': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
@@ -147,7 +148,7 @@ class CollectionListView(CollectionBaseView, ConceptDictionaryCreateMixin, ListW
     @swagger_auto_schema(
         manual_parameters=[
             q_param, limit_param, sort_desc_param, sort_asc_param, exact_match_param, page_param, verbose_param,
-            include_retired_param, updated_since_param, include_facets_header, compress_header
+            include_retired_param, updated_since_param, include_facets_header, compress_header, cursor_param
         ]
     )
     def get(self, request, *args, **kwargs):
@@ -583,10 +584,12 @@ class CollectionVersionExportView(ConceptContainerExportMixin, CollectionVersion
     permission_classes = (CanViewConceptDictionary,)
     serializer_class = CollectionVersionExportSerializer
 
-    def handle_export_version(self):
+    def handle_export_version(self, base_version=None):
         version = self.get_object()
         try:
-            export_collection.apply_async((version.id, ), queue='concurrent')
+            export_collection.apply_async(
+                (version.id, base_version.id) if base_version else (version.id, ), queue='concurrent'
+            )
             return status.HTTP_202_ACCEPTED
         except AlreadyQueued:
             return status.HTTP_409_CONFLICT
@@ -17,6 +17,7 @@ SUPER_ADMIN_USER_ID = 1
 OCL_ORG_ID = 1
 VERBOSE_PARAM = 'verbose'
 UPDATED_SINCE_PARAM = 'updatedSince'
+BASE_VERSION_PARAM = 'baseVersion'
 RELEASED_PARAM = 'released'
 PROCESSING_PARAM = 'processing'
 ISO_639_1 = 'ISO 639-1'
@@ -34,6 +35,10 @@ INCLUDE_RETIRED_PARAM = 'includeRetired'
 INCLUDE_MAPPINGS_PARAM = 'includeMappings'
 INCLUDE_EXTRAS_PARAM = 'includeExtras'
 INCLUDE_INVERSE_MAPPINGS_PARAM = 'includeInverseMappings'
+MAP_TYPES_PARAM = 'mapTypes'
+DIRECTION_PARAM = 'direction'
+DEPTH_PARAM = 'depth'
+SOURCES_PARAM = 'sources'
 INCLUDE_SUBSCRIBED_ORGS = 'includeSubscribedOrgs'
 INCLUDE_CLIENT_CONFIGS = 'includeClientConfigs'
 INCLUDE_SUMMARY = 'includeSummary'
@@ -60,6 +65,27 @@ PARENT_RESOURCE_CANNOT_BE_NONE = 'Parent resource cannot be None.'
 CREATOR_CANNOT_BE_NONE = 'Creator cannot be None.'
 CANNOT_DELETE_ONLY_VERSION = 'Cannot delete only version.'
 BULK_IMPORT_QUEUES_COUNT = 4
+SEARCH_HIT_SUMMARY_FIELD = 'summary'
+CURSOR_PARAM = 'cursor'
+SEARCH_CURSOR_TIEBREAKER = dict(db_id='asc')  # keyword with doc values, sorting on _id needs fielddata
+INVALID_SEARCH_CURSOR = 'Invalid cursor.'
+ES_SYNC_QUEUE_KEY = 'es_sync_queue'
+ES_SYNC_SCHEDULED_KEY = 'es_sync_scheduled'
+ES_SYNC_PROCESSING_KEY = 'es_sync_processing'
+ES_SYNC_LOCK_KEY = 'es_sync_lock'
+ES_REBUILD_KEY_PREFIX = 'es_rebuild:'
+ES_REBUILD_CHANGES_KEY_PREFIX = 'es_rebuild_changes:'
+ES_REBUILD_TIMEOUT = 24 * 60 * 60  # seconds, a rebuild that never swapped its alias stops recording changes
+ES_SYNC_SCHEDULED_TIMEOUT = 60 * 1000  # ms, lets a new drain be scheduled if the pending one got lost
+ES_SYNC_LOCK_TIMEOUT = 10 * 60  # seconds, frees the lock of a drain whose worker died
+BACKGROUND_TASK_DETAILS_EXPIRY = 24 * 60 * 60  # seconds
+SEARCH_RESPONSE_CACHE_KEY_PREFIX = 'search_response:'
+SEARCH_GENERATION_KEY_PREFIX = 'search_generation:'
+DB_SEARCH_BACKEND = 'postgres'
+MEMBER_DOCUMENT = 'member'
+MEMBERSHIP_DOCUMENT = 'membership'
+MEMBERSHIP_FILTERS = ['source_version', 'collection_version', 'collection_owner_url']
 MAX_PINS_ALLOWED = 4
 CONFIRM_EMAIL_ADDRESS_MAIL_SUBJECT = "Confirm E-mail Address"
 PASSWORD_RESET_MAIL_SUBJECT = "Password Reset E-mail"
+EXPORT_BATCH_SIZE = 1000
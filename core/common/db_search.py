@@ -0,0 +1,193 @@
+from django.contrib.postgres.search import SearchQuery, SearchVector, TrigramSimilarity
+from django.db.models import Count, Min, Q, Case, When, Value, TextField
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Coalesce, Lower
+
+from core.orgs.constants import ORG_OBJECT_TYPE
+from core.users.constants import USER_OBJECT_TYPE
+
+FULL_TEXT_CONFIG = 'simple'
+FACET_SIZE = 10
+
+
+def get_owner_db_fields(source_lookup='parent'):
+    return dict(
+        owner=Coalesce(source_lookup + '__organization__mnemonic', source_lookup + '__user__username'),
+        owner_type=Case(
+            When(**{source_lookup + '__organization__isnull': False}, then=Value(ORG_OBJECT_TYPE)),
+            default=Value(USER_OBJECT_TYPE), output_field=TextField()
+        ),
+    )
+
+
+class DBSearch:  # pylint: disable=too-many-instance-attributes
+    """
+    Postgres alternative to the elasticsearch documents (settings.SEARCH_BACKEND), with the same es_fields semantics.
+    db_fields maps es fields to a lookup, a list of lookups (matching any of them) or an expression.
+    Search strings match filterable fields as infix (ILIKE, on pg_trgm GIN indexes) and words of
+    full_text_fields (tsvector GIN indexes), with exact_match on they match exact fields as a whole.
+    lowercase_fields are the es fields indexed with the lowercase normalizer, their facet values are lowercased too.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self, queryset, es_fields, db_fields, full_text_fields=None, search_str=None, exact_match=False,
+            faceted_filters=None, extras_criterion=None, lowercase_fields=None
+    ):
+        self.model = queryset.model
+        self.es_fields = es_fields
+        self.db_fields = db_fields
+        self.full_text_fields = full_text_fields or []
+        self.search_str = (search_str or '').replace('*', '').strip()
+        self.exact_match = exact_match
+        self.faceted_filters = faceted_filters or dict()
+        self.extras_criterion = extras_criterion
+        self.lowercase_fields = lowercase_fields or []
+        # base querysets are distinct on updated_at, which rules out ordering on anything else
+        self.queryset = self.annotate(self.model.objects.filter(id__in=queryset.values('id')))
+
+    def annotate(self, queryset):
+        expressions = {
+            self.get_annotation_name(field): lookup for field, lookup in self.db_fields.items()
+            if isinstance(lookup, Combinable)
+        }
+        return queryset.annotate(**expressions) if expressions else queryset
+
+    @staticmethod
+    def get_annotation_name(field):
+        return '_' + field
+
+    def get_lookups(self, field):
+        lookup = self.db_fields.get(field)
+        if lookup is None:
+            return []
+        if isinstance(lookup, Combinable):
+            return [self.get_annotation_name(field)]
+        if isinstance(lookup, str):
+            return [lookup]
+        return lookup
+
+    def get_lookup_criterion(self, lookup, lookup_type, value):
+        if '__' in lookup:  # joins to many rows go in a subquery, the results must not repeat rows
+            return Q(id__in=self.model.objects.filter(**{lookup + lookup_type: value}).values('id'))
+        return Q(**{lookup + lookup_type: value})
+
+    def get_fields(self, attr):
+        return [
+            field for field, config in self.es_fields.items() if config.get(attr, False) and field in self.db_fields
+        ]
+
+    def get_search_criterion(self):
+        if not self.search_str:
+            return None
+
+        criterion = Q()
+        lookup_type = '__iexact' if self.exact_match else '__icontains'
+        for field in self.get_fields('exact' if self.exact_match else 'filterable'):
+            for lookup in self.get_lookups(field):
+                criterion |= self.get_lookup_criterion(lookup, lookup_type, self.search_str)
+
+        if not self.exact_match and self.full_text_fields:
+            criterion |= Q(id__in=self.model.objects.annotate(
+                full_text=SearchVector(*self.full_text_fields, config=FULL_TEXT_CONFIG)
+            ).filter(full_text=SearchQuery(self.search_str, config=FULL_TEXT_CONFIG)).values('id'))
+
+        return criterion
+
+    def get_facet_criterion(self, field, value):
+        """Same syntax as the es facet filters: comma separated values, all negated with a leading !"""
+        is_negated = value.startswith('!')
+        criterion = Q()
+        for _value in value.replace('!', '', 1).split(','):
+            value_criterion = Q()
+            for lookup in self.get_lookups(field):
+                value_criterion |= self.get_lookup_criterion(lookup, '__iexact', _value.strip('\"').strip('\''))
+            criterion = criterion & ~value_criterion if is_negated else criterion | value_criterion
+
+        return criterion
+
+    def get_faceted_criterion(self, exclude=None):
+        criterion = Q()
+        for field, value in self.faceted_filters.items():
+            if field != exclude and field in self.db_fields:
+                criterion &= self.get_facet_criterion(field, value)
+
+        return criterion
+
+    @staticmethod
+    def get_extras_criterion(searchable_fields, exact_fields, exists_fields):
+        """searchable/exact_fields: 'extras.<path>' => value, exists_fields: keys of extras"""
+        def to_lookup(field):
+            return field.replace('.', '__')
+
+        criterion = Q()
+        for field, value in searchable_fields.items():
+            criterion &= Q(**{to_lookup(field) + '__icontains': value.replace('*', '')})
+        for field, value in exact_fields.items():
+            criterion &= Q(**{to_lookup(field): value})
+        for field in exists_fields:
+            criterion &= Q(extras__has_key=field)
+
+        return criterion
+
+    def get_matching_queryset(self):
+        """Rows matching the search string and extras filters, facet filters aside"""
+        queryset = self.queryset
+        criterion = self.get_search_criterion()
+        if criterion:
+            queryset = queryset.filter(criterion)
+        if self.extras_criterion:
+            queryset = queryset.filter(self.extras_criterion)
+
+        return queryset
+
+    def get_results(self, sort_field=None, default_sort=None):
+        queryset = self.get_matching_queryset().filter(self.get_faceted_criterion())
+
+        lookups = self.get_lookups(sort_field.lstrip('-'))[:1] if sort_field else []
+        if lookups:
+            lookup = lookups[0]
+            if '__' in lookup:  # sorting on a related table must not repeat rows
+                queryset = queryset.annotate(_sort=Min(lookup))
+                lookup = '_sort'
+            return queryset.order_by(('-' if sort_field.startswith('-') else '') + lookup, '-id')
+        if self.search_str and 'id' in self.db_fields:
+            return queryset.annotate(
+                _rank=TrigramSimilarity(self.get_lookups('id')[0], self.search_str)
+            ).order_by('-_rank', '-updated_at')
+
+        return queryset.order_by(default_sort or '-updated_at')
+
+    def get_facets(self, facet_fields):
+        """
+        facet_fields: facet name => field. Like the es post_filter aggregations, each facet counts
+        the rows matching the search and the other facets' filters.
+        """
+        queryset = self.get_matching_queryset()
+        selected_values = {
+            field: (value.lower() if field in self.lowercase_fields else value).replace('!', '', 1).split(',')
+            for field, value in self.faceted_filters.items()
+        }
+        facets = dict()
+        for name, field in facet_fields.items():
+            lookups = self.get_lookups(field)
+            if not lookups:
+                continue
+            facet_queryset = queryset.filter(self.get_faceted_criterion(exclude=field))
+            lookup = lookups[0]
+            if field in self.lowercase_fields:
+                facet_queryset = facet_queryset.annotate(_facet=Lower(lookup))
+                lookup = '_facet'
+            buckets = facet_queryset.values(lookup).annotate(
+                count=Count('id', distinct=True)
+            ).order_by('-count', lookup)[:FACET_SIZE]
+            facets[name] = [
+                (value, bucket['count'], value in selected_values.get(field, []))
+                for value, bucket in ((self.to_facet_value(bucket[lookup]), bucket) for bucket in buckets)
+                if value is not None
+            ]
+
+        return facets
+
+    @staticmethod
+    def to_facet_value(value):
+        return str(value).lower() if isinstance(value, bool) else value
@@ -0,0 +1,97 @@
+from elasticsearch_dsl import Q
+
+from core.collections.constants import COLLECTION_TYPE
+from core.common.constants import MEMBER_DOCUMENT, MEMBERSHIP_DOCUMENT
+
+
+class MembershipDocumentMixin:
+    """
+    For Concept/Mapping documents. Source and collection versions holding a member are not part of its document,
+    each (container version, member) pair is a small child document (join field `membership_join`) instead,
+    so that releasing or editing a container version does not rewrite the documents of its members.
+    """
+
+    def prepare(self, instance):
+        data = super().prepare(instance)
+        data['membership_join'] = MEMBER_DOCUMENT
+        return data
+
+    def _get_actions(self, object_list, action):
+        # memberships are (re)written with their member, new versions are added to containers while unindexed
+        for instance in object_list:
+            yield self._prepare_action(instance, action)
+            if action == 'index':
+                yield from self.get_membership_actions(self.get_memberships([instance]))
+
+    @staticmethod
+    def get_membership_id(container_type, container_id, member_id):
+        return '{}-{}-{}'.format(container_type.lower(), container_id, member_id)
+
+    @staticmethod
+    def prepare_membership(container, member_id):
+        data = dict(membership_join=dict(name=MEMBERSHIP_DOCUMENT, parent=member_id))
+        if container.model_name == COLLECTION_TYPE:
+            data.update(
+                collection=container.mnemonic, collection_version=container.version,
+                collection_owner_url=container.parent_url
+            )
+        else:
+            data.update(source=container.mnemonic, source_version=container.version)
+        return data
+
+    def get_membership_actions(self, memberships, index_name=None):
+        """memberships: (container, member_id) pairs"""
+        for container, member_id in memberships:
+            yield dict(
+                _op_type='index', _index=index_name or self._index._name,  # pylint: disable=protected-access
+                _id=self.get_membership_id(container.model_name, container.id, member_id), _routing=member_id,
+                _source=self.prepare_membership(container, member_id)
+            )
+
+    def get_membership_delete_actions(self, container_type, memberships):
+        """memberships: (container_id, member_id) pairs"""
+        for container_id, member_id in memberships:
+            yield dict(
+                _op_type='delete', _index=self._index._name,  # pylint: disable=protected-access
+                _id=self.get_membership_id(container_type, container_id, member_id), _routing=member_id
+            )
+
+    @staticmethod
+    def get_memberships(instances):
+        """From the prefetched sources and collection_set of the instances (see get_queryset)"""
+        for instance in instances:
+            for container in [*instance.sources.all(), *instance.collection_set.all()]:
+                yield container, instance.id
+
+    def delete_memberships(self, container_type, memberships):
+        return self.bulk(
+            self.get_membership_delete_actions(container_type, memberships), refresh=self.django.auto_refresh,
+            raise_on_error=False
+        )
+
+    @staticmethod
+    def get_container_memberships_criterion(container):
+        """Matches the membership documents of a source/collection version"""
+        if container.model_name == COLLECTION_TYPE:
+            return Q('bool', must=[
+                Q('match', collection=container.mnemonic), Q('match', collection_version=container.version),
+                Q('match', collection_owner_url=container.parent_url)
+            ])
+
+        # source mnemonics are unique per owner only, the owner is on the member documents
+        return Q('bool', must=[
+            Q('match', source=container.mnemonic), Q('match', source_version=container.version),
+            Q('has_parent', parent_type=MEMBER_DOCUMENT, query=Q('bool', must=[
+                Q('match', owner=container.parent_resource), Q('match', owner_type=container.parent_resource_type)
+            ]))
+        ])
+
+    @staticmethod
+    def get_member_memberships_criterion(member_id):
+        return Q('parent_id', type=MEMBERSHIP_DOCUMENT, id=member_id)
+
+    def delete_memberships_by_query(self, criteria):
+        """criteria: query dicts, see get_container_memberships_criterion and get_member_memberships_criterion"""
+        return self.search().filter('term', membership_join=MEMBERSHIP_DOCUMENT).filter(
+            Q('bool', should=[Q(criterion) for criterion in criteria], minimum_should_match=1)
+        ).params(conflicts='proceed', refresh=self.django.auto_refresh).delete()
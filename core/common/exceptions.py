@@ -3,6 +3,12 @@ from rest_framework.exceptions import APIException
 from django.utils.translation import gettext_lazy as _
 
 
+class Http400(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = _('Bad Request.')
+    default_code = 'bad_request'
+
+
 class Http409(APIException):
     status_code = status.HTTP_409_CONFLICT
     default_detail = _('Conflict.')
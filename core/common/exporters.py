@@ -0,0 +1,83 @@
+from django.db.models import Case, F, OuterRef, Subquery, When
+from pydash import get
+from rest_framework.fields import DateTimeField
+
+from core.common.utils import chunked_queryset
+from core.orgs.constants import ORG_OBJECT_TYPE
+from core.users.constants import USER_OBJECT_TYPE
+
+
+class BaseExporter:
+    """
+    Builds the export documents of a versioned source child (the JSON of its export serializer, key for key)
+    from values() rows and per batch queries, without instantiating models or serializer fields.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.datetime_field = DateTimeField()
+
+    def get_queryset(self):
+        return self.queryset.prefetch_related(None).values(
+            *self.fields, *self.get_owner_fields(), **self.get_version_annotations())
+
+    def get_batches(self, batch_size):
+        for rows in chunked_queryset(self.get_queryset(), batch_size):
+            yield self.to_representations(rows)
+
+    def to_representations(self, rows):
+        raise NotImplementedError
+
+    def get_version_annotations(self):
+        """version_url and prev_version_uri of SourceChildMixin/VersionedModel"""
+        versions = self.model.objects.filter(
+            versioned_object_id=OuterRef('versioned_object_id'), is_active=True
+        ).exclude(id=F('versioned_object_id'))
+        return dict(
+            latest_version_uri=Case(When(id=F('versioned_object_id'), then=Subquery(
+                versions.filter(is_latest_version=True).order_by('-created_at').values('uri')[:1]
+            ))),
+            previous_version_uri=Subquery(
+                versions.filter(created_at__lte=OuterRef('created_at')).exclude(
+                    id=OuterRef('id')).order_by('-created_at').values('uri')[:1]
+            ),
+        )
+
+    @staticmethod
+    def get_version_url(row):
+        """None when the versioned object has no latest version, the serializers skip the field then"""
+        if row['id'] == row['versioned_object_id']:
+            return row['latest_version_uri']
+        return row['uri']
+
+    @staticmethod
+    def get_source_fields(source_lookup):
+        return [
+            source_lookup, source_lookup + '__mnemonic', source_lookup + '__organization',
+            source_lookup + '__organization__mnemonic', source_lookup + '__organization__uri',
+            source_lookup + '__user', source_lookup + '__user__username', source_lookup + '__user__uri',
+        ]
+
+    def get_owner_fields(self):
+        return self.get_source_fields('parent')
+
+    @staticmethod
+    def get_source_owner(row, source_lookup='parent'):
+        """(mnemonic, resource_type, url) of the parent of a source (user or organization), Nones without one"""
+        if row[source_lookup + '__user']:
+            return row[source_lookup + '__user__username'], USER_OBJECT_TYPE, row[source_lookup + '__user__uri']
+        if row[source_lookup + '__organization']:
+            return (
+                row[source_lookup + '__organization__mnemonic'], ORG_OBJECT_TYPE,
+                row[source_lookup + '__organization__uri']
+            )
+        return None, None, None
+
+    def to_datetime_representation(self, value):
+        return None if value is None else self.datetime_field.to_representation(value)
+
+    @staticmethod
+    def get_ids(rows, key='id'):
+        return {row[key] for row in rows if get(row, key) is not None}
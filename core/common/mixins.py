@@ -1,6 +1,7 @@
 import logging
 from math import ceil
 
+from celery.result import AsyncResult
 from django.conf import settings
 from django.core.paginator import Paginator
 from django.db.models import Q, F
@@ -14,9 +15,9 @@ from rest_framework.mixins import ListModelMixin, CreateModelMixin
 from rest_framework.response import Response
 
 from core.common.constants import HEAD, ACCESS_TYPE_EDIT, ACCESS_TYPE_VIEW, ACCESS_TYPE_NONE, INCLUDE_FACETS, \
-    LIST_DEFAULT_LIMIT, HTTP_COMPRESS_HEADER, CSV_DEFAULT_LIMIT
+    LIST_DEFAULT_LIMIT, HTTP_COMPRESS_HEADER, CSV_DEFAULT_LIMIT, CURSOR_PARAM, BASE_VERSION_PARAM
 from core.common.permissions import HasPrivateAccess, HasOwnership, CanViewConceptDictionary
-from core.common.services import S3
+from core.common.services import S3, SearchResponseCache, RedisService
 from .utils import write_csv_to_s3, get_csv_from_s3, get_query_params_from_url_string, compact_dict_by_values
 
 logger = logging.getLogger('oclapi')
@@ -43,6 +44,8 @@ class CustomPaginator:
 
     @cached_property
     def total_count(self):
+        if isinstance(self.queryset, list):
+            return get(self, 'total') or len(self.queryset)
         return get(self, 'total') or self.queryset.count()
 
     def __get_query_params(self):
@@ -64,6 +67,16 @@ class CustomPaginator:
     def has_next(self):
         return self.page_number < self.page_count
 
+    def get_cursor_headers(self, next_cursor):
+        headers = dict(num_found=self.total_count, num_returned=len(self.current_page_results))
+        if next_cursor:
+            query_params = self.__get_query_params()
+            query_params.pop('page', None)
+            query_params[CURSOR_PARAM] = next_cursor
+            headers['next'] = self.__get_full_url() + '?' + query_params.urlencode()
+
+        return headers
+
     def has_previous(self):
         return self.page_number > 1
 
@@ -108,6 +121,12 @@ class ListWithHeadersMixin(ListModelMixin):
         if is_csv and not search_string:
             return self.get_csv(request)
 
+        cache_key = None if is_csv else self.get_response_cache_key()
+        if cache_key:
+            cached = SearchResponseCache().get(cache_key)
+            if cached:
+                return Response(cached['data'], headers=cached['headers'])
+
         if self.object_list is None:
             self.object_list = self.filter_queryset(self.get_queryset())
 
@@ -130,21 +149,26 @@ class ListWithHeadersMixin(ListModelMixin):
             paginator = CustomPaginator(
                 request=request, queryset=sorted_list, page_size=self.limit, total_count=self.total_count
             )
-            headers = paginator.headers
+            headers = paginator.get_cursor_headers(
+                self.next_search_cursor
+            ) if get(self, 'is_cursor_paginated') else paginator.headers
             results = paginator.current_page_results
 
-        result_dict = self.get_serializer(results, many=True).data
+        if get(self, 'is_search_hits_result'):
+            result_dict = list(results)
+        else:
+            result_dict = self.get_serializer(results, many=True).data
         if self.should_include_facets():
             data = dict(results=result_dict, facets=dict(fields=self.get_facets()))
         else:
             data = result_dict
 
-        response = Response(data)
-        for key, value in headers.items():
-            response[key] = value
         if not headers:
-            response['num_found'] = len(sorted_list)
-        return response
+            headers['num_found'] = len(sorted_list)
+        if cache_key:
+            SearchResponseCache().set(cache_key, data, headers)
+
+        return Response(data, headers=headers)
 
     def should_include_facets(self):
         return self.request.META.get(INCLUDE_FACETS, False) in ['true', True]
@@ -349,6 +373,10 @@ class ConceptDictionaryUpdateMixin(ConceptDictionaryMixin):
             self.object = serializer.save(**save_kwargs)
             if serializer.is_valid():
                 serializer = self.get_detail_serializer(self.object)
+                if self.object.validation_task_id:
+                    return Response(
+                        dict(**serializer.data, task=self.object.validation_task_id), status=status.HTTP_202_ACCEPTED
+                    )
                 return Response(serializer.data, status=success_status_code)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -498,6 +526,18 @@ class ConceptContainerExportMixin:
 
         return instance
 
+    def get_base_version(self, version):
+        """Version given by the baseVersion param, the export is then the delta from it"""
+        base_version = self.request.query_params.get(BASE_VERSION_PARAM)
+        if not base_version:
+            return None
+
+        instance = version.versions.filter(version=base_version).first()
+        if not instance or instance.is_head:
+            raise Http404()
+
+        return instance
+
     def get(self, request, *args, **kwargs):  # pylint: disable=unused-argument
         version = self.get_object()
         logger.debug(
@@ -506,8 +546,9 @@ class ConceptContainerExportMixin:
         if version.is_head:
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
-        if version.has_export():
-            export_url = version.get_export_url()
+        base_version = self.get_base_version(version)
+        if version.has_export(base_version):
+            export_url = version.get_export_url(base_version)
 
             no_redirect = request.query_params.get('noRedirect', False) in ['true', 'True', True]
             if no_redirect:
@@ -534,8 +575,9 @@ class ConceptContainerExportMixin:
 
         logger.debug('%s Export requested for version %s (post)', self.entity, version.version)
 
-        if not version.has_export():
-            status_code = self.handle_export_version()
+        base_version = self.get_base_version(version)
+        if not version.has_export(base_version):
+            status_code = self.handle_export_version(base_version)
             return Response(status=status_code)
 
         no_redirect = request.query_params.get('noRedirect', False) in ['true', 'True', True]
@@ -558,8 +600,9 @@ class ConceptContainerExportMixin:
         if not permitted:
             return HttpResponseForbidden()
 
-        if version.has_export():
-            S3.remove(version.export_path)
+        base_version = self.get_base_version(version)
+        if version.has_export(base_version):
+            S3.remove(version.get_export_path(base_version))
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_404_NOT_FOUND)
@@ -577,12 +620,36 @@ class ConceptContainerProcessingMixin:
 
     def get(self, request, *args, **kwargs):  # pylint: disable=unused-argument
         version = self.get_object()
+        task_id = request.query_params.get('task', None)
+        if task_id:
+            return self.get_task_response(version, task_id)
+
         logger.debug('Processing flag requested for %s version %s', self.resource, version)
 
         response = Response(status=200)
         response.content = version.is_processing
         return response
 
+    @staticmethod
+    def get_task_response(version, task_id):
+        """Progress and result of a background task of the version, from its details in redis"""
+        details = RedisService().get_formatted(task_id)
+        if not isinstance(details, dict):
+            details = None
+        if not version.has_processing(task_id) and get(details, 'url') != version.uri:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        task = AsyncResult(task_id)
+        if task.failed():
+            return Response(
+                dict(task=task_id, state=task.state, exception=str(task.result)), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            dict(task=task_id, state=task.state, details=details),
+            status=status.HTTP_200_OK if task.successful() else status.HTTP_202_ACCEPTED
+        )
+
     def post(self, request, *args, **kwargs):  # pylint: disable=unused-argument
         version = self.get_object()
         logger.debug('Processing flag clearance requested for %s version %s', self.resource, version)
@@ -1,10 +1,12 @@
+import uuid
+
 from celery.result import AsyncResult
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.postgres.fields import JSONField, ArrayField
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models, IntegrityError
+from django.db import models, IntegrityError, transaction
 from django.db.models import Value, Q
 from django.db.models.expressions import CombinedExpression, F
 from django.utils import timezone
@@ -12,7 +14,8 @@ from django_elasticsearch_dsl.registries import registry
 from django_elasticsearch_dsl.signals import RealTimeSignalProcessor
 from pydash import get, compact
 
-from core.common.services import S3
+from core.common.documents import MembershipDocumentMixin
+from core.common.services import S3, SearchResponseCache
 from core.common.utils import reverse_resource, reverse_resource_version, parse_updated_since_param, drop_version
 from core.settings import DEFAULT_LOCALE
 from core.sources.constants import CONTENT_REFERRED_PRIVATELY
@@ -21,7 +24,10 @@ from .constants import (
     ACCESS_TYPE_VIEW, ACCESS_TYPE_EDIT, SUPER_ADMIN_USER_ID,
     HEAD, PERSIST_NEW_ERROR_MESSAGE, SOURCE_PARENT_CANNOT_BE_NONE, PARENT_RESOURCE_CANNOT_BE_NONE,
     CREATOR_CANNOT_BE_NONE, CANNOT_DELETE_ONLY_VERSION)
-from .tasks import handle_save, handle_m2m_changed, seed_children
+from .tasks import (
+    queue_index_sync, handle_m2m_changed, seed_children, batch_index_resources, update_validation_schema,
+    sync_memberships, record_rebuild_changes, invalidate_search_responses, delete_memberships
+)
 
 
 class BaseModel(models.Model):
@@ -169,6 +175,11 @@ class BaseModel(models.Model):
         if not get(settings, 'TEST_MODE', False):
             cls.toggle_indexing(True)   # pragma: no cover
 
+    @classmethod
+    def batch_index(cls, instance_ids):
+        if instance_ids and settings.ES_SYNC and cls in registry.get_models():
+            batch_index_resources.delay(cls._meta.app_label, cls.__name__, list(instance_ids))
+
     @staticmethod
     def toggle_indexing(state=True):
         settings.ELASTICSEARCH_DSL_AUTO_REFRESH = state
@@ -335,6 +346,7 @@ class ConceptContainerModel(VersionedModel):
     client_configs = GenericRelation(
         'client_configs.ClientConfig', object_id_field='resource_id', content_type_field='resource_type'
     )
+    validation_task_id = None  # set by persist_changes when the concepts are validated in the background
 
     class Meta:
         abstract = True
@@ -440,6 +452,11 @@ class ConceptContainerModel(VersionedModel):
             raise ValidationError(dict(detail=CONTENT_REFERRED_PRIVATELY.format(self.mnemonic)))
 
         generic_export_path = self.generic_export_path()
+        # the versions' through rows go by cascade, which sends no m2m_changed
+        memberships_criteria = [
+            MembershipDocumentMixin.get_container_memberships_criterion(version).to_dict()
+            for version in (self.versions if self.is_head else [self])
+        ]
 
         if self.is_head:
             self.versions.exclude(id=self.id).delete()
@@ -456,6 +473,11 @@ class ConceptContainerModel(VersionedModel):
 
         super().delete(using=using, keep_parents=keep_parents)
         S3.delete_objects(generic_export_path)
+        if settings.ES_SYNC:
+            member_model_paths = sorted(
+                {model._meta.label for model in CelerySignalProcessor.get_membership_models().values()}
+            )
+            transaction.on_commit(lambda: delete_memberships.delay(member_model_paths, memberships_criteria))
 
     def get_active_concepts(self):
         return self.get_concepts_queryset().filter(is_active=True, retired=False)
@@ -553,10 +575,15 @@ class ConceptContainerModel(VersionedModel):
         if not parent_resource:
             errors['parent'] = SOURCE_PARENT_CANNOT_BE_NONE
 
+        validation_schema_to_apply = None
         if obj.is_validation_necessary():
-            failed_concept_validations = obj.validate_child_concepts() or []
-            if len(failed_concept_validations) > 0:
-                errors.update({'failed_concept_validations': failed_concept_validations})
+            if obj.num_concepts > settings.INLINE_CHILD_CONCEPTS_VALIDATION_LIMIT:
+                validation_schema_to_apply = obj.custom_validation_schema
+                obj.custom_validation_schema = obj.get_latest_version().custom_validation_schema
+            else:
+                failed_concept_validations = obj.validate_child_concepts() or []
+                if len(failed_concept_validations) > 0:
+                    errors.update({'failed_concept_validations': failed_concept_validations})
 
         try:
             obj.full_clean()
@@ -573,22 +600,31 @@ class ConceptContainerModel(VersionedModel):
         except IntegrityError as ex:
             errors.update({'__all__': ex.args})
 
+        if validation_schema_to_apply and not errors:
+            obj.validation_task_id = str(uuid.uuid4())
+            obj.add_processing(obj.validation_task_id)
+            update_validation_schema.apply_async(
+                (obj.id, validation_schema_to_apply), task_id=obj.validation_task_id
+            )
+
         return errors
 
-    def validate_child_concepts(self):
+    def validate_child_concepts(self, notify_progress=None):
         # If source is being configured to have a validation schema
         # we need to validate all concepts
         # according to the new schema
         from core.concepts.validators import ValidatorSpecifier
 
-        concepts = self.get_active_concepts()
+        concepts = self.get_active_concepts().prefetch_related('names', 'descriptions')
         failed_concept_validations = []
 
         validator = ValidatorSpecifier().with_validation_schema(
             self.custom_validation_schema
-        ).with_repo(self).with_reference_values().get()
+        ).with_repo(self).with_reference_values().with_repo_names_index().get()
 
-        for concept in concepts:
+        concepts = list(concepts)
+        total = len(concepts)
+        for processed, concept in enumerate(concepts, 1):
             try:
                 validator.validate(concept)
             except ValidationError as validation_error:
@@ -596,6 +632,8 @@ class ConceptContainerModel(VersionedModel):
                     mnemonic=concept.mnemonic, url=concept.url, errors=validation_error.message_dict
                 )
                 failed_concept_validations.append(concept_validation_error)
+            if notify_progress and (processed % 1000 == 0 or processed == total):
+                notify_progress(processed, total)
 
         return failed_concept_validations
 
@@ -626,9 +664,7 @@ class ConceptContainerModel(VersionedModel):
             else:
                 concepts = head.concepts.all()
 
-            self.concepts.set(concepts)
-            from core.concepts.documents import ConceptDocument
-            ConceptDocument().update(self.concepts.all(), parallel=True)
+            self.concepts.set(concepts)  # membership documents are indexed by the m2m_changed signal
 
     def seed_mappings(self):
         head = self.head
@@ -639,9 +675,7 @@ class ConceptContainerModel(VersionedModel):
             else:
                 mappings = head.mappings.all()
 
-            self.mappings.set(mappings)
-            from core.mappings.documents import MappingDocument
-            MappingDocument().update(self.mappings.all(), parallel=True)
+            self.mappings.set(mappings)  # membership documents are indexed by the m2m_changed signal
 
     def add_processing(self, process_id):
         if self.id:
@@ -660,6 +694,9 @@ class ConceptContainerModel(VersionedModel):
             self._background_process_ids.remove(process_id)
             self.save(update_fields=['_background_process_ids'])
 
+    def has_processing(self, process_id):
+        return process_id in compact(self._background_process_ids)
+
     @property
     def is_processing(self):
         background_ids = compact(self._background_process_ids)
@@ -688,18 +725,90 @@ class ConceptContainerModel(VersionedModel):
 
         return path
 
-    def get_export_url(self):
-        return S3.url_for(self.export_path)
+    def get_delta_export_path(self, base_version):
+        last_update = self.last_child_update.strftime('%Y%m%d%H%M%S')
+        return self.generic_export_path(suffix="delta_{}.{}.zip".format(base_version.version, last_update))
+
+    def get_export_path(self, base_version=None):
+        return self.get_delta_export_path(base_version) if base_version else self.export_path
 
-    def has_export(self):
-        return S3.exists(self.export_path)
+    def get_export_url(self, base_version=None):
+        return S3.url_for(self.get_export_path(base_version))
+
+    def has_export(self, base_version=None):
+        return S3.exists(self.get_export_path(base_version))
 
 
 class CelerySignalProcessor(RealTimeSignalProcessor):
     def handle_save(self, sender, instance, **kwargs):
         if settings.ES_SYNC and instance.__class__ in registry.get_models():
-            handle_save.delay(instance.app_name, instance.model_name, instance.id)
+            self.queue_index_sync(instance)
 
     def handle_m2m_changed(self, sender, instance, action, **kwargs):
+        if settings.ES_SYNC and sender in self.get_membership_models():
+            self.queue_membership_sync(sender, instance, action, kwargs['model'], kwargs['pk_set'])
+            return
         if settings.ES_SYNC and instance.__class__ in registry.get_models():
-            handle_m2m_changed.delay(instance.app_name, instance.model_name, instance.id, action)
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                self.queue_index_sync(instance)
+            else:
+                handle_m2m_changed.delay(instance.app_name, instance.model_name, instance.id, action)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if settings.ES_SYNC and instance.__class__ in registry.get_models():
+            for document_class in registry.get_documents([instance.__class__]):
+                record_rebuild_changes(document_class, deletes=[(document_class.generate_id(instance), None)])
+            if instance.__class__ in self.get_membership_models().values():
+                model_path = instance.__class__._meta.label
+                criteria = [MembershipDocumentMixin.get_member_memberships_criterion(instance.id).to_dict()]
+                transaction.on_commit(lambda: delete_memberships.delay([model_path], criteria))
+        super().handle_delete(sender, instance, **kwargs)
+        if SearchResponseCache.is_on() and instance.__class__ in registry.get_models():
+            invalidate_search_responses(instance.__class__, scopes=self.get_search_response_scopes(instance))
+
+    @staticmethod
+    def get_search_response_scopes(instance):
+        if isinstance(instance, ConceptContainerModel):
+            return [instance.versioned_object_url]
+        if get(instance, 'parent_id') and isinstance(instance.parent, ConceptContainerModel):
+            return [instance.parent.versioned_object_url]
+        return []
+
+    @staticmethod
+    def queue_index_sync(instance):
+        app_name, model_name, instance_id = instance.app_name, instance.model_name, instance.id
+        transaction.on_commit(lambda: queue_index_sync(app_name, model_name, [instance_id]))
+
+    @staticmethod
+    def get_membership_models():
+        from core.collections.models import Collection
+        from core.concepts.models import Concept
+        from core.mappings.models import Mapping
+        return {
+            Concept.sources.through: Concept, Mapping.sources.through: Mapping,
+            Collection.concepts.through: Concept, Collection.mappings.through: Mapping,
+        }
+
+    def queue_membership_sync(self, sender, instance, action, model, pk_set):  # pylint: disable=too-many-arguments
+        """Source/Collection versions holding a concept/mapping are indexed as membership documents"""
+        if action not in ('post_add', 'post_remove', 'pre_clear'):
+            return
+
+        member_model = self.get_membership_models()[sender]
+        is_member_instance = isinstance(instance, member_model)
+        container_model = model if is_member_instance else instance.__class__
+        if action == 'pre_clear':  # the related ids are gone after the clear
+            instance_model, related_model = (member_model, container_model) if is_member_instance else (
+                container_model, member_model)
+            pk_set = set(sender.objects.filter(**{instance_model._meta.model_name: instance.id}).values_list(
+                related_model._meta.model_name + '_id', flat=True))
+        if not pk_set:
+            return
+
+        member_ids, container_ids = ([instance.id], list(pk_set)) if is_member_instance else (
+            list(pk_set), [instance.id])
+        member_model_path, container_model_path = member_model._meta.label, container_model._meta.label
+        added = action == 'post_add'
+        transaction.on_commit(lambda: sync_memberships.delay(
+            member_model_path, container_model_path, container_ids, member_ids, added
+        ))
@@ -1,22 +1,65 @@
-from elasticsearch_dsl import FacetedSearch
+from django_elasticsearch_dsl import fields
+from elasticsearch_dsl import FacetedSearch, Q, analyzer, tokenizer
+
+# infix matching: values are indexed as trigrams, a search string matches when all of its trigrams are found
+TRIGRAM_ANALYZER = analyzer(
+    'trigram', tokenizer=tokenizer('trigram', 'ngram', min_gram=3, max_gram=3), filter=['lowercase']
+)
+# prefix matching (typeahead): values are indexed as all their prefixes, search strings are kept whole
+EDGE_NGRAM_ANALYZER = analyzer(
+    'edge_ngram', tokenizer=tokenizer('edge_ngram', 'edge_ngram', min_gram=1, max_gram=25), filter=['lowercase']
+)
+PREFIX_SEARCH_ANALYZER = analyzer('prefix_search', tokenizer='keyword', filter=['lowercase'])
+
+
+def get_ngram_subfields():
+    return dict(
+        ngram=fields.TextField(analyzer=TRIGRAM_ANALYZER),
+        prefix=fields.TextField(analyzer=EDGE_NGRAM_ANALYZER, search_analyzer=PREFIX_SEARCH_ANALYZER),
+    )
+
+
+def get_search_criterion(search_str, search_fields, ngram_fields):
+    """
+    Non exact search criterion. Fields in ngram_fields need the subfields of get_ngram_subfields,
+    others are matched as a whole.
+    """
+    search_str = (search_str or '').replace('*', '').strip()
+    if not search_str:
+        return None
+
+    criteria = []
+    if ngram_fields:
+        criteria.append(Q(
+            'multi_match', query=search_str, fields=[field + '.ngram' for field in ngram_fields], operator='and'
+        ))
+        criteria.append(Q(
+            'multi_match', query=search_str, fields=[field + '.prefix' for field in ngram_fields], boost=2
+        ))
+    other_fields = [field for field in search_fields if field not in ngram_fields]
+    if other_fields:
+        criteria.append(Q('multi_match', query=search_str, fields=other_fields, lenient=True))
+
+    return Q('bool', should=criteria, minimum_should_match=1) if criteria else None
 
 
 class CommonSearch(FacetedSearch):
+    ngram_fields = []
+
     def __init__(self, query=None, filters={}, sort=(), exact_match=False):  # pylint: disable=dangerous-default-value
         self.exact_match = exact_match
         super().__init__(query=query, filters=filters, sort=sort)
 
-    def format_search_str(self, search_str):
-        if self.exact_match:
-            return search_str
-        return "*{}*".format(search_str)
-
     def query(self, search, query):
         if query:
-            search_str = self.format_search_str(query)
-            if self.fields:
-                return search.filter('query_string', fields=self.fields, query=search_str)
+            if self.exact_match:
+                if self.fields:
+                    return search.filter('query_string', fields=self.fields, query=query)
+
+                return search.query('multi_match', query=query)
 
-            return search.query('multi_match', query=search_str)
+            criterion = get_search_criterion(query, self.fields or [], self.ngram_fields)
+            if criterion:
+                return search.filter(criterion)
 
         return search
@@ -1,4 +1,6 @@
 import base64
+import hashlib
+import io
 import json
 
 import boto3
@@ -8,7 +10,10 @@ from botocore.client import Config
 from botocore.exceptions import NoCredentialsError, ClientError
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from pydash import get
 
+from core.common.constants import SEARCH_RESPONSE_CACHE_KEY_PREFIX, SEARCH_GENERATION_KEY_PREFIX
 from core.settings import REDIS_HOST, REDIS_PORT, REDIS_DB
 
 
@@ -113,6 +118,10 @@ class S3:
     def url_for(cls, file_path):
         return cls.generate_signed_url(cls.GET, file_path) if file_path else None
 
+    @classmethod
+    def iter_chunks(cls, key, chunk_size=1024 * 1024):
+        return cls._conn().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)['Body'].iter_chunks(chunk_size)
+
     @classmethod
     def public_url_for(cls, file_path):
         url = "http://{0}.s3.amazonaws.com/{1}".format(
@@ -188,15 +197,85 @@ class S3:
             pass
 
 
+class S3MultipartUpload(io.RawIOBase):
+    """
+    Write only file object uploading to key in parts while it is written, so that large files are neither
+    kept on disk nor in memory. Completed on a clean exit of the with block, aborted otherwise.
+    """
+    PART_SIZE = 8 * 1024 * 1024  # all parts but the last one must be at least 5MB
+
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+        self.client = None
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        self.client = S3._conn()  # pylint: disable=protected-access
+        self.upload_id = self.client.create_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.key)['UploadId']
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.complete()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= self.PART_SIZE:
+            self.__upload_part(self.PART_SIZE)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def __upload_part(self, size):
+        body = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=body
+        )
+        self.parts.append(dict(ETag=response['ETag'], PartNumber=part_number))
+
+    def complete(self):
+        if self.buffer or not self.parts:
+            self.__upload_part(len(self.buffer))
+        self.client.complete_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload=dict(Parts=self.parts)
+        )
+
+    def abort(self):
+        self.client.abort_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.key, UploadId=self.upload_id)
+
+
 class RedisService:  # pragma: no cover
+    MOVE_FROM_SET_SCRIPT = """
+        local members = redis.call('SPOP', KEYS[1], ARGV[1])
+        for i = 1, #members, 1000 do
+            redis.call('SADD', KEYS[2], unpack(members, i, math.min(i + 999, #members)))
+        end
+        return members
+    """
+
     def __init__(self):
         self.conn = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
 
     def set(self, key, val):
         return self.conn.set(key, val)
 
-    def set_json(self, key, val):
-        return self.conn.set(key, json.dumps(val))
+    def set_json(self, key, val, expiry=None):
+        return self.conn.set(key, json.dumps(val, cls=DjangoJSONEncoder), ex=expiry)
 
     def get_formatted(self, key):
         val = self.get(key)
@@ -218,3 +297,69 @@ class RedisService:  # pragma: no cover
 
     def get_int(self, key):
         return int(self.conn.get(key).decode('utf-8'))
+
+    def set_if_absent(self, key, val, expiry_ms):
+        return self.conn.set(key, val, nx=True, px=expiry_ms)
+
+    def delete(self, key):
+        return self.conn.delete(key)
+
+    def add_to_set(self, key, *values):
+        return self.conn.sadd(key, *values)
+
+    def move_from_set(self, key, destination_key, count):
+        """Pops up to count members of key and adds them to destination_key, atomically"""
+        return self.conn.eval(self.MOVE_FROM_SET_SCRIPT, 2, key, destination_key, count)
+
+    def get_set_members(self, key):
+        return self.conn.smembers(key)
+
+    def get_set_size(self, key):
+        return self.conn.scard(key)
+
+    def lock(self, key, timeout):
+        return self.conn.lock(key, timeout=timeout)
+
+    def increment(self, *keys):
+        pipeline = self.conn.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        return pipeline.execute()
+
+
+class SearchResponseCache:
+    """
+    Serialized list pages (data and headers) of searchable views, in redis with a TTL.
+    Keys embed the generation of the view's scope: a source/collection url or GLOBAL_SCOPE for views not
+    scoped to one. Writes bump generations (see invalidate), so stale pages are never read again and expire.
+    """
+    GLOBAL_SCOPE = '*'
+
+    def __init__(self):
+        self.redis = RedisService()
+
+    @staticmethod
+    def is_on():
+        return bool(settings.SEARCH_RESPONSE_CACHE_TTL and not get(settings, 'TEST_MODE', False))
+
+    @staticmethod
+    def get_generation_key(scope):
+        return SEARCH_GENERATION_KEY_PREFIX + scope
+
+    def get_key(self, scope, key_data):
+        scope = scope or self.GLOBAL_SCOPE
+        generation = self.redis.get(self.get_generation_key(scope))
+        digest = hashlib.sha1(json.dumps(key_data, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+        return '{}{}:{}:{}'.format(SEARCH_RESPONSE_CACHE_KEY_PREFIX, scope, int(generation or 0), digest)
+
+    def get(self, key):
+        cached = self.redis.get(key)
+        return json.loads(cached) if cached else None
+
+    def set(self, key, data, headers):
+        return self.redis.set_json(key, dict(data=data, headers=headers), settings.SEARCH_RESPONSE_CACHE_TTL)
+
+    def invalidate(self, *scopes):
+        return self.redis.increment(
+            *[self.get_generation_key(scope) for scope in {self.GLOBAL_SCOPE, *scopes}]
+        )
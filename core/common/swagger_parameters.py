@@ -1,7 +1,7 @@
 from drf_yasg import openapi
 
 from core.common.constants import RELEASED_PARAM, VERBOSE_PARAM, INCLUDE_RETIRED_PARAM, PROCESSING_PARAM, \
-    INCLUDE_INVERSE_MAPPINGS_PARAM, UPDATED_SINCE_PARAM
+    INCLUDE_INVERSE_MAPPINGS_PARAM, UPDATED_SINCE_PARAM, MAP_TYPES_PARAM, DIRECTION_PARAM, DEPTH_PARAM, SOURCES_PARAM
 
 # HEADERS
 include_facets_header = openapi.Parameter(
@@ -15,6 +15,10 @@ compress_header = openapi.Parameter(
 # QUERY PARAMS
 q_param = openapi.Parameter('q', openapi.IN_QUERY, description="search text", type=openapi.TYPE_STRING)
 page_param = openapi.Parameter('page', openapi.IN_QUERY, description="page number", type=openapi.TYPE_INTEGER)
+cursor_param = openapi.Parameter(
+    'cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+    description="search results cursor, empty for the first page, then from the 'next' header (ignores page)"
+)
 exact_match_param = openapi.Parameter(
     'exact_match', openapi.IN_QUERY, description="on | off (no wildcards)", type=openapi.TYPE_STRING, default='off'
 )
@@ -80,3 +84,23 @@ resources_body_param = openapi.Parameter(
 parallel_threads_param = openapi.Parameter(
     'parallel', openapi.IN_FORM, description="Parallel threads count (default: 5, max: 10)", type=openapi.TYPE_INTEGER
 )
+diff_from_param = openapi.Parameter(
+    'from', openapi.IN_QUERY, description="Version to compare from (mandatory)", type=openapi.TYPE_STRING
+)
+diff_to_param = openapi.Parameter(
+    'to', openapi.IN_QUERY, description="Version to compare to (default: latest)", type=openapi.TYPE_STRING
+)
+map_types_param = openapi.Parameter(
+    MAP_TYPES_PARAM, openapi.IN_QUERY, description="Map types to follow (comma separated, default: all)",
+    type=openapi.TYPE_STRING
+)
+direction_param = openapi.Parameter(
+    DIRECTION_PARAM, openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['both', 'forward', 'inverse'], default='both'
+)
+depth_param = openapi.Parameter(
+    DEPTH_PARAM, openapi.IN_QUERY, description="Number of hops (max 5)", type=openapi.TYPE_INTEGER, default=1
+)
+sources_param = openapi.Parameter(
+    SOURCES_PARAM, openapi.IN_QUERY, description="Source urls whose mappings are followed (comma separated, "
+                                                 "default: concept's source)", type=openapi.TYPE_STRING
+)
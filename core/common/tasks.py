@@ -1,16 +1,29 @@
+import json
+import uuid
 
 from billiard.exceptions import WorkerLostError
 from celery.utils.log import get_task_logger
+from celery import chord
 from celery_once import QueueOnce
 from django.apps import apps
+from django.conf import settings
 from django.core.mail import EmailMessage
 from django.core.management import call_command
+from django.db.models import Min, Max
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django_elasticsearch_dsl.registries import registry
 
 from core.celery import app
-from core.common.constants import CONFIRM_EMAIL_ADDRESS_MAIL_SUBJECT, PASSWORD_RESET_MAIL_SUBJECT
-from core.common.utils import write_export_file, web_url
+from core.common.constants import (
+    CONFIRM_EMAIL_ADDRESS_MAIL_SUBJECT, PASSWORD_RESET_MAIL_SUBJECT, ES_SYNC_QUEUE_KEY, ES_SYNC_SCHEDULED_KEY,
+    ES_SYNC_SCHEDULED_TIMEOUT, BACKGROUND_TASK_DETAILS_EXPIRY, ES_SYNC_PROCESSING_KEY, ES_REBUILD_KEY_PREFIX,
+    ES_REBUILD_CHANGES_KEY_PREFIX, ES_REBUILD_TIMEOUT, ES_SYNC_LOCK_KEY, ES_SYNC_LOCK_TIMEOUT)
+from core.common.documents import MembershipDocumentMixin
+from core.common.services import RedisService, S3, SearchResponseCache
+from core.common.utils import (
+    write_export_file, web_url, get_class, chunked_queryset_iterator, get_export_partitions, write_export_fragment,
+    drop_version)
 
 logger = get_task_logger(__name__)
 
@@ -39,7 +52,7 @@ def delete_organization(org_id):
 
 
 @app.task(base=QueueOnce, bind=True)
-def export_source(self, version_id):
+def export_source(self, version_id, base_version_id=None):
     from core.sources.models import Source
     logger.info('Finding source version...')
 
@@ -54,14 +67,16 @@ def export_source(self, version_id):
     version.add_processing(self.request.id)
     try:
         logger.info('Found source version %s.  Beginning export...', version.version)
-        write_export_file(version, 'source', 'core.sources.serializers.SourceVersionExportSerializer', logger)
-        logger.info('Export complete!')
+        __export_version(
+            version, 'source', 'core.sources.serializers.SourceVersionExportSerializer',
+            Source.objects.filter(id=base_version_id).first() if base_version_id else None
+        )
     finally:
         version.remove_processing(self.request.id)
 
 
 @app.task(base=QueueOnce, bind=True)
-def export_collection(self, version_id):
+def export_collection(self, version_id, base_version_id=None):
     from core.collections.models import Collection
     logger.info('Finding collection version...')
 
@@ -76,12 +91,82 @@ def export_collection(self, version_id):
     version.add_processing(self.request.id)
     try:
         logger.info('Found collection version %s.  Beginning export...', version.version)
-        write_export_file(
-            version, 'collection', 'core.collections.serializers.CollectionVersionExportSerializer', logger
+        __export_version(
+            version, 'collection', 'core.collections.serializers.CollectionVersionExportSerializer',
+            Collection.objects.filter(id=base_version_id).first() if base_version_id else None
         )
+    finally:
+        version.remove_processing(self.request.id)
+
+
+def __export_version(version, resource_type, resource_serializer_type, base_version=None):
+    """
+    Large versions are split in id range partitions of their concepts and mappings, serialized to S3 fragments
+    by parallel tasks and then joined in order into the export (finish_export). The version stays processing
+    until then, or until a partition fails (abort_export). Delta exports (from a base_version) are not split.
+    """
+    partitions = None if base_version else get_export_partitions(version, resource_type)
+    if not partitions:
+        write_export_file(version, resource_type, resource_serializer_type, logger, base_version=base_version)
+        logger.info('Export complete!')
+        return
+
+    fragments_path = version.export_path + '.parts/'
+    fragments = {
+        name: ['{}{}-{:04d}.json'.format(fragments_path, name, i) for i in range(len(ranges))]
+        for name, ranges in partitions.items()
+    }
+    logger.info('Exporting %s in parallel to %s...', ', '.join(
+        '{} {}'.format(len(keys), name) for name, keys in fragments.items()), fragments_path)
+    model_label = version._meta.label  # pylint: disable=protected-access
+    callback_id = str(uuid.uuid4())
+    version.add_processing(callback_id)
+    callback = finish_export.si(
+        model_label, version.id, resource_type, resource_serializer_type, fragments_path, fragments
+    ).set(task_id=callback_id)
+    callback.link_error(abort_export.si(model_label, version.id, fragments_path, callback_id))
+    chord(
+        export_partition.si(model_label, version.id, resource_type, name, start_id, end_id, fragments[name][i])
+        for name, ranges in partitions.items() for i, (start_id, end_id) in enumerate(ranges)
+    )(callback)
+
+
+def __get_export_version(model_label, version_id):
+    return apps.get_model(model_label).objects.filter(id=version_id).select_related('organization', 'user').first()
+
+
+@app.task(
+    autoretry_for=(Exception, WorkerLostError, ), retry_kwargs={'max_retries': 2, 'countdown': 2},
+    acks_late=True, reject_on_worker_lost=True
+)
+def export_partition(  # pylint: disable=too-many-arguments
+        model_label, version_id, resource_type, name, start_id, end_id, key
+):
+    version = __get_export_version(model_label, version_id)
+    count = write_export_fragment(key, version, resource_type, name, start_id, end_id, logger)
+    logger.info('Exported %d %s to %s.', count, name, key)
+
+
+@app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def finish_export(  # pylint: disable=too-many-arguments
+        self, model_label, version_id, resource_type, resource_serializer_type, fragments_path, fragments
+):
+    version = __get_export_version(model_label, version_id)
+    try:
+        write_export_file(version, resource_type, resource_serializer_type, logger, fragments)
         logger.info('Export complete!')
     finally:
         version.remove_processing(self.request.id)
+        S3.delete_objects(fragments_path)
+
+
+@app.task(ignore_result=True)
+def abort_export(model_label, version_id, fragments_path, callback_id):
+    """Errback of the export chord, drops the fragments written so far and releases the version"""
+    S3.delete_objects(fragments_path)
+    version = __get_export_version(model_label, version_id)
+    if version and version.has_processing(callback_id):
+        version.remove_processing(callback_id)
 
 
 @app.task(bind=True)
@@ -116,12 +201,103 @@ def __handle_pre_delete(instance):
     registry.delete_related(instance)
 
 
+def queue_index_sync(app_name, model_name, instance_ids):
+    """
+    Pushes (model, id) pairs into a redis set which sync_indexes drains every ES_SYNC_INTERVAL ms,
+    so an object saved many times in between is indexed once and all of them go in one bulk request.
+    """
+    service = RedisService()
+    service.add_to_set(
+        ES_SYNC_QUEUE_KEY, *['{}.{}.{}'.format(app_name, model_name, instance_id) for instance_id in instance_ids]
+    )
+    __schedule_index_sync(service, settings.ES_SYNC_INTERVAL)
+
+
+def invalidate_search_responses(model, instance_ids=(), scopes=()):
+    """
+    Bumps the generations of the cached list pages holding the instances (see SearchResponseCache), their source
+    or collection and the global one. Called once their documents are written, pages cached before that are of
+    the previous generation then.
+    """
+    if not SearchResponseCache.is_on():
+        return
+
+    from core.common.mixins import SourceChildMixin
+    from core.common.models import ConceptContainerModel
+    uri_lookup = None
+    if issubclass(model, ConceptContainerModel):
+        uri_lookup = 'uri'
+    elif issubclass(model, SourceChildMixin):
+        uri_lookup = 'parent__uri'
+    if uri_lookup and instance_ids:
+        scopes = [
+            *scopes,
+            *{drop_version(uri) for uri in model.objects.filter(id__in=instance_ids).values_list(uri_lookup, flat=True)}
+        ]
+
+    SearchResponseCache().invalidate(*scopes)
+
+
+def __schedule_index_sync(service, countdown):
+    if service.set_if_absent(ES_SYNC_SCHEDULED_KEY, 1, countdown + ES_SYNC_SCHEDULED_TIMEOUT):
+        sync_indexes.apply_async(countdown=countdown / 1000)
+
+
 @app.task(
     ignore_result=True, autoretry_for=(Exception, WorkerLostError, ), retry_kwargs={'max_retries': 2, 'countdown': 2},
     acks_late=True, reject_on_worker_lost=True
 )
 def handle_save(app_name, model_name, instance_id):
-    __handle_save(apps.get_model(app_name, model_name).objects.get(id=instance_id))
+    """Deprecated, forwards messages queued before index syncs were batched, to be removed next release"""
+    queue_index_sync(app_name, model_name, [instance_id])
+
+
+@app.task(ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def sync_indexes():
+    """
+    Indexes a batch of the queued objects. The batch is moved to a processing set until its bulk request succeeds,
+    a drain that died before that leaves it there and the next drain indexes it first.
+    Drains hold a lock while they run, one started meanwhile retries later instead of taking the processing set.
+    """
+    service = RedisService()
+    lock = service.lock(ES_SYNC_LOCK_KEY, ES_SYNC_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        sync_indexes.apply_async(countdown=settings.ES_SYNC_INTERVAL / 1000)
+        return
+
+    try:
+        __drain_index_sync_queue(service)
+    finally:
+        lock.release()
+
+    if service.get_set_size(ES_SYNC_QUEUE_KEY):
+        __schedule_index_sync(service, 0)
+
+
+def __drain_index_sync_queue(service):
+    service.delete(ES_SYNC_SCHEDULED_KEY)  # saves from now on schedule the next drain
+    members = list(service.get_set_members(ES_SYNC_PROCESSING_KEY)) or service.move_from_set(
+        ES_SYNC_QUEUE_KEY, ES_SYNC_PROCESSING_KEY, settings.ES_SYNC_BATCH_SIZE) or []
+
+    instance_ids = dict()
+    for member in members:
+        app_name, model_name, instance_id = member.decode().split('.')
+        instance_ids.setdefault((app_name, model_name), set()).add(int(instance_id))
+
+    try:
+        for (app_name, model_name), ids in instance_ids.items():
+            model = apps.get_model(app_name, model_name)
+            for document_class in registry.get_documents([model]):
+                document = document_class()
+                document.update(document.get_queryset().filter(id__in=ids))
+            invalidate_search_responses(model, ids)
+    except Exception:
+        service.add_to_set(ES_SYNC_QUEUE_KEY, *members)
+        service.delete(ES_SYNC_PROCESSING_KEY)
+        __schedule_index_sync(service, settings.ES_SYNC_INTERVAL)
+        raise
+
+    service.delete(ES_SYNC_PROCESSING_KEY)
 
 
 @app.task(
@@ -136,6 +312,62 @@ def handle_m2m_changed(app_name, model_name, instance_id, action):
         __handle_pre_delete(instance)
 
 
+@app.task(
+    ignore_result=True, autoretry_for=(Exception, WorkerLostError, ), retry_kwargs={'max_retries': 2, 'countdown': 2},
+    acks_late=True, reject_on_worker_lost=True
+)
+def sync_memberships(member_model_path, container_model_path, container_ids, member_ids, added):
+    """
+    Indexes (added) or deletes the membership documents of every (container, member) pair of
+    container_ids x member_ids, member documents themselves are left untouched.
+    """
+    member_model = apps.get_model(member_model_path)
+    container_model = apps.get_model(container_model_path)
+    for document_class in registry.get_documents([member_model]):
+        document = document_class()
+        if added:
+            record_rebuild_changes(document_class, updated_ids=member_ids)
+            containers = container_model.objects.select_related('organization', 'user').filter(id__in=container_ids)
+            document.bulk(document.get_membership_actions(
+                (container, member_id) for container in containers for member_id in member_ids
+            ), refresh=document.django.auto_refresh)
+        else:
+            record_rebuild_changes(document_class, deletes=[
+                (document.get_membership_id(container_model.__name__, container_id, member_id), member_id)
+                for container_id in container_ids for member_id in member_ids
+            ])
+            document.delete_memberships(
+                container_model.__name__,
+                ((container_id, member_id) for container_id in container_ids for member_id in member_ids)
+            )
+    invalidate_search_responses(container_model, container_ids)
+
+
+@app.task(
+    ignore_result=True, autoretry_for=(Exception, WorkerLostError, ), retry_kwargs={'max_retries': 2, 'countdown': 2},
+    acks_late=True, reject_on_worker_lost=True
+)
+def delete_memberships(member_model_paths, criteria):
+    """
+    Deletes the membership documents matching any of criteria (see MembershipDocumentMixin), for deleted
+    source/collection versions and members, whose memberships go with no m2m_changed.
+    """
+    for document_class in registry.get_documents([apps.get_model(path) for path in member_model_paths]):
+        document_class().delete_memberships_by_query(criteria)
+
+
+@app.task(
+    ignore_result=True, autoretry_for=(Exception, WorkerLostError, ), retry_kwargs={'max_retries': 2, 'countdown': 2},
+    acks_late=True, reject_on_worker_lost=True
+)
+def batch_index_resources(app_name, model_name, instance_ids):
+    model = apps.get_model(app_name, model_name)
+    queryset = model.objects.filter(id__in=instance_ids)
+    for document in registry.get_documents([model]):
+        document().update(queryset, parallel=True)
+    invalidate_search_responses(model, instance_ids)
+
+
 @app.task(ignore_result=True)
 def handle_pre_delete(app_name, model_name, instance_id):
     __handle_pre_delete(apps.get_model(app_name, model_name).objects.get(id=instance_id))
@@ -148,7 +380,121 @@ def populate_indexes(app_names=None):  # app_names has to be an iterable of stri
 
 @app.task(base=QueueOnce)
 def rebuild_indexes(app_names=None):  # app_names has to be an iterable of strings
-    __run_search_index_command('--rebuild', app_names)
+    """
+    Zero downtime rebuild: every document is loaded in a new timestamped index, in id range partitions indexed
+    by parallel tasks, then its alias is swapped to the new index.
+    """
+    for document_class in registry.get_documents():
+        if not app_names or document_class.django.model._meta.app_label in app_names:
+            __rebuild_index(document_class)
+
+
+def __rebuild_index(document_class):  # pylint: disable=protected-access
+    document_path = '{}.{}'.format(document_class.__module__, document_class.__name__)
+    index_name = '{}_{}'.format(document_class._index._name, timezone.now().strftime('%Y%m%d%H%M%S'))
+    index = document_class._index.clone(name=index_name)
+    index.settings(refresh_interval='-1', number_of_replicas=0)
+    index.create()
+    service = RedisService()
+    service.delete(ES_REBUILD_CHANGES_KEY_PREFIX + document_class._index._name)
+    service.set_json(ES_REBUILD_KEY_PREFIX + document_class._index._name, index_name, ES_REBUILD_TIMEOUT)
+
+    started_at = timezone.now().isoformat()
+    bounds = document_class.django.model.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    if bounds['min_id'] is None:
+        swap_index_alias.delay(document_path, index_name, started_at)
+        return
+
+    partitions_count = settings.ES_REBUILD_PARTITIONS
+    partition_size = (bounds['max_id'] - bounds['min_id']) // partitions_count + 1
+    chord(
+        index_partition.si(
+            document_path, index_name, bounds['min_id'] + i * partition_size,
+            bounds['min_id'] + (i + 1) * partition_size
+        ) for i in range(partitions_count)
+    )(swap_index_alias.si(document_path, index_name, started_at))
+
+
+@app.task(
+    autoretry_for=(Exception, WorkerLostError, ), retry_kwargs={'max_retries': 2, 'countdown': 2},
+    acks_late=True, reject_on_worker_lost=True
+)
+def index_partition(document_path, index_name, start_id, end_id):
+    document = get_class(document_path)()
+    queryset = document.get_queryset().filter(id__gte=start_id, id__lt=end_id)
+
+    def get_actions():
+        for instance in chunked_queryset_iterator(queryset, document.django.queryset_pagination or 1000):
+            yield dict(
+                _op_type='index', _index=index_name, _id=document.generate_id(instance),
+                _source=document.prepare(instance)
+            )
+            if isinstance(document, MembershipDocumentMixin):
+                yield from document.get_membership_actions(document.get_memberships([instance]), index_name)
+
+    document.bulk(get_actions())
+
+
+@app.task(acks_late=True, reject_on_worker_lost=True)
+def swap_index_alias(document_path, index_name, started_at):  # pylint: disable=protected-access
+    document_class = get_class(document_path)
+    alias = document_class._index._name
+    index_settings = document_class._index._settings
+    connection = document_class._get_connection()
+
+    connection.indices.put_settings(index=index_name, body=dict(index=dict(  # None resets to the es default
+        refresh_interval=index_settings.get('refresh_interval'),
+        number_of_replicas=index_settings.get('number_of_replicas')
+    )))
+    connection.indices.refresh(index=index_name)
+
+    actions = [dict(add=dict(index=index_name, alias=alias))]
+    old_index_names = []
+    if connection.indices.exists_alias(name=alias):
+        old_index_names = list(connection.indices.get_alias(name=alias).keys())
+        actions = [dict(remove=dict(index=name, alias=alias)) for name in old_index_names] + actions
+    elif connection.indices.exists(index=alias):  # index created before aliases were used
+        actions = [dict(remove_index=dict(index=alias))] + actions
+    connection.indices.update_aliases(body=dict(actions=actions))
+
+    for name in old_index_names:
+        connection.indices.delete(index=name, ignore=404)
+
+    # saves, deletes and membership changes made during the rebuild went to the old index
+    service = RedisService()
+    service.delete(ES_REBUILD_KEY_PREFIX + alias)  # writes from now on go to the new index only
+    deletes, updated_ids = [], set()
+    for change in service.get_set_members(ES_REBUILD_CHANGES_KEY_PREFIX + alias):
+        change = json.loads(change)
+        if change[0] == 'delete':
+            deletes.append(dict(_op_type='delete', _index=index_name, _id=change[1], _routing=change[2]))
+        else:
+            updated_ids.add(change[1])
+    if deletes:
+        document_class().bulk(deletes, raise_on_error=False)
+    service.delete(ES_REBUILD_CHANGES_KEY_PREFIX + alias)
+
+    model = document_class.django.model
+    updated_ids |= set(model.objects.filter(updated_at__gte=started_at).values_list('id', flat=True))
+    if updated_ids:
+        queue_index_sync(model._meta.app_label, model.__name__, list(updated_ids))
+
+
+def record_rebuild_changes(document_class, deletes=(), updated_ids=()):  # pylint: disable=protected-access
+    """
+    While the index of document_class is rebuilt, records the documents deleted from it ((_id, routing) pairs) and
+    the objects reindexed otherwise than by a save (membership changes), swap_index_alias replays them on the new
+    index. Has to be called before the change is written to the current index.
+    """
+    service = RedisService()
+    if not (deletes or updated_ids) or not service.exists(ES_REBUILD_KEY_PREFIX + document_class._index._name):
+        return
+
+    service.add_to_set(
+        ES_REBUILD_CHANGES_KEY_PREFIX + document_class._index._name,
+        *[json.dumps(['delete', _id, routing]) for _id, routing in deletes],
+        *[json.dumps(['index', instance_id]) for instance_id in updated_ids]
+    )
 
 
 def __run_search_index_command(command, app_names=None):
@@ -255,3 +601,37 @@ def seed_children(self, resource, obj_id):
             instance.seed_references()
         finally:
             instance.remove_processing(task_id)
+
+
+@app.task(bind=True)
+def update_validation_schema(self, source_id, validation_schema):
+    """
+    Validates all active concepts of a large source against validation_schema and applies the schema only if
+    none fails. Progress and then the failed concept validations are published in redis under the task id, for the
+    processing endpoint of the source. The task id is added to the processing ids of the source when queued.
+    """
+    from core.sources.models import Source
+    instance = Source.objects.filter(id=source_id).first()
+    if not instance:
+        return None
+
+    task_id = self.request.id
+    service = RedisService()
+    details = dict(url=instance.uri, processed=0, total=None)
+
+    def notify_progress(processed, total):
+        details.update(processed=processed, total=total)
+        service.set_json(task_id, details, expiry=BACKGROUND_TASK_DETAILS_EXPIRY)
+
+    try:
+        notify_progress(0, None)
+        instance.custom_validation_schema = validation_schema
+        failed_concept_validations = instance.validate_child_concepts(notify_progress)
+        if not failed_concept_validations:
+            instance.save(update_fields=['custom_validation_schema', 'updated_at'])
+        details.update(failed_concept_validations=failed_concept_validations)
+        service.set_json(task_id, details, expiry=BACKGROUND_TASK_DETAILS_EXPIRY)
+    finally:
+        instance.remove_processing(task_id)
+
+    return failed_concept_validations
@@ -1,6 +1,10 @@
 import base64
+import io
+import json
 import uuid
-from unittest.mock import patch, Mock, mock_open
+from datetime import timedelta
+from unittest.mock import patch, Mock, mock_open, call, ANY
+from urllib.parse import urlencode
 
 import boto3
 from botocore.exceptions import ClientError
@@ -8,25 +12,38 @@ from colour_runner.django_runner import ColourRunnerMixin
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.management import call_command
-from django.test import TestCase
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
 from django.test.runner import DiscoverRunner
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
 from moto import mock_s3
 from requests.auth import HTTPBasicAuth
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework.utils import encoders
 
 from core.collections.models import Collection
-from core.common.constants import HEAD, OCL_ORG_ID, SUPER_ADMIN_USER_ID
+from core.common.constants import HEAD, OCL_ORG_ID, SUPER_ADMIN_USER_ID, ISO_639_1
 from core.common.utils import (
     compact_dict_by_values, to_snake_case, flower_get, task_exists, parse_bulk_import_task_id,
     to_camel_case,
     drop_version, is_versioned_uri, separate_version, to_parent_uri, jsonify_safe, es_get,
-    get_resource_class_from_resource_name)
+    get_resource_class_from_resource_name, encode_search_cursor, decode_search_cursor, chunked_queryset,
+    get_export_partitions, copy_export_fragments, get_export_querysets, get_export_removals)
 from core.concepts.models import Concept, LocalizedText
 from core.mappings.models import Mapping
 from core.orgs.models import Organization
 from core.sources.models import Source
 from core.users.models import UserProfile
-from .services import S3
+from .db_search import DBSearch
+from .documents import MembershipDocumentMixin
+from .exceptions import Http400
+from .mixins import CustomPaginator
+from .search import get_search_criterion
+from .services import S3, SearchResponseCache, S3MultipartUpload
+from .tasks import queue_index_sync, sync_indexes, swap_index_alias, export_source, handle_save, \
+    record_rebuild_changes, invalidate_search_responses, abort_export, delete_memberships
 
 
 def delete_all():
@@ -239,6 +256,39 @@ class S3Test(TestCase):
             'content'
         )
 
+    @mock_s3
+    def test_multipart_upload(self):
+        _conn = boto3.resource('s3', region_name='us-east-1')
+        _conn.create_bucket(Bucket='oclapi2-dev')
+
+        with patch.object(S3MultipartUpload, 'PART_SIZE', 5 * 1024 * 1024):
+            with S3MultipartUpload('some/path') as upload:
+                upload.write(b'a' * 4 * 1024 * 1024)
+                upload.write(b'b' * 2 * 1024 * 1024)
+                upload.write(b'c')
+
+        self.assertEqual(len(upload.parts), 2)
+        self.assertEqual(
+            _conn.Object('oclapi2-dev', 'some/path').get()['Body'].read(),
+            b'a' * 4 * 1024 * 1024 + b'b' * 2 * 1024 * 1024 + b'c'
+        )
+
+    @patch('core.common.services.S3._conn')
+    def test_multipart_upload_aborted_on_error(self, client_mock):
+        conn_mock = Mock()
+        conn_mock.create_multipart_upload = Mock(return_value=dict(UploadId='upload-id'))
+        client_mock.return_value = conn_mock
+
+        with self.assertRaises(ValueError):
+            with S3MultipartUpload('some/path') as upload:
+                upload.write(b'content')
+                raise ValueError()
+
+        conn_mock.upload_part.assert_not_called()
+        conn_mock.complete_multipart_upload.assert_not_called()
+        conn_mock.abort_multipart_upload.assert_called_once_with(
+            Bucket='oclapi2-dev', Key='some/path', UploadId='upload-id')
+
     @patch('core.common.services.S3._conn')
     def test_upload_public(self, client_mock):
         conn_mock = Mock()
@@ -620,6 +670,25 @@ class UtilsTest(OCLTestCase):
             "https://foobar.com/users/user/sources/source/"
         )
 
+    def test_search_cursor(self):
+        cursor = encode_search_cursor([1.2, 'foo', '123'])
+
+        self.assertTrue(isinstance(cursor, str))
+        self.assertEqual(decode_search_cursor(cursor), [1.2, 'foo', '123'])
+        with self.assertRaises(ValueError):
+            decode_search_cursor(encode_search_cursor(dict(foo='bar')))
+        with self.assertRaises(ValueError):
+            decode_search_cursor('foobar')
+
+    def test_chunked_queryset(self):
+        ids = [LocalizedText.objects.create(name='name{}'.format(i), locale='en').id for i in range(5)]
+        queryset = LocalizedText.objects.filter(id__in=ids)
+
+        chunks = list(chunked_queryset(queryset.order_by('-id'), 2))
+
+        self.assertEqual([[text.id for text in chunk] for chunk in chunks], [ids[:2], ids[2:4], ids[4:]])
+        self.assertEqual(list(chunked_queryset(queryset.none(), 2)), [])
+
     def test_jsonify_safe(self):
         self.assertEqual(jsonify_safe(None), None)
         self.assertEqual(jsonify_safe(dict()), dict())
@@ -647,3 +716,756 @@ class BaseModelTest(OCLTestCase):
     def test_app_name(self):
         self.assertEqual(Concept().app_name, 'concepts')
         self.assertEqual(Source().app_name, 'sources')
+
+
+class IndexSyncTest(OCLTestCase):
+    @patch('core.common.tasks.sync_indexes')
+    @patch('core.common.tasks.RedisService')
+    def test_queue_index_sync(self, redis_service_mock, sync_indexes_mock):
+        redis_service_mock.return_value.set_if_absent = Mock(side_effect=[True, False])
+
+        queue_index_sync('concepts', 'Concept', [1, 2])
+        queue_index_sync('concepts', 'Concept', [1])
+
+        redis_service_mock.return_value.add_to_set.assert_any_call(
+            'es_sync_queue', 'concepts.Concept.1', 'concepts.Concept.2')
+        redis_service_mock.return_value.add_to_set.assert_called_with('es_sync_queue', 'concepts.Concept.1')
+        sync_indexes_mock.apply_async.assert_called_once_with(countdown=0.5)
+
+    @patch('core.common.tasks.registry')
+    @patch('core.common.tasks.RedisService')
+    def test_sync_indexes(self, redis_service_mock, registry_mock):
+        from core.concepts.tests.factories import ConceptFactory
+        concept = ConceptFactory()
+        document_mock = Mock()
+        document_mock.get_queryset = Mock(return_value=Concept.objects.filter(id=concept.id))
+        registry_mock.get_documents = Mock(return_value=[Mock(return_value=document_mock)])
+        redis_service_mock.return_value.get_set_members = Mock(return_value=set())
+        redis_service_mock.return_value.move_from_set = Mock(
+            return_value=[
+                'concepts.Concept.{}'.format(concept.id).encode(), 'concepts.Concept.{}'.format(concept.id).encode()
+            ]
+        )
+        redis_service_mock.return_value.get_set_size = Mock(return_value=0)
+
+        sync_indexes()
+
+        redis_service_mock.return_value.lock.assert_called_once_with('es_sync_lock', 600)
+        redis_service_mock.return_value.lock.return_value.acquire.assert_called_once_with(blocking=False)
+        redis_service_mock.return_value.lock.return_value.release.assert_called_once()
+        redis_service_mock.return_value.move_from_set.assert_called_once_with(
+            'es_sync_queue', 'es_sync_processing', 2000)
+        self.assertEqual(
+            redis_service_mock.return_value.delete.call_args_list,
+            [call('es_sync_scheduled'), call('es_sync_processing')]
+        )
+        registry_mock.get_documents.assert_called_once_with([Concept])
+        document_mock.update.assert_called_once()
+        self.assertEqual(list(document_mock.update.call_args[0][0]), [concept])
+        redis_service_mock.return_value.set_if_absent.assert_not_called()
+
+    @patch('core.common.tasks.registry')
+    @patch('core.common.tasks.RedisService')
+    def test_sync_indexes_resumes_the_batch_of_a_dead_drain(self, redis_service_mock, registry_mock):
+        from core.concepts.tests.factories import ConceptFactory
+        concept = ConceptFactory()
+        document_mock = Mock()
+        document_mock.get_queryset = Mock(return_value=Concept.objects.filter(id=concept.id))
+        registry_mock.get_documents = Mock(return_value=[Mock(return_value=document_mock)])
+        redis_service_mock.return_value.get_set_members = Mock(
+            return_value={'concepts.Concept.{}'.format(concept.id).encode()})
+        redis_service_mock.return_value.set_if_absent = Mock(return_value=False)
+        document_mock.update = Mock(side_effect=Exception('ES down'))
+
+        with self.assertRaises(Exception):
+            sync_indexes()
+
+        redis_service_mock.return_value.move_from_set.assert_not_called()
+        redis_service_mock.return_value.add_to_set.assert_called_once_with(
+            'es_sync_queue', 'concepts.Concept.{}'.format(concept.id).encode())
+        redis_service_mock.return_value.delete.assert_called_with('es_sync_processing')
+        redis_service_mock.return_value.lock.return_value.release.assert_called_once()
+
+    @patch('core.common.tasks.sync_indexes.apply_async')
+    @patch('core.common.tasks.RedisService')
+    def test_sync_indexes_retries_while_another_drain_runs(self, redis_service_mock, apply_async_mock):
+        redis_service_mock.return_value.lock.return_value.acquire = Mock(return_value=False)
+
+        sync_indexes()
+
+        apply_async_mock.assert_called_once_with(countdown=0.5)
+        redis_service_mock.return_value.delete.assert_not_called()
+        redis_service_mock.return_value.get_set_members.assert_not_called()
+        redis_service_mock.return_value.move_from_set.assert_not_called()
+        redis_service_mock.return_value.lock.return_value.release.assert_not_called()
+
+    @patch('core.common.tasks.queue_index_sync')
+    def test_handle_save(self, queue_index_sync_mock):
+        handle_save('concepts', 'Concept', 1)
+
+        queue_index_sync_mock.assert_called_once_with('concepts', 'Concept', [1])
+
+
+class SearchCriterionTest(TestCase):
+    def test_get_search_criterion(self):
+        self.assertIsNone(get_search_criterion('', ['name'], ['name']))
+        self.assertIsNone(get_search_criterion('**', ['name'], ['name']))
+
+        self.assertEqual(
+            get_search_criterion('*malaria*', ['name', 'datatype'], ['name']).to_dict(),
+            dict(bool=dict(should=[
+                dict(multi_match=dict(query='malaria', fields=['name.ngram'], operator='and')),
+                dict(multi_match=dict(query='malaria', fields=['name.prefix'], boost=2)),
+                dict(multi_match=dict(query='malaria', fields=['datatype'], lenient=True)),
+            ], minimum_should_match=1))
+        )
+        self.assertEqual(
+            get_search_criterion('malaria', ['datatype'], []).to_dict(),
+            dict(bool=dict(should=[
+                dict(multi_match=dict(query='malaria', fields=['datatype'], lenient=True))
+            ], minimum_should_match=1))
+        )
+
+
+class RebuildIndexesTest(OCLTestCase):
+    @patch('core.common.tasks.RedisService')
+    @patch('core.common.tasks.queue_index_sync')
+    @patch('core.common.tasks.get_class')
+    def test_swap_index_alias(self, get_class_mock, queue_index_sync_mock, redis_service_mock):
+        from core.concepts.tests.factories import ConceptFactory
+        concept = ConceptFactory()
+        redis_service_mock.return_value.get_set_members = Mock(return_value={
+            b'["delete", 1001, null]', b'["delete", "source-1-1002", 1002]', b'["index", 1003]'
+        })
+        connection_mock = Mock()
+        connection_mock.indices.exists_alias = Mock(return_value=True)
+        connection_mock.indices.get_alias = Mock(return_value={'concepts_20260101000000': {}})
+        document_class_mock = Mock(django=Mock(model=Concept))
+        document_class_mock._index._name = 'concepts'
+        document_class_mock._index._settings = dict(number_of_shards=1, number_of_replicas=0)
+        document_class_mock._get_connection = Mock(return_value=connection_mock)
+        get_class_mock.return_value = document_class_mock
+
+        swap_index_alias('core.concepts.documents.ConceptDocument', 'concepts_20261019100000', '2026-01-01T00:00:00')
+
+        connection_mock.indices.put_settings.assert_called_once_with(
+            index='concepts_20261019100000', body=dict(index=dict(refresh_interval=None, number_of_replicas=0))
+        )
+        connection_mock.indices.update_aliases.assert_called_once_with(body=dict(actions=[
+            dict(remove=dict(index='concepts_20260101000000', alias='concepts')),
+            dict(add=dict(index='concepts_20261019100000', alias='concepts')),
+        ]))
+        connection_mock.indices.delete.assert_called_once_with(index='concepts_20260101000000', ignore=404)
+        self.assertEqual(
+            redis_service_mock.return_value.delete.call_args_list,
+            [call('es_rebuild:concepts'), call('es_rebuild_changes:concepts')]
+        )
+        document_class_mock.return_value.bulk.assert_called_once_with(ANY, raise_on_error=False)
+        self.assertCountEqual(
+            document_class_mock.return_value.bulk.call_args[0][0],
+            [
+                dict(_op_type='delete', _index='concepts_20261019100000', _id=1001, _routing=None),
+                dict(_op_type='delete', _index='concepts_20261019100000', _id='source-1-1002', _routing=1002),
+            ]
+        )
+        queue_index_sync_mock.assert_called_once()
+        self.assertTrue(concept.id in queue_index_sync_mock.call_args[0][2])
+        self.assertTrue(1003 in queue_index_sync_mock.call_args[0][2])
+
+    @patch('core.common.tasks.RedisService')
+    def test_record_rebuild_changes(self, redis_service_mock):
+        document_class_mock = Mock()
+        document_class_mock._index._name = 'concepts'
+        redis_service_mock.return_value.exists = Mock(return_value=False)
+
+        record_rebuild_changes(document_class_mock, deletes=[(1, None)])
+
+        redis_service_mock.return_value.exists.assert_called_once_with('es_rebuild:concepts')
+        redis_service_mock.return_value.add_to_set.assert_not_called()
+
+        redis_service_mock.return_value.exists = Mock(return_value=True)
+
+        record_rebuild_changes(document_class_mock, deletes=[('source-1-2', 2)], updated_ids=[3])
+
+        redis_service_mock.return_value.add_to_set.assert_called_once_with(
+            'es_rebuild_changes:concepts', '["delete", "source-1-2", 2]', '["index", 3]'
+        )
+
+
+class ExportTest(OCLTestCase):
+    @override_settings(EXPORT_PARTITIONS=2, EXPORT_PARTITION_MIN_SIZE=2)
+    def test_get_export_partitions(self):
+        from core.sources.tests.factories import OrganizationSourceFactory
+        from core.concepts.tests.factories import ConceptFactory
+        source = OrganizationSourceFactory()
+
+        self.assertIsNone(get_export_partitions(source, 'source'))
+
+        for _ in range(3):
+            ConceptFactory(parent=source)  # the concept and its latest version
+        concept_ids = list(source.concepts.values_list('id', flat=True))
+        partitions = get_export_partitions(source, 'source')
+
+        self.assertEqual(partitions['mappings'], [])
+        self.assertEqual(len(partitions['concepts']), 2)
+        self.assertEqual(partitions['concepts'][0][0], min(concept_ids))
+        self.assertEqual(partitions['concepts'][0][1], partitions['concepts'][1][0])
+        self.assertTrue(partitions['concepts'][1][1] > max(concept_ids))
+
+    def test_get_export_delta(self):
+        from core.sources.tests.factories import OrganizationSourceFactory
+        from core.concepts.tests.factories import ConceptFactory
+        head = OrganizationSourceFactory()
+        kept, removed, added = [ConceptFactory(parent=head).get_latest_version() for _ in range(3)]
+        base_version = OrganizationSourceFactory(
+            mnemonic=head.mnemonic, organization=head.organization, version='v1')
+        base_version.concepts.set([kept, removed])
+        version = OrganizationSourceFactory(mnemonic=head.mnemonic, organization=head.organization, version='v2')
+        version.concepts.set([kept, added])
+
+        concepts_qs, _ = get_export_querysets(version, 'source', base_version)['concepts']
+        removals = get_export_removals(version, 'source', base_version)
+
+        self.assertEqual(list(concepts_qs.values_list('id', flat=True)), [added.id])
+        self.assertEqual(list(removals['concepts'].values_list('id', flat=True)), [removed.id])
+        self.assertFalse(removals['mappings'].exists())
+
+        Concept.objects.filter(id=kept.id).update(updated_at=base_version.last_child_update + timedelta(seconds=1))
+
+        self.assertEqual(sorted(concepts_qs.values_list('id', flat=True)), sorted([kept.id, added.id]))
+
+    def test_exporters_match_serializers(self):
+        from core.concepts.exporters import ConceptExporter
+        from core.concepts.serializers import ConceptVersionDetailSerializer
+        from core.concepts.tests.factories import ConceptFactory, LocalizedTextFactory
+        from core.mappings.exporters import MappingExporter
+        from core.mappings.serializers import MappingDetailSerializer
+        from core.mappings.tests.factories import MappingFactory
+        from core.sources.tests.factories import OrganizationSourceFactory
+        source = OrganizationSourceFactory(default_locale='fr', supported_locales=['fr', 'en'])
+        concept = ConceptFactory(
+            parent=source, extras=dict(foo='bar'),
+            names=[
+                LocalizedTextFactory(locale='en', locale_preferred=True), LocalizedTextFactory(locale='fr'),
+                LocalizedTextFactory(locale='en', type=ISO_639_1)
+            ],
+            descriptions=[LocalizedTextFactory(locale='en', type='Definition')]
+        )
+        other_concept = ConceptFactory(parent=source)
+        MappingFactory(parent=source, from_concept=concept.get_latest_version(), to_concept=other_concept)
+        MappingFactory(
+            parent=source, from_concept=other_concept, to_concept=None, to_concept_code='foo',
+            to_source_url='/orgs/foo/sources/bar/'
+        )
+
+        for queryset, serializer_class, exporter_class in [
+            (
+                Concept.objects.filter(parent=source).prefetch_related(
+                    Prefetch('names', LocalizedText.objects.order_by('id')),
+                    Prefetch('descriptions', LocalizedText.objects.order_by('id'))
+                ),
+                ConceptVersionDetailSerializer, ConceptExporter
+            ),
+            (Mapping.objects.filter(parent=source), MappingDetailSerializer, MappingExporter),
+        ]:
+            self.assertEqual(
+                json.dumps(
+                    [data for batch in exporter_class(queryset).get_batches(2) for data in batch],
+                    cls=encoders.JSONEncoder
+                ),
+                json.dumps(serializer_class(queryset.order_by('id'), many=True).data, cls=encoders.JSONEncoder)
+            )
+
+    @patch('core.common.utils.S3.iter_chunks')
+    def test_copy_export_fragments(self, iter_chunks_mock):
+        fragments = {'a': [b'{"id": 1}', b', {"id": 2}'], 'b': [], 'c': [b'{"id": 3}']}
+        iter_chunks_mock.side_effect = lambda key: fragments[key]
+        out = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+
+        out.write('[')
+        copy_export_fragments(out, ['a', 'b', 'c'], Mock())
+        out.write(']')
+        out.flush()
+
+        self.assertEqual(json.loads(out.buffer.getvalue()), [dict(id=1), dict(id=2), dict(id=3)])
+
+    @patch('core.common.tasks.chord')
+    @patch('core.common.tasks.write_export_file')
+    @patch('core.common.tasks.get_export_partitions')
+    def test_export_source_in_partitions(self, get_export_partitions_mock, write_export_file_mock, chord_mock):
+        from core.sources.tests.factories import OrganizationSourceFactory
+        source = OrganizationSourceFactory(version='v1')
+        get_export_partitions_mock.return_value = dict(concepts=[(1, 10), (10, 20)], mappings=[(5, 6)])
+
+        export_source.apply(args=(source.id, ))
+
+        write_export_file_mock.assert_not_called()
+        fragments_path = source.export_path + '.parts/'
+        self.assertEqual(
+            [signature.args[3:] for signature in chord_mock.call_args[0][0]],
+            [
+                ('concepts', 1, 10, fragments_path + 'concepts-0000.json'),
+                ('concepts', 10, 20, fragments_path + 'concepts-0001.json'),
+                ('mappings', 5, 6, fragments_path + 'mappings-0000.json'),
+            ]
+        )
+        callback = chord_mock.return_value.call_args[0][0]
+        self.assertEqual(callback.args[4:], (fragments_path, dict(
+            concepts=[fragments_path + 'concepts-0000.json', fragments_path + 'concepts-0001.json'],
+            mappings=[fragments_path + 'mappings-0000.json']
+        )))
+        self.assertEqual(
+            [errback.args for errback in callback.options['link_error']],
+            [('sources.Source', source.id, fragments_path, callback.options['task_id'])]
+        )
+        source.refresh_from_db()
+        self.assertEqual(source._background_process_ids, [callback.options['task_id']])
+
+    @patch('core.common.tasks.S3')
+    def test_abort_export(self, s3_mock):
+        from core.sources.tests.factories import OrganizationSourceFactory
+        source = OrganizationSourceFactory(version='v1')
+        source.add_processing('callback-id')
+
+        abort_export('sources.Source', source.id, 'fragments/', 'callback-id')
+
+        s3_mock.delete_objects.assert_called_once_with('fragments/')
+        source.refresh_from_db()
+        self.assertEqual(source._background_process_ids, [])
+
+        abort_export('sources.Source', source.id, 'fragments/', 'callback-id')
+
+        self.assertEqual(s3_mock.delete_objects.call_count, 2)
+
+
+class MembershipIndexTest(OCLTestCase):
+    @patch('core.common.models.sync_memberships')
+    @patch('core.common.models.transaction.on_commit', Mock(side_effect=lambda func: func()))
+    def test_membership_sync_on_m2m_changed(self, sync_memberships_mock):
+        from core.collections.tests.factories import OrganizationCollectionFactory
+        from core.concepts.tests.factories import ConceptFactory
+        concept = ConceptFactory()
+        collection = OrganizationCollectionFactory()
+
+        with patch.object(settings, 'ES_SYNC', True):
+            collection.concepts.add(concept)
+            sync_memberships_mock.delay.assert_called_once_with(
+                'concepts.Concept', 'collections.Collection', [collection.id], [concept.id], True
+            )
+            sync_memberships_mock.reset_mock()
+
+            concept.collection_set.clear()
+            sync_memberships_mock.delay.assert_called_once_with(
+                'concepts.Concept', 'collections.Collection', [collection.id], [concept.id], False
+            )
+
+    def test_get_membership_criterion(self):
+        from core.common.views import BaseAPIView
+        kwargs_filters = dict(collection='c1', collection_version='v1', collection_owner_url='/orgs/org/')
+
+        criterion = BaseAPIView.get_membership_criterion(kwargs_filters)
+
+        self.assertEqual(kwargs_filters, dict(collection='c1'))
+        self.assertEqual(criterion.to_dict(), dict(has_child=dict(type='membership', query=dict(bool=dict(must=[
+            dict(match=dict(collection_version='v1')),
+            dict(match=dict(collection_owner_url='/orgs/org/')),
+            dict(match=dict(collection='c1')),
+        ])))))
+        self.assertIsNone(BaseAPIView.get_membership_criterion(dict(source='s1')))
+
+    def test_get_container_memberships_criterion(self):
+        from core.collections.tests.factories import OrganizationCollectionFactory
+        from core.sources.tests.factories import OrganizationSourceFactory
+        collection = OrganizationCollectionFactory(version='v1')
+        source = OrganizationSourceFactory(version='v1')
+
+        self.assertEqual(
+            MembershipDocumentMixin.get_container_memberships_criterion(collection).to_dict(),
+            dict(bool=dict(must=[
+                dict(match=dict(collection=collection.mnemonic)), dict(match=dict(collection_version='v1')),
+                dict(match=dict(collection_owner_url=collection.parent_url)),
+            ]))
+        )
+        self.assertEqual(
+            MembershipDocumentMixin.get_container_memberships_criterion(source).to_dict(),
+            dict(bool=dict(must=[
+                dict(match=dict(source=source.mnemonic)), dict(match=dict(source_version='v1')),
+                dict(has_parent=dict(parent_type='member', query=dict(bool=dict(must=[
+                    dict(match=dict(owner=source.organization.mnemonic)),
+                    dict(match=dict(owner_type='Organization')),
+                ])))),
+            ]))
+        )
+
+    @patch('elasticsearch_dsl.Search.delete', autospec=True)
+    def test_delete_memberships_by_query(self, delete_mock):
+        from core.concepts.documents import ConceptDocument
+        criterion = MembershipDocumentMixin.get_member_memberships_criterion(1).to_dict()
+
+        ConceptDocument().delete_memberships_by_query([criterion])
+
+        search = delete_mock.call_args[0][0]
+        self.assertEqual(search.to_dict(), dict(query=dict(bool=dict(filter=[
+            dict(term=dict(membership_join='membership')),
+            dict(bool=dict(should=[dict(parent_id=dict(type='membership', id=1))], minimum_should_match=1)),
+        ]))))
+        self.assertEqual(search._params, dict(conflicts='proceed', refresh=True))
+
+    @patch('core.common.tasks.registry')
+    def test_delete_memberships(self, registry_mock):
+        document_class_mock = Mock()
+        registry_mock.get_documents = Mock(return_value=[document_class_mock])
+        criteria = [MembershipDocumentMixin.get_member_memberships_criterion(1).to_dict()]
+
+        delete_memberships(['concepts.Concept'], criteria)
+
+        registry_mock.get_documents.assert_called_once_with([Concept])
+        document_class_mock.return_value.delete_memberships_by_query.assert_called_once_with(criteria)
+
+    @patch('core.common.services.S3.delete_objects', Mock())
+    @patch('core.common.models.record_rebuild_changes', Mock())
+    @patch('core.common.models.queue_index_sync', Mock())
+    @patch('core.common.models.delete_memberships')
+    @patch('core.common.models.transaction.on_commit', Mock(side_effect=lambda func: func()))
+    def test_delete_memberships_on_container_delete(self, delete_memberships_mock):
+        from core.collections.tests.factories import OrganizationCollectionFactory
+        collection = OrganizationCollectionFactory()
+        collection_v1 = OrganizationCollectionFactory(
+            mnemonic=collection.mnemonic, organization=collection.organization, version='v1', is_latest_version=False
+        )
+        collection_v1_criterion = MembershipDocumentMixin.get_container_memberships_criterion(collection_v1).to_dict()
+        collection_criterion = MembershipDocumentMixin.get_container_memberships_criterion(collection).to_dict()
+
+        with patch.object(settings, 'ES_SYNC', True):
+            collection_v1.delete()
+
+            delete_memberships_mock.delay.assert_called_once_with(
+                ['concepts.Concept', 'mappings.Mapping'], [collection_v1_criterion]
+            )
+            delete_memberships_mock.reset_mock()
+
+            collection_v1 = OrganizationCollectionFactory(
+                mnemonic=collection.mnemonic, organization=collection.organization, version='v1',
+                is_latest_version=False
+            )
+            collection.delete()
+
+            delete_memberships_mock.delay.assert_called_once_with(
+                ['concepts.Concept', 'mappings.Mapping'], ANY
+            )
+            self.assertCountEqual(
+                delete_memberships_mock.delay.call_args[0][1], [collection_criterion, collection_v1_criterion]
+            )
+
+    @patch('core.common.models.record_rebuild_changes', Mock())
+    @patch('core.common.models.queue_index_sync', Mock())
+    @patch('core.common.models.delete_memberships')
+    @patch('core.common.models.transaction.on_commit', Mock(side_effect=lambda func: func()))
+    def test_delete_memberships_on_member_delete(self, delete_memberships_mock):
+        from core.concepts.tests.factories import ConceptFactory
+        concept = ConceptFactory()
+        concept_id = concept.id
+
+        with patch.object(settings, 'ES_SYNC', True):
+            concept.delete()
+
+        delete_memberships_mock.delay.assert_any_call(
+            ['concepts.Concept'], [dict(parent_id=dict(type='membership', id=concept_id))]
+        )
+
+
+class SearchResponseCacheTest(OCLTestCase):
+    @patch('core.common.services.RedisService')
+    def test_get_key(self, redis_service_mock):
+        redis_service_mock.return_value.get = Mock(side_effect=[b'3', None, b'3'])
+        cache = SearchResponseCache()
+
+        key = cache.get_key('/orgs/CIEL/sources/CIEL/', dict(params=[('q', ['malaria'])], visibility='public'))
+        global_key = cache.get_key(None, dict(params=[('q', ['malaria'])], visibility='public'))
+
+        self.assertTrue(key.startswith('search_response:/orgs/CIEL/sources/CIEL/:3:'))
+        self.assertTrue(global_key.startswith('search_response:*:0:'))
+        self.assertEqual(key.split(':')[-1], global_key.split(':')[-1])
+        self.assertEqual(
+            key, cache.get_key('/orgs/CIEL/sources/CIEL/', dict(visibility='public', params=[('q', ['malaria'])]))
+        )
+        redis_service_mock.return_value.get.assert_any_call('search_generation:/orgs/CIEL/sources/CIEL/')
+        redis_service_mock.return_value.get.assert_any_call('search_generation:*')
+
+    @patch('core.common.services.RedisService')
+    def test_invalidate(self, redis_service_mock):
+        SearchResponseCache().invalidate('/orgs/CIEL/sources/CIEL/')
+
+        self.assertEqual(
+            sorted(redis_service_mock.return_value.increment.call_args[0]),
+            ['search_generation:*', 'search_generation:/orgs/CIEL/sources/CIEL/']
+        )
+
+    @patch('core.common.tasks.SearchResponseCache')
+    def test_invalidate_search_responses(self, search_response_cache_mock):
+        from core.concepts.tests.factories import ConceptFactory
+        from core.sources.tests.factories import OrganizationSourceFactory
+        source = OrganizationSourceFactory(version='v1')
+        concept1 = ConceptFactory(parent=source)
+        concept2 = ConceptFactory(parent=source)
+        search_response_cache_mock.is_on = Mock(return_value=True)
+
+        invalidate_search_responses(Concept, [concept1.id, concept2.id])
+
+        search_response_cache_mock.return_value.invalidate.assert_called_once_with(source.versioned_object_url)
+
+        search_response_cache_mock.reset_mock()
+        invalidate_search_responses(Source, [source.id])
+
+        search_response_cache_mock.return_value.invalidate.assert_called_once_with(source.versioned_object_url)
+
+        search_response_cache_mock.is_on = Mock(return_value=False)
+        search_response_cache_mock.reset_mock()
+        invalidate_search_responses(Source, [source.id])
+
+        search_response_cache_mock.return_value.invalidate.assert_not_called()
+
+    def test_get_response_cache_scope(self):
+        from core.common.views import BaseAPIView
+        view = BaseAPIView()
+
+        view.kwargs = dict(org='CIEL', source='CIEL', version='v1')
+        self.assertEqual(view.get_response_cache_scope(), '/orgs/CIEL/sources/CIEL/')
+        view.kwargs = dict(user='jdoe', collection='c1')
+        self.assertEqual(view.get_response_cache_scope(), '/users/jdoe/collections/c1/')
+        view.kwargs = dict()
+        self.assertIsNone(view.get_response_cache_scope())
+
+
+class DBSearchTest(OCLTestCase):
+    def test_search(self):
+        from core.concepts.tests.factories import ConceptFactory, LocalizedTextFactory
+        from core.concepts.views import ConceptBaseView
+        concept1 = ConceptFactory(
+            mnemonic='c1', datatype='Coded', names=[LocalizedTextFactory(name='Malaria smear', locale='en')]
+        ).get_latest_version()
+        concept2 = ConceptFactory(
+            mnemonic='c2', datatype='N/A', names=[LocalizedTextFactory(name='Smear test malaria', locale='en'),
+                                                  LocalizedTextFactory(name='Paludisme', locale='fr')]
+        ).get_latest_version()
+        ConceptFactory(mnemonic='c3', datatype='Coded', names=[LocalizedTextFactory(name='Fever', locale='en')])
+        # like the list views (and the es default filters), versioned objects and older versions aside
+        queryset = Concept.objects.filter(mnemonic__in=['c1', 'c2', 'c3'], is_latest_version=True)
+
+        def search(**kwargs):
+            return DBSearch(
+                queryset, ConceptBaseView.es_fields, ConceptBaseView.db_search_fields,
+                ConceptBaseView.db_full_text_fields, lowercase_fields=['datatype'], **kwargs
+            )
+
+        self.assertEqual(list(search(search_str='*laria*').get_results('id')), [concept1, concept2])
+        self.assertEqual(list(search(search_str='malaria smear').get_results('-id')), [concept2, concept1])
+        self.assertEqual(
+            list(search(search_str='malaria', faceted_filters=dict(datatype='coded')).get_results()), [concept1]
+        )
+        self.assertEqual(
+            list(search(search_str='malaria', faceted_filters=dict(locale='!fr')).get_results()), [concept1]
+        )
+        self.assertEqual(list(search(search_str='Paludisme', exact_match=True).get_results()), [concept2])
+        self.assertEqual(
+            search(search_str='malaria', faceted_filters=dict(datatype='Coded')).get_facets(
+                dict(datatype='datatype', locale='locale')
+            ),
+            dict(datatype=[('coded', 1, True), ('n/a', 1, False)], locale=[('en', 1, False)])
+        )
+
+
+class SearchViewTest(OCLTestCase):
+    @staticmethod
+    def get_view(query_string='', **headers):
+        from core.concepts.views import ConceptListView
+        view = ConceptListView()
+        view.request = Request(APIRequestFactory().get('/concepts/?' + query_string, **headers))
+        view.kwargs = dict()
+        return view
+
+    @staticmethod
+    def get_search_response(search, buckets):
+        from core.concepts.search import ConceptSearch
+        return Response(search, dict(hits=dict(total=dict(value=2, relation='eq'), hits=[]), aggregations={
+            '_filter_' + name: {'doc_count': 2, name: dict(buckets=buckets.get(name, []))}
+            for name in ConceptSearch.facets
+        }))
+
+    def test_should_aggregate_facets(self):
+        self.assertTrue(self.get_view(HTTP_INCLUDEFACETS='true').should_aggregate_facets())
+        self.assertFalse(self.get_view().should_aggregate_facets())
+
+    def test_aggregate_facets(self):
+        aggs = self.get_view().aggregate_facets(Search()).to_dict()['aggs']
+
+        self.assertEqual(
+            aggs['_filter_datatype'],
+            dict(filter=dict(match_all={}), aggs=dict(datatype=dict(terms=dict(field='datatype'))))
+        )
+        self.assertEqual(aggs['_filter_locale']['filter'], dict(match_all={}))
+
+        aggs = self.get_view('datatype=Coded&locale=en').aggregate_facets(Search()).to_dict()['aggs']
+
+        # each facet is filtered by the other facets' filters only
+        self.assertEqual(
+            aggs['_filter_datatype'],
+            dict(filter=dict(match=dict(locale='en')), aggs=dict(datatype=dict(terms=dict(field='datatype'))))
+        )
+        self.assertEqual(aggs['_filter_locale']['filter'], dict(match=dict(datatype='Coded')))
+        self.assertEqual(
+            aggs['_filter_retired']['filter'],
+            dict(bool=dict(must=[dict(match=dict(datatype='Coded')), dict(match=dict(locale='en'))]))
+        )
+
+    def test_get_facets_from_search_response(self):
+        view = self.get_view('datatype=Coded')
+        response = self.get_search_response(
+            view.aggregate_facets(Search()),
+            dict(
+                datatype=[dict(key='Coded', doc_count=1), dict(key='N/A', doc_count=1)],
+                locale=[dict(key='en', doc_count=2)]
+            )
+        )
+
+        facets = view.get_facets_from_search_response(response)
+
+        self.assertEqual(facets['datatype'], [('Coded', 1, True), ('N/A', 1, False)])
+        self.assertEqual(facets['locale'], [('en', 2, False)])
+        self.assertEqual(facets['retired'], [])
+
+    def test_search_results_faceted_criterion(self):
+        faceted_queries = [dict(match=dict(datatype='Coded')), dict(match=dict(locale='en'))]
+
+        search = self.get_view(
+            'datatype=Coded&locale=en', HTTP_INCLUDEFACETS='true')._BaseAPIView__search_results.to_dict()
+
+        self.assertEqual(search['post_filter'], dict(bool=dict(must=faceted_queries)))
+        for query in faceted_queries:
+            self.assertNotIn(query, search['query']['bool']['must'])
+
+        search = self.get_view('datatype=Coded&locale=en')._BaseAPIView__search_results.to_dict()
+
+        self.assertNotIn('post_filter', search)
+        for query in faceted_queries:
+            self.assertIn(query, search['query']['bool']['must'])
+
+    @patch('elasticsearch_dsl.Search.execute', autospec=True)
+    def test_get_facets_without_search(self, execute_mock):
+        execute_mock.side_effect = lambda search: self.get_search_response(
+            search, dict(datatype=[dict(key='Coded', doc_count=2)])
+        )
+        view = self.get_view(HTTP_INCLUDEFACETS='true')
+
+        facets = view.get_facets()
+
+        execute_mock.assert_called_once()
+        search = execute_mock.call_args[0][0].to_dict()
+        self.assertEqual(search['size'], 0)
+        self.assertEqual(
+            search['aggs']['_filter_datatype']['aggs'], dict(datatype=dict(terms=dict(field='datatype')))
+        )
+        self.assertEqual(facets['datatype'], [('Coded', 2, False)])
+        self.assertEqual(facets['collection_membership'], [])
+        self.assertFalse('collection' in facets)
+
+        self.assertEqual(view.get_facets(), facets)
+        execute_mock.assert_called_once()
+
+    def test_is_cursor_pagination(self):
+        self.assertTrue(self.get_view('cursor=true').is_cursor_pagination())
+        self.assertTrue(self.get_view('cursor=' + encode_search_cursor([1.2, '12'])).is_cursor_pagination())
+        self.assertFalse(self.get_view('page=2').is_cursor_pagination())
+
+    def test_get_search_after(self):
+        self.assertIsNone(self.get_view('cursor=true').get_search_after())
+        self.assertIsNone(self.get_view('cursor=*').get_search_after())
+        self.assertEqual(
+            self.get_view('q=malaria&cursor=' + encode_search_cursor([1.2, '12'])).get_search_after(), [1.2, '12']
+        )
+        self.assertEqual(
+            self.get_view('sortAsc=name&cursor=' + encode_search_cursor(['malaria', '12'])).get_search_after(),
+            ['malaria', '12']
+        )
+        self.assertEqual(
+            self.get_view('sortAsc=name&cursor=' + encode_search_cursor([None, '12'])).get_search_after(),
+            [None, '12']
+        )
+
+        for query_string in [
+                'cursor=foobar',
+                'cursor=' + encode_search_cursor(dict(a=1)),
+                'cursor=' + encode_search_cursor([1.2]),
+                'cursor=' + encode_search_cursor([1.2, '12', 'foo']),
+                'cursor=' + encode_search_cursor([1.2, 12]),
+                'cursor=' + encode_search_cursor(['malaria', '12']),
+                'sortAsc=name&cursor=' + encode_search_cursor([dict(a=1), '12']),
+                'sortAsc=name&cursor=' + encode_search_cursor([True, '12']),
+        ]:
+            with self.assertRaises(Http400):
+                self.get_view(query_string).get_search_after()
+
+    def test_search_results_cursor_sort(self):
+        search = self.get_view('q=malaria&cursor=true')._BaseAPIView__search_results.to_dict()
+        self.assertEqual(search['sort'], [dict(_score=dict(order='desc')), dict(db_id='asc')])
+
+        search = self.get_view('q=malaria&sortDesc=name&cursor=true')._BaseAPIView__search_results.to_dict()
+        self.assertEqual(search['sort'], [dict(name=dict(order='desc')), dict(db_id='asc')])
+
+        search = self.get_view('q=malaria&sortDesc=name')._BaseAPIView__search_results.to_dict()
+        self.assertEqual(search['sort'], [dict(name=dict(order='desc'))])
+
+    def test_get_cursor_headers(self):
+        cursor = encode_search_cursor([1.2, '12'])
+        request = Request(APIRequestFactory().get('/concepts/?q=malaria&page=2&cursor=true'))
+        paginator = CustomPaginator(request=request, total_count=10, queryset=[1, 2], page_size=2)
+
+        self.assertEqual(
+            paginator.get_cursor_headers(cursor),
+            dict(
+                num_found=10, num_returned=2,
+                next='http://testserver/concepts/?' + urlencode([('q', 'malaria'), ('cursor', cursor)])
+            )
+        )
+        self.assertEqual(paginator.get_cursor_headers(None), dict(num_found=10, num_returned=2))
+
+    def test_is_db_search(self):
+        view = self.get_view()
+
+        self.assertFalse(view.is_db_search())
+        with override_settings(SEARCH_BACKEND='postgres'):
+            self.assertTrue(view.is_db_search())
+            view.db_search_fields = None
+            self.assertFalse(view.is_db_search())
+
+    def test_get_db_search(self):
+        view = self.get_view('q=*malaria*&exact_match=on&datatype=Coded')
+
+        db_search = view.get_db_search(Concept.objects.filter(is_latest_version=True))
+
+        self.assertEqual(db_search.search_str, 'malaria')
+        self.assertTrue(db_search.exact_match)
+        self.assertEqual(db_search.faceted_filters, dict(datatype='Coded'))
+        self.assertEqual(db_search.lowercase_fields, ['id', 'name', 'concept_class', 'datatype', 'source', 'owner'])
+
+    @override_settings(SEARCH_BACKEND='postgres')
+    def test_get_db_search_results_qs(self):
+        from core.concepts.tests.factories import ConceptFactory, LocalizedTextFactory
+        concept1 = ConceptFactory(
+            datatype='Coded', names=[LocalizedTextFactory(name='Malaria smear')]).get_latest_version()
+        concept2 = ConceptFactory(
+            datatype='N/A', names=[LocalizedTextFactory(name='Smear test malaria')]).get_latest_version()
+        queryset = Concept.objects.filter(id__in=[concept1.id, concept2.id])
+
+        view = self.get_view('q=malaria&sortAsc=name')
+        self.assertEqual(list(view.get_db_search_results_qs(queryset)), [concept1, concept2])
+        view = self.get_view('q=malaria&sortDesc=name')
+        self.assertEqual(list(view.get_db_search_results_qs(queryset)), [concept2, concept1])
+
+        view = self.get_view('q=malaria&sortAsc=foo&datatype=coded', HTTP_INCLUDEFACETS='true')
+
+        self.assertEqual(list(view.get_db_search_results_qs(queryset)), [concept1])
+        self.assertIsNotNone(view.db_search)
+        facets = view.get_facets()
+        self.assertEqual(facets['datatype'], [('coded', 1, True), ('n/a', 1, False)])
+        self.assertEqual(facets['locale'], [('en', 1, False)])
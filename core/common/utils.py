@@ -1,3 +1,5 @@
+import base64
+import io
 import json
 import os
 import random
@@ -9,14 +11,15 @@ from urllib import parse
 import requests
 from dateutil import parser
 from django.conf import settings
+from django.db.models import Min, Max, Count, Q
 from django.urls import NoReverseMatch, reverse, get_resolver, resolve, Resolver404
 from djqscsv import csv_file_for
-from pydash import flatten
+from pydash import flatten, get
 from requests.auth import HTTPBasicAuth
 from rest_framework.utils import encoders
 
-from core.common.constants import UPDATED_SINCE_PARAM, BULK_IMPORT_QUEUES_COUNT, TEMP
-from core.common.services import S3
+from core.common.constants import UPDATED_SINCE_PARAM, BULK_IMPORT_QUEUES_COUNT, TEMP, EXPORT_BATCH_SIZE
+from core.common.services import S3, S3MultipartUpload
 
 
 def get_latest_dir_in_path(path):  # pragma: no cover
@@ -184,99 +187,180 @@ def get_class(kls):
     return _module
 
 
-def write_export_file(
-        version, resource_type, resource_serializer_type, logger
-):  # pylint: disable=too-many-statements,too-many-locals
-    cwd = cd_temp()
-    logger.info('Writing export file to tmp directory: %s' % cwd)
+def write_export_file(  # pylint: disable=too-many-arguments
+        version, resource_type, resource_serializer_type, logger, fragments=None, base_version=None
+):
+    """
+    Streams export.json of the version, zipped, to S3 (version.get_export_path) while it is serialized.
+    Memory use is bounded by a batch of serialized rows and an upload part, nothing is written to disk.
+    fragments: concepts/mappings => S3 keys of their serialized partitions (write_export_fragment), in order,
+    copied instead of serializing the rows.
+    base_version: for a delta export, with only the concepts and mappings changed since base_version and
+    removed_concepts/removed_mappings.
+    """
+    s3_key = version.get_export_path(base_version)
+    logger.info('Streaming %s version %s export to %s...' % (resource_type, version.version, s3_key))
+    with S3MultipartUpload(s3_key) as upload, zipfile.ZipFile(upload, 'w', zipfile.ZIP_DEFLATED) as _zip:
+        with io.TextIOWrapper(_zip.open('export.json', 'w', force_zip64=True), encoding='utf-8') as out:
+            write_export_json(
+                out, version, resource_type, resource_serializer_type, logger, fragments, base_version)
+
+    logger.info('Uploaded to %s.' % S3.url_for(s3_key))
+
 
+def write_export_json(  # pylint: disable=too-many-arguments
+        out, version, resource_type, resource_serializer_type, logger, fragments=None, base_version=None
+):
     logger.info('Found %s version %s.  Looking up resource...' % (resource_type, version.version))
     resource = version.head
     logger.info('Found %s %s.  Serializing attributes...' % (resource_type, resource.mnemonic))
 
     resource_serializer = get_class(resource_serializer_type)(version)
     data = resource_serializer.data
+    if base_version:
+        data['base_version'] = base_version.version
     resource_string = json.dumps(data, cls=encoders.JSONEncoder)
     logger.info('Done serializing attributes.')
 
-    batch_size = 1000
+    querysets = get_export_querysets(version, resource_type, base_version)
+    for index, (name, (queryset, exporter_class)) in enumerate(querysets.items()):
+        out.write(('%s, "%s": [' % (resource_string[:-1], name)) if index == 0 else '], "%s": [' % name)
+        if fragments is None:
+            logger.info('Serializing %s %s in batches of %d...' % (resource_type, name, EXPORT_BATCH_SIZE))
+            write_export_batches(out, queryset, exporter_class, EXPORT_BATCH_SIZE, name, logger)
+        else:
+            copy_export_fragments(out, fragments[name], logger)
+
+    if base_version:
+        for name, queryset in get_export_removals(version, resource_type, base_version).items():
+            out.write('], "removed_%s": [' % name)
+            write_export_removals(out, queryset, name, logger)
+
+    out.write(']}')
+
+
+def get_export_members(version, resource_type):
     concepts_qs = version.concepts
     mappings_qs = version.mappings
     if resource_type != 'collection':
         concepts_qs = concepts_qs.filter(is_active=True)
         mappings_qs = mappings_qs.filter(is_active=True)
 
-    total_concepts = concepts_qs.count()
-    total_mappings = mappings_qs.count()
+    return dict(concepts=concepts_qs, mappings=mappings_qs)
 
-    with open('export.json', 'w') as out:
-        out.write('%s, "concepts": [' % resource_string[:-1])
 
-    if total_concepts:
-        logger.info(
-            '%s has %d concepts. Getting them in batches of %d...' % (resource_type.title(), total_concepts, batch_size)
-        )
-        concept_serializer_class = get_class('core.concepts.serializers.ConceptVersionDetailSerializer')
-        for start in range(0, total_concepts, batch_size):
-            end = min(start + batch_size, total_concepts)
-            logger.info('Serializing concepts %d - %d...' % (start+1, end))
-            concept_versions = concepts_qs.prefetch_related(
-                'names', 'descriptions').select_related('parent__organization', 'parent__user')[start:end]
-            concept_serializer = concept_serializer_class(concept_versions, many=True)
-            concept_data = concept_serializer.data
-            concept_string = json.dumps(concept_data, cls=encoders.JSONEncoder)
-            concept_string = concept_string[1:-1]
-            with open('export.json', 'a') as out:
-                out.write(concept_string)
-                if end != total_concepts:
-                    out.write(', ')
-        logger.info('Done serializing concepts.')
-    else:
-        logger.info('%s has no concepts to serialize.' % (resource_type.title()))
+def get_export_querysets(version, resource_type, base_version=None):
+    """
+    concepts and mappings of the export of version, in this order, with their exporter classes.
+    With a base_version, only the ones not in it or updated since it was last changed.
+    """
+    members = get_export_members(version, resource_type)
+    concepts_qs = members['concepts']
+    mappings_qs = members['mappings']
+    if base_version:
+        base_members = get_export_members(base_version, resource_type)
+        base_last_update = base_version.last_child_update
+        concepts_qs = concepts_qs.filter(
+            ~Q(id__in=base_members['concepts'].values('id')) | Q(updated_at__gt=base_last_update))
+        mappings_qs = mappings_qs.filter(
+            ~Q(id__in=base_members['mappings'].values('id')) | Q(updated_at__gt=base_last_update))
+
+    return dict(
+        concepts=(concepts_qs, get_class('core.concepts.exporters.ConceptExporter')),
+        mappings=(mappings_qs, get_class('core.mappings.exporters.MappingExporter')),
+    )
+
+
+def get_export_partitions(version, resource_type):
+    """
+    concepts/mappings => (start_id, end_id) ranges splitting them in up to settings.EXPORT_PARTITIONS
+    partitions of settings.EXPORT_PARTITION_MIN_SIZE rows or more.
+    None when both fit in a single partition, the version is then not worth splitting.
+    """
+    partitions = dict()
+    for name, (queryset, _) in get_export_querysets(version, resource_type).items():
+        bounds = queryset.aggregate(min_id=Min('id'), max_id=Max('id'), count=Count('id'))
+        if not bounds['count']:
+            partitions[name] = []
+            continue
+        partitions_count = max(1, min(
+            settings.EXPORT_PARTITIONS, bounds['count'] // settings.EXPORT_PARTITION_MIN_SIZE))
+        partition_size = (bounds['max_id'] - bounds['min_id']) // partitions_count + 1
+        partitions[name] = [
+            (bounds['min_id'] + i * partition_size, bounds['min_id'] + (i + 1) * partition_size)
+            for i in range(partitions_count)
+        ]
+
+    if all(len(ranges) <= 1 for ranges in partitions.values()):
+        return None
+
+    return partitions
+
 
-    with open('export.json', 'a') as out:
-        out.write('], "mappings": [')
+def get_export_removals(version, resource_type, base_version):
+    """concepts and mappings of base_version whose versioned object has no version in version anymore"""
+    members = get_export_members(version, resource_type)
+    return {
+        name: queryset.exclude(versioned_object_id__in=members[name].values('versioned_object_id'))
+        for name, queryset in get_export_members(base_version, resource_type).items()
+    }
 
-    if total_mappings:
-        logger.info(
-            '%s has %d mappings. Getting them in batches of %d...' % (resource_type.title(), total_mappings, batch_size)
+
+def write_export_removals(out, queryset, name, logger):
+    """Writes the removed rows of queryset as comma separated {id, url} of their versioned objects"""
+    total = 0
+    for mnemonic, url in queryset.values_list('mnemonic', 'versioned_object__uri').order_by('id').iterator():
+        if total:
+            out.write(', ')
+        out.write(json.dumps(dict(id=mnemonic, url=url)))
+        total += 1
+    logger.info('Done writing %d removed %s.' % (total, name))
+
+    return total
+
+
+def write_export_fragment(  # pylint: disable=too-many-arguments
+        key, version, resource_type, name, start_id, end_id, logger
+):
+    """
+    Streams the concepts or mappings (name) of the export of version with start_id <= id < end_id to S3 (key),
+    as comma separated JSON objects. Returns their count.
+    """
+    queryset, exporter_class = get_export_querysets(version, resource_type)[name]
+    with S3MultipartUpload(key) as upload, io.TextIOWrapper(upload, encoding='utf-8') as out:
+        return write_export_batches(
+            out, queryset.filter(id__gte=start_id, id__lt=end_id), exporter_class, EXPORT_BATCH_SIZE, name,
+            logger
         )
-        mapping_serializer_class = get_class('core.mappings.serializers.MappingDetailSerializer')
-        for start in range(0, total_mappings, batch_size):
-            end = min(start + batch_size, total_mappings)
-            logger.info('Serializing mappings %d - %d...' % (start+1, end))
-            mappings = mappings_qs.select_related(
-                'parent__organization', 'parent__user', 'from_concept', 'to_concept',
-                'from_source__organization', 'from_source__user',
-                'to_source__organization', 'to_source__user',
-            )[start:end]
-            mapping_serializer = mapping_serializer_class(mappings, many=True)
-            mapping_data = mapping_serializer.data
-            mapping_string = json.dumps(mapping_data, cls=encoders.JSONEncoder)
-            mapping_string = mapping_string[1:-1]
-            with open('export.json', 'a') as out:
-                out.write(mapping_string)
-                if end != total_mappings:
-                    out.write(', ')
-        logger.info('Done serializing mappings.')
-    else:
-        logger.info('%s has no mappings to serialize.' % (resource_type.title()))
 
-    with open('export.json', 'a') as out:
-        out.write(']}')
 
-    with zipfile.ZipFile('export.zip', 'w', zipfile.ZIP_DEFLATED) as _zip:
-        _zip.write('export.json')
+def copy_export_fragments(out, keys, logger):
+    """Joins the S3 fragments (write_export_fragment) with commas into out, skipping the empty ones"""
+    is_empty = True
+    out.flush()
+    for key in keys:
+        logger.info('Copying %s...' % key)
+        for index, chunk in enumerate(S3.iter_chunks(key)):
+            if index == 0 and not is_empty:
+                out.buffer.write(b', ')
+            out.buffer.write(chunk)
+            is_empty = False
 
-    file_path = os.path.abspath('export.zip')
-    logger.info(file_path)
-    logger.info('Done compressing.  Uploading...')
 
-    s3_key = version.export_path
-    S3.upload_file(key=s3_key, file_path=file_path, binary=True)
-    uploaded_path = S3.url_for(s3_key)
-    logger.info('Uploaded to %s.' % uploaded_path)
-    os.chdir(cwd)
+def write_export_batches(  # pylint: disable=too-many-arguments
+        out, queryset, exporter_class, batch_size, name, logger
+):
+    """Writes the rows of queryset as comma separated JSON objects, encoded batch_size rows at a time"""
+    total = 0
+    for batch in exporter_class(queryset).get_batches(batch_size):
+        logger.info('Serialized %s %d - %d.' % (name, total + 1, total + len(batch)))
+        if total:
+            out.write(', ')
+        out.write(json.dumps(batch, cls=encoders.JSONEncoder)[1:-1])
+        total += len(batch)
+    logger.info('Done serializing %d %s.' % (total, name))
+
+    return total
 
 
 def get_api_base_url():
@@ -449,6 +533,38 @@ def separate_version(expression):
     return None, expression
 
 
+def chunked_queryset(queryset, chunk_size=1000):
+    """
+    Yields the rows (instances or values() dicts) of a queryset in lists of chunk_size, by id (keyset pagination,
+    no OFFSET scans). Unlike queryset.iterator(), prefetch_related is kept.
+    """
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not chunk:
+            break
+
+        yield chunk
+        last_id = get(chunk[-1], 'id')
+
+
+def chunked_queryset_iterator(queryset, chunk_size=1000):
+    for chunk in chunked_queryset(queryset, chunk_size):
+        yield from chunk
+
+
+def encode_search_cursor(sort_values):
+    return base64.urlsafe_b64encode(json.dumps(sort_values).encode()).decode()
+
+
+def decode_search_cursor(cursor):
+    sort_values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if not isinstance(sort_values, list):
+        raise ValueError(cursor)
+
+    return sort_values
+
+
 def generate_temp_version():
     return "{}-{}".format(TEMP, str(uuid.uuid4())[:8])
 
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from elasticsearch_dsl import Q
@@ -8,10 +9,16 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from core.common.constants import SEARCH_PARAM, LIST_DEFAULT_LIMIT, CSV_DEFAULT_LIMIT, \
-    LIMIT_PARAM, NOT_FOUND, MUST_SPECIFY_EXTRA_PARAM_IN_BODY, INCLUDE_RETIRED_PARAM, VERBOSE_PARAM, HEAD
+    LIMIT_PARAM, NOT_FOUND, MUST_SPECIFY_EXTRA_PARAM_IN_BODY, INCLUDE_RETIRED_PARAM, VERBOSE_PARAM, HEAD, \
+    INCLUDE_EXTRAS_PARAM, SEARCH_HIT_SUMMARY_FIELD, CURSOR_PARAM, SEARCH_CURSOR_TIEBREAKER, INVALID_SEARCH_CURSOR, \
+    MEMBER_DOCUMENT, MEMBERSHIP_DOCUMENT, MEMBERSHIP_FILTERS, DB_SEARCH_BACKEND
+from core.common.db_search import DBSearch
 from core.common.mixins import PathWalkerMixin
+from core.common.search import get_search_criterion
+from core.common.services import SearchResponseCache
 from core.common.serializers import RootSerializer
-from core.common.utils import compact_dict_by_values, to_snake_case, to_camel_case
+from core.common.exceptions import Http400
+from core.common.utils import compact_dict_by_values, to_snake_case, encode_search_cursor, decode_search_cursor
 from core.concepts.permissions import CanViewParentDictionary, CanEditParentDictionary
 from core.orgs.constants import ORG_OBJECT_TYPE
 from core.users.constants import USER_OBJECT_TYPE
@@ -35,6 +42,15 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
     exact_match = 'exact_match'
     facet_class = None
     total_count = 0
+    search_hits_enabled = False
+    response_cache_enabled = False
+    db_search_fields = None  # es field => db lookup(s), for the postgres search backend, see DBSearch
+    db_full_text_fields = None
+    db_search = None
+    search_facets = None
+    is_cursor_paginated = False
+    next_search_cursor = None
+    is_search_hits_result = False
 
     def _should_exclude_retired_from_search_results(self):
         if self.is_owner_document_model():
@@ -93,6 +109,8 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
 
     def filter_queryset(self, queryset):
         if self.is_searchable and self.should_perform_es_search():
+            if self.is_db_search():
+                return self.get_db_search_results_qs(queryset)
             return self.get_search_results_qs()
 
         return super().filter_queryset(queryset).order_by(self.default_qs_sort_attr)
@@ -139,8 +157,13 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
     def get_search_string(self):
         return self.request.query_params.dict().get(SEARCH_PARAM, '')
 
-    def get_wildcard_search_string(self):
-        return "*{}*".format(self.get_search_string())
+    def get_ngram_search_fields(self):
+        return [field for field, config in get(self, 'es_fields', dict()).items() if config.get('ngram', False)]
+
+    def get_wildcard_search_criterion(self):
+        return get_search_criterion(
+            self.get_search_string(), self.get_searchable_fields(), self.get_ngram_search_fields()
+        )
 
     def get_sort_attr(self):
         sort_field, desc = self.get_sort_and_desc()
@@ -164,9 +187,7 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
 
         return criterion
 
-    def get_faceted_criterion(self):
-        filters = self.get_faceted_filters()
-
+    def get_faceted_criteria(self):
         def get_query(attr, val):
             not_query = val.startswith('!')
             vals = val.replace('!', '', 1).split(',')
@@ -182,13 +203,14 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
 
             return criteria
 
-        if filters:
-            first_filter = filters.popitem()
-            criterion = get_query(first_filter[0], first_filter[1])
-            for field, value in filters.items():
-                criterion &= get_query(field, value)
+        return {field: get_query(field, value) for field, value in self.get_faceted_filters().items()}
 
-            return criterion
+    def get_faceted_criterion(self):
+        criterion = None
+        for query in self.get_faceted_criteria().values():
+            criterion = query if criterion is None else criterion & query
+
+        return criterion
 
     def get_faceted_filters(self, split=False):
         faceted_filters = dict()
@@ -242,22 +264,67 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
                 filters['source_version'] = HEAD
         return filters
 
+    @staticmethod
+    def get_membership_criterion(kwargs_filters):
+        """
+        Pops the container version filters out of kwargs_filters, they are matched on the membership (child)
+        documents of concepts/mappings, along with the container they belong to.
+        """
+        filters = {key: kwargs_filters.pop(key) for key in MEMBERSHIP_FILTERS if key in kwargs_filters}
+        if not filters:
+            return None
+
+        if 'source_version' in filters and 'source' in kwargs_filters:
+            filters['source'] = kwargs_filters['source']
+        if 'collection_version' in filters and 'collection' in kwargs_filters:
+            filters['collection'] = kwargs_filters['collection']
+
+        return Q(
+            'has_child', type=MEMBERSHIP_DOCUMENT,
+            query=Q('bool', must=[Q('match', **{key: value}) for key, value in filters.items()])
+        )
+
+    def should_aggregate_facets(self):
+        return bool(self.should_include_facets() and self.facet_class)
+
+    def aggregate_facets(self, search):
+        """
+        Adds a terms aggregation per facet of facet_class to the search, filtered by the other facets' filters
+        (the faceted criterion itself goes in post_filter), so that hits, total and facets come in one request.
+        """
+        faceted_criteria = self.get_faceted_criteria()
+        for name, facet in self.facet_class.facets.items():
+            field = to_snake_case(name)
+            agg_filter = Q('match_all')
+            for faceted_field, criterion in faceted_criteria.items():
+                if faceted_field != field:
+                    agg_filter &= criterion
+            search.aggs.bucket('_filter_' + name, 'filter', filter=agg_filter).bucket(name, facet.get_aggregation())
+
+        return search
+
+    def get_facets_from_search_response(self, response):
+        faceted_filters = self.get_faceted_filters(True)
+        return {
+            name: facet.get_values(
+                getattr(getattr(response.aggregations, '_filter_' + name), name),
+                faceted_filters.get(to_snake_case(name), [])
+            ) for name, facet in self.facet_class.facets.items()
+        }
+
     def get_facets(self):
         facets = dict()
         is_source_child_document_model = self.is_source_child_document_model()
-        if self.should_include_facets() and self.facet_class:
-            faceted_filters = {to_camel_case(k): v for k, v in self.get_faceted_filters(True).items()}
-            filters = {
-                **self.default_filters, **self.get_facet_filters_from_kwargs(), **faceted_filters, 'retired': False
-            }
-
-            if not self._should_exclude_retired_from_search_results() or not is_source_child_document_model:
-                filters.pop('retired')
-
-            searcher = self.facet_class(  # pylint: disable=not-callable
-                self.get_search_string(), filters=filters, exact_match=self.is_exact_match_on()
-            )
-            facets = searcher.execute().facets.to_dict()
+        if self.should_aggregate_facets():
+            if self.is_db_search():
+                db_search = self.db_search or self.get_db_search(self.get_queryset())
+                self.search_facets = db_search.get_facets(
+                    {name: to_snake_case(name) for name in self.facet_class.facets}
+                )
+            elif self.search_facets is None:  # no search was made for the results, only aggregating
+                response = self.aggregate_facets(self.__search_results.extra(size=0)).execute()
+                self.search_facets = self.get_facets_from_search_response(response)
+            facets = dict(self.search_facets)
 
         if 'user' in self.kwargs or 'org' in self.kwargs:
             facets.pop('owner', None)
@@ -321,7 +388,7 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
     def __search_results(self):  # pylint: disable=too-many-branches
         results = None
 
-        if self.should_perform_es_search():
+        if self.should_perform_es_search() or self.should_aggregate_facets():
             results = self.document_model.search()
             default_filters = self.default_filters.copy()
             if self.is_source_child_document_model() and 'collection' not in self.kwargs and \
@@ -337,14 +404,18 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
             extras_fields_exists = self.get_extras_fields_exists_from_query_params()
 
             if faceted_criterion:
-                results = results.query(faceted_criterion)
+                if self.should_aggregate_facets():
+                    results = results.post_filter(faceted_criterion)
+                else:
+                    results = results.query(faceted_criterion)
 
             if self.is_exact_match_on():
-                results = results.query(self.get_exact_search_criterion())
+                if self.get_search_string():
+                    results = results.query(self.get_exact_search_criterion())
             else:
-                results = results.filter(
-                    "query_string", query=self.get_wildcard_search_string(), fields=self.get_searchable_fields()
-                )
+                wildcard_search_criterion = self.get_wildcard_search_criterion()
+                if wildcard_search_criterion:
+                    results = results.query(wildcard_search_criterion)
 
             if extras_fields:
                 for field, value in extras_fields.items():
@@ -383,12 +454,21 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
                     kwargs_filters['ownerType'] = 'User'
                     kwargs_filters['owner'] = self.request.user.username
 
+            if self.is_source_child_document_model():
+                results = results.filter('term', membership_join=MEMBER_DOCUMENT)
+                membership_criterion = self.get_membership_criterion(kwargs_filters)
+                if membership_criterion:
+                    results = results.query(membership_criterion)
+
             for key, value in kwargs_filters.items():
                 results = results.query('match', **{to_snake_case(key): value})
 
             sort_field = self.get_sort_attr()
             if sort_field:
-                results = results.sort(sort_field)
+                if self.is_cursor_pagination():
+                    results = results.sort(sort_field, SEARCH_CURSOR_TIEBREAKER)
+                else:
+                    results = results.sort(sort_field)
 
         return results
 
@@ -396,19 +476,151 @@ class BaseAPIView(generics.GenericAPIView, PathWalkerMixin):
         if not self.should_perform_es_search():
             return None
 
-        search_results = self.__search_results
-        self.total_count = search_results.count()
+        search_results = self.__search_results.extra(track_total_hits=True)
+        if self.should_aggregate_facets():
+            search_results = self.aggregate_facets(search_results)
 
         if isinstance(self.limit, str):
             self.limit = int(self.limit)
 
         self.limit = self.limit or LIST_DEFAULT_LIMIT
 
-        page = int(self.request.GET.get('page', '1'))
-        start = (page - 1) * self.limit
-        end = start + self.limit
+        if self.is_cursor_pagination():
+            self.is_cursor_paginated = True
+            search_results = search_results.extra(size=self.limit)
+            search_after = self.get_search_after()
+            if search_after:
+                search_results = search_results.extra(search_after=search_after)
+        else:
+            page = int(self.request.GET.get('page', '1'))
+            start = (page - 1) * self.limit
+            end = start + self.limit
+            search_results = search_results[start:end]
+
+        if self.should_serve_search_hits():
+            self.is_search_hits_result = True
+            response = search_results.source(includes=[SEARCH_HIT_SUMMARY_FIELD, 'extras']).execute()
+            self.set_search_response_totals(response)
+            return [self.get_search_hit_summary(hit) for hit in response]
+
+        search_results = search_results.source(excludes=['*'])
+        self.set_search_response_totals(search_results.execute())
+
+        return search_results.to_queryset()
+
+    def is_db_search(self):
+        return settings.SEARCH_BACKEND == DB_SEARCH_BACKEND and bool(self.db_search_fields)
+
+    def get_db_search(self, queryset):
+        return DBSearch(
+            queryset, self.es_fields, self.db_search_fields, self.db_full_text_fields,
+            search_str=self.get_search_string(), exact_match=self.is_exact_match_on(),
+            faceted_filters=self.get_faceted_filters(), extras_criterion=DBSearch.get_extras_criterion(
+                self.get_extras_searchable_fields_from_query_params(),
+                self.get_extras_exact_fields_from_query_params(),
+                self.get_extras_fields_exists_from_query_params()
+            ), lowercase_fields=self.get_lowercase_fields()
+        )
+
+    def get_lowercase_fields(self):
+        mapping = self.document_model._doc_type.mapping  # pylint: disable=protected-access
+        return [
+            field for field in self.es_fields
+            if field in mapping and mapping[field].to_dict().get('normalizer') == 'lowercase'
+        ]
+
+    def get_db_search_results_qs(self, queryset):
+        self.db_search = self.get_db_search(queryset)
+        sort_field, desc = self.get_sort_and_desc()
+        if self.is_valid_sort(sort_field):
+            sort_field = '-' + sort_field if desc else sort_field
+        else:
+            sort_field = None
+
+        return self.db_search.get_results(sort_field, self.default_qs_sort_attr)
+
+    def is_cursor_pagination(self):
+        return CURSOR_PARAM in self.request.query_params
+
+    def get_search_after(self):
+        cursor = self.request.query_params.get(CURSOR_PARAM)
+        if not cursor or cursor in ['true', '*']:
+            return None
+
+        try:
+            search_after = decode_search_cursor(cursor)
+        except (ValueError, UnicodeDecodeError) as ex:
+            raise Http400(INVALID_SEARCH_CURSOR) from ex
+
+        if not self.is_valid_search_after(search_after):
+            raise Http400(INVALID_SEARCH_CURSOR)
+
+        return search_after
+
+    def is_valid_search_after(self, search_after):
+        """One value per sort of the search: the sort field's (a number for _score) then the tiebreaker's db_id"""
+        if len(search_after) != 2 or not isinstance(search_after[1], str):
+            return False
+
+        value = search_after[0]
+        is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if isinstance(self.get_sort_attr(), dict):
+            return is_number
+
+        return value is None or is_number or isinstance(value, str)
+
+    def set_search_response_totals(self, response):
+        self.total_count = response.hits.total.value
+        if self.is_cursor_paginated and len(response.hits) == self.limit:
+            self.next_search_cursor = encode_search_cursor(list(response.hits[-1].meta.sort))
+        if self.should_aggregate_facets():
+            self.search_facets = self.get_facets_from_search_response(response)
+
+    def should_serve_search_hits(self):
+        """
+        Non verbose list pages are rendered from the summaries stored in the documents, with no db query.
+        """
+        return self.search_hits_enabled and self.request.method == 'GET' and not self.is_verbose() and \
+            not self.request.query_params.get('csv')
+
+    def get_search_hit_summary(self, hit):
+        summary = hit[SEARCH_HIT_SUMMARY_FIELD].to_dict()
+        if self.request.query_params.get(INCLUDE_EXTRAS_PARAM) in ['true', True]:
+            summary['extras'] = get(hit, 'extras').to_dict() if get(hit, 'extras') else dict()
+
+        return summary
+
+    def should_cache_response(self):
+        return bool(
+            self.response_cache_enabled and SearchResponseCache.is_on() and self.request.method == 'GET' and
+            not self.user_is_self and not self.should_compress()
+        )
+
+    def get_response_cache_scope(self):
+        owner_url = None
+        if 'org' in self.kwargs:
+            owner_url = '/orgs/{}/'.format(self.kwargs['org'])
+        elif 'user' in self.kwargs:
+            owner_url = '/users/{}/'.format(self.kwargs['user'])
+
+        for container in ['source', 'collection']:
+            if owner_url and container in self.kwargs:
+                return '{}{}s/{}/'.format(owner_url, container, self.kwargs[container])
+
+        return None
+
+    def get_response_cache_key(self):
+        """
+        Cached list pages are keyed on the view, its kwargs, query params, facets and the visibility class
+        of the user (staff see private content), see SearchResponseCache for their invalidation.
+        """
+        if not self.should_cache_response():
+            return None
 
-        return search_results[start:end].to_queryset()
+        return SearchResponseCache().get_key(self.get_response_cache_scope(), dict(
+            view=self.__class__.__name__, kwargs=self.kwargs, params=sorted(self.request.query_params.lists()),
+            facets=self.should_include_facets(), visibility='staff' if self.request.user.is_staff else 'public',
+        ))
 
     def is_head(self):
         return self.request.method.lower() == 'head'
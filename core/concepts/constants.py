@@ -32,3 +32,12 @@ PERSIST_CLONE_SPECIFY_USER_ERROR = "Must specify which user is attempting to cre
 PERSIST_CLONE_ERROR = 'An error occurred while saving new concept version.'
 COULD_NOT_FIND_CONCEPT_TO_UPDATE = 'Could not find concept to update'
 PARENT_VERSION_NOT_LATEST_CANNOT_UPDATE_CONCEPT = 'Parent version is not the latest. Cannot update concept.'
+MAX_MAPPINGS_GRAPH_DEPTH = 5
+MAPPINGS_GRAPH_DIRECTIONS = ['both', 'forward', 'inverse']
+INVALID_MAPPINGS_GRAPH_PARAMS = 'depth must be between 1 and {} and direction one of {}.'.format(
+    MAX_MAPPINGS_GRAPH_DEPTH, ', '.join(MAPPINGS_GRAPH_DIRECTIONS)
+)
+MAX_LOOKUP_CONCEPTS = 1000
+INVALID_LOOKUP_PAYLOAD = 'Expected codes and/or urls lists of non empty strings, at most {} in total.'.format(
+    MAX_LOOKUP_CONCEPTS
+)
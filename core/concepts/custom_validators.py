@@ -1,4 +1,7 @@
+from hashlib import md5
+
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from pydash import get
 
 from core.common.constants import LOOKUP_CONCEPT_CLASSES
@@ -19,6 +22,7 @@ class OpenMRSConceptValidator(BaseConceptValidator):
         super().__init__(**kwargs)
         self.repo = kwargs.pop('repo')
         self.reference_values = kwargs.pop('reference_values')
+        self.repo_names_index = kwargs.pop('repo_names_index', None)
 
     def validate_concept_based(self, concept):
         self.must_have_exactly_one_preferred_name(concept)
@@ -73,21 +77,42 @@ class OpenMRSConceptValidator(BaseConceptValidator):
         versioned_object_id = concept.versioned_object_id or get(concept, 'head.id')
 
         names = [name for name in concept.saved_unsaved_names if getattr(name, attribute)]
+        if not names:
+            return
+
+        names_used_by_other_records = self.get_names_used_by_other_records(names, versioned_object_id)
         for name in names:
-            if self.no_other_record_has_same_name(name, versioned_object_id):
+            if (name.locale, name.name) not in names_used_by_other_records:
                 continue
 
             raise ValidationError({'names': [message_with_name_details(error_message, name)]})
 
-    def no_other_record_has_same_name(self, name, versioned_object_id):
+    def get_names_used_by_other_records(self, names, versioned_object_id):
+        """
+        Returns (locale, name) pairs out of names that other latest concepts of the repo have.
+        All pairs are checked in one query (served by the localized_texts (locale, md5(name)) index).
+        """
         if not self.repo:
-            return True
+            return set()
+
+        if self.repo_names_index:
+            return {
+                (name.locale, name.name) for name in names
+                if self.repo_names_index.has_other_record(name, versioned_object_id)
+            }
+
+        criteria = Q()
+        for name in names:
+            criteria |= Q(
+                names__locale=name.locale, names__name__md5=md5(name.name.encode('utf-8')).hexdigest(),
+                names__name=name.name
+            )
 
-        return not self.repo.concepts_set.exclude(
+        return set(self.repo.concepts_set.exclude(
             versioned_object_id=versioned_object_id
         ).exclude(names__type__in=LOCALES_SHORT).filter(
-            is_active=True, retired=False, is_latest_version=True, names__locale=name.locale, names__name=name.name
-        ).exists()
+            criteria, is_active=True, retired=False, is_latest_version=True
+        ).values_list('names__locale', 'names__name'))
 
     @staticmethod
     def short_name_cannot_be_marked_as_locale_preferred(concept):
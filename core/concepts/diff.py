@@ -0,0 +1,110 @@
+from django.db.models import F
+
+from core.concepts.models import Concept
+
+
+class ConceptVersionsDiff:
+    """
+    Computes what changed (attributes, extras, names and descriptions) between pairs of concept versions.
+    Works on db rows only, all versions are loaded with one query per table whatever the number of pairs.
+    """
+    ATTRIBUTES = ['concept_class', 'datatype', 'external_id', 'retired']
+    LOCALE_ATTRIBUTES = ['name', 'locale', 'locale_preferred', 'type', 'external_id']
+
+    def __init__(self, version_pairs):
+        self.version_pairs = version_pairs
+        ids = {concept_id for pair in version_pairs for concept_id in pair}
+        self.attributes = {
+            row['id']: row for row in Concept.objects.filter(id__in=ids).values('id', 'extras', *self.ATTRIBUTES)
+        }
+        self.names = self.__get_locales(Concept.names.through, ids)
+        self.descriptions = self.__get_locales(Concept.descriptions.through, ids)
+
+    @classmethod
+    def for_containers(cls, from_container, to_container):
+        """
+        Diffs the concepts of two container (source/collection) versions.
+        Returns urls of the added and removed concepts and the diff of every concept that changed in between.
+        """
+        from_versions = cls.__get_member_versions(from_container)
+        to_versions = cls.__get_member_versions(to_container)
+
+        changed_members = [
+            (from_versions[versioned_object_id][0], to_version)
+            for versioned_object_id, to_version in to_versions.items()
+            if versioned_object_id in from_versions and from_versions[versioned_object_id][0] != to_version[0]
+        ]
+        diff = cls([(from_id, to_id) for from_id, (to_id, _) in changed_members])
+        changed = dict()
+        for from_id, (to_id, uri) in changed_members:
+            concept_diff = diff.get(from_id, to_id)
+            if concept_diff:
+                changed[uri] = concept_diff
+
+        return dict(
+            added=[uri for key, (_, uri) in to_versions.items() if key not in from_versions],
+            removed=[uri for key, (_, uri) in from_versions.items() if key not in to_versions],
+            changed=changed,
+        )
+
+    @staticmethod
+    def __get_member_versions(container):
+        # a HEAD can hold many versions of a concept, the last created one is its member
+        return {
+            versioned_object_id: (concept_id, uri)
+            for versioned_object_id, concept_id, uri in container.concepts.exclude(
+                id=F('versioned_object_id')
+            ).order_by('id').values_list('versioned_object_id', 'id', 'uri')
+        }
+
+    @classmethod
+    def __get_locales(cls, through, ids):
+        locales = dict()
+        rows = through.objects.filter(concept_id__in=ids).values_list(
+            'concept_id', *['localizedtext__' + attr for attr in cls.LOCALE_ATTRIBUTES]
+        )
+        for concept_id, *values in rows:
+            locales.setdefault(concept_id, []).append(dict(zip(cls.LOCALE_ATTRIBUTES, values)))
+
+        return locales
+
+    def get(self, from_id, to_id):
+        from_attributes = self.attributes.get(from_id, dict())
+        to_attributes = self.attributes.get(to_id, dict())
+        diff = dict(
+            attributes={
+                attr: {'from': from_attributes.get(attr), 'to': to_attributes.get(attr)}
+                for attr in self.ATTRIBUTES if from_attributes.get(attr) != to_attributes.get(attr)
+            },
+            extras=self.__diff_dicts(from_attributes.get('extras') or dict(), to_attributes.get('extras') or dict()),
+            names=self.__diff_locales(self.names.get(from_id, []), self.names.get(to_id, [])),
+            descriptions=self.__diff_locales(self.descriptions.get(from_id, []), self.descriptions.get(to_id, [])),
+        )
+
+        return {key: value for key, value in diff.items() if value}
+
+    @staticmethod
+    def __diff_dicts(from_dict, to_dict):
+        diff = dict(
+            added={key: value for key, value in to_dict.items() if key not in from_dict},
+            removed={key: value for key, value in from_dict.items() if key not in to_dict},
+            changed={
+                key: {'from': from_dict[key], 'to': value}
+                for key, value in to_dict.items() if key in from_dict and from_dict[key] != value
+            },
+        )
+
+        return {key: value for key, value in diff.items() if value}
+
+    def __diff_locales(self, from_locales, to_locales):
+        def to_key(locale):
+            return tuple(locale[attr] for attr in self.LOCALE_ATTRIBUTES)
+
+        from_keys = {to_key(locale) for locale in from_locales}
+        to_keys = {to_key(locale) for locale in to_locales}
+        diff = dict(
+            added=[locale for locale in to_locales if to_key(locale) not in from_keys],
+            removed=[locale for locale in from_locales if to_key(locale) not in to_keys],
+        )
+
+        return {key: value for key, value in diff.items() if value}
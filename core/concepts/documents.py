@@ -1,26 +1,29 @@
 from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
+from elasticsearch_dsl import Join, Keyword
 
+from core.common.constants import MEMBER_DOCUMENT, MEMBERSHIP_DOCUMENT
+from core.common.documents import MembershipDocumentMixin
+from core.common.search import get_ngram_subfields
+from core.common.utils import chunked_queryset_iterator
 from core.concepts.models import Concept
 
 
 @registry.register_document
-class ConceptDocument(Document):
+class ConceptDocument(MembershipDocumentMixin, Document):
     class Index:
         name = 'concepts'
         settings = {'number_of_shards': 1, 'number_of_replicas': 0}
 
-    id = fields.KeywordField(attr='mnemonic', normalizer="lowercase")
-    name = fields.KeywordField(attr='display_name', normalizer="lowercase")
+    db_id = fields.KeywordField(attr='id')
+    id = fields.KeywordField(attr='mnemonic', normalizer="lowercase", fields=get_ngram_subfields())
+    name = fields.KeywordField(attr='display_name', normalizer="lowercase", fields=get_ngram_subfields())
     last_update = fields.DateField(attr='updated_at')
     locale = fields.ListField(fields.KeywordField(attr='display_name'))
     source = fields.KeywordField(attr='parent_resource', normalizer="lowercase")
     owner = fields.KeywordField(attr='owner_name', normalizer="lowercase")
     owner_type = fields.KeywordField(attr='owner_type')
-    source_version = fields.ListField(fields.KeywordField())
-    collection_version = fields.ListField(fields.KeywordField())
     collection = fields.ListField(fields.KeywordField())
-    collection_owner_url = fields.ListField(fields.KeywordField())
     public_can_view = fields.BooleanField(attr='public_can_view')
     datatype = fields.KeywordField(attr='datatype', normalizer="lowercase")
     concept_class = fields.KeywordField(attr='concept_class', normalizer="lowercase")
@@ -28,35 +31,41 @@ class ConceptDocument(Document):
     is_active = fields.KeywordField(attr='is_active')
     is_latest_version = fields.KeywordField(attr='is_latest_version')
     extras = fields.ObjectField()
+    summary = fields.ObjectField(enabled=False)
+    membership_join = Join(relations={MEMBER_DOCUMENT: MEMBERSHIP_DOCUMENT})
+    # membership documents only, see MembershipDocumentMixin
+    source_version = Keyword()
+    collection_version = Keyword()
+    collection_owner_url = Keyword()
 
     class Django:
         model = Concept
         fields = [
             'version',
         ]
+        queryset_pagination = 1000
 
-    @staticmethod
-    def prepare_locale(instance):
-        return list(
-            instance.names.filter(locale__isnull=False).distinct('locale').values_list('locale', flat=True)
-        )
+    def get_queryset(self):
+        return super().get_queryset().select_related(
+            'parent__organization', 'parent__user', 'created_by'
+        ).prefetch_related('names', 'sources', 'collection_set__organization', 'collection_set__user')
 
-    @staticmethod
-    def prepare_source_version(instance):
-        return list(instance.sources.values_list('version', flat=True))
+    def get_indexing_queryset(self):
+        return chunked_queryset_iterator(self.get_queryset(), self.django.queryset_pagination)
 
     @staticmethod
-    def prepare_collection_version(instance):
-        return list(instance.collection_set.values_list('version', flat=True))
+    def prepare_locale(instance):
+        return sorted({name.locale for name in instance.names.all() if name.locale})
 
     @staticmethod
     def prepare_collection(instance):
-        return list(set(list(instance.collection_set.values_list('mnemonic', flat=True))))
-
-    @staticmethod
-    def prepare_collection_owner_url(instance):
-        return list({coll.parent_url for coll in instance.collection_set.select_related('user', 'organization')})
+        return list({collection.mnemonic for collection in instance.collection_set.all()})
 
     @staticmethod
     def prepare_extras(instance):
         return instance.extras or {}
+
+    @staticmethod
+    def prepare_summary(instance):
+        from core.concepts.serializers import ConceptListSerializer
+        return ConceptListSerializer(instance).data
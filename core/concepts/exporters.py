@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.db.models import F
+from pydash import get
+
+from core.common.constants import ISO_639_1
+from core.common.exporters import BaseExporter
+from core.common.utils import drop_version
+from core.concepts.constants import CONCEPT_TYPE
+from core.concepts.models import Concept, LocalizedText
+
+LOCALIZED_TEXT_FIELDS = ('id', 'name', 'external_id', 'type', 'locale', 'locale_preferred', 'created_at')
+
+
+def get_localized_texts(concept_ids, related_name):
+    """
+    concept id => its names/descriptions (related_name name_locales/description_locales), as dicts, by id:
+    the serializers list the prefetched ones unordered, which is in creation order in practice
+    """
+    texts = dict()
+    if not concept_ids:
+        return texts
+
+    queryset = LocalizedText.objects.annotate(concept_id=F(related_name)).filter(
+        concept_id__in=concept_ids).order_by('id').values('concept_id', *LOCALIZED_TEXT_FIELDS)
+    for text in queryset:
+        texts.setdefault(text['concept_id'], []).append(text)
+
+    return texts
+
+
+def get_preferred_name(names, default_locale, supported_locales, prefetched=False):
+    """
+    Concept.preferred_locale from name dicts. prefetched: as evaluated on prefetched names (the exported
+    concepts), where the supported locales criterion only holds for sources without supported locales.
+    """
+    names = sorted(names, key=lambda name: name['created_at'], reverse=True)
+
+    def is_supported(name):
+        return supported_locales is None if prefetched else name['locale'] in (supported_locales or [])
+
+    criteria = [
+        lambda name: name['locale'] == default_locale,
+        is_supported,
+        lambda name: name['locale'] == settings.DEFAULT_LOCALE,
+    ]
+    for criterion in criteria:
+        matching_names = [name for name in names if criterion(name)]
+        preferred_name = get([name for name in matching_names if name['locale_preferred']], '0') or get(
+            matching_names, '0')
+        if preferred_name:
+            return preferred_name
+
+    return get([name for name in names if name['locale_preferred']], '0') or get(names, '0')
+
+
+class ConceptExporter(BaseExporter):
+    """Same documents as ConceptVersionDetailSerializer"""
+    model = Concept
+    fields = (
+        'id', 'mnemonic', 'external_id', 'concept_class', 'datatype', 'extras', 'retired', 'version', 'created_at',
+        'updated_at', 'created_by__username', 'comment', 'is_latest_version', 'uri', 'versioned_object_id',
+        'parent__uri', 'parent__default_locale', 'parent__supported_locales',
+    )
+
+    def to_representations(self, rows):
+        concept_ids = self.get_ids(rows)
+        names = get_localized_texts(concept_ids, 'name_locales')
+        descriptions = get_localized_texts(concept_ids, 'description_locales')
+
+        return [
+            self.to_representation(row, names.get(row['id'], []), descriptions.get(row['id'], [])) for row in rows
+        ]
+
+    def to_representation(self, row, names, descriptions):
+        owner, owner_type, owner_url = self.get_source_owner(row)
+        preferred_name = get_preferred_name(
+            names, row['parent__default_locale'], row['parent__supported_locales'], prefetched=True)
+        data = dict(
+            type=CONCEPT_TYPE,
+            uuid=str(row['id']),
+            id=row['mnemonic'],
+            external_id=row['external_id'],
+            concept_class=row['concept_class'],
+            datatype=row['datatype'],
+            display_name=get(preferred_name, 'name'),
+            display_locale=get(preferred_name, 'locale'),
+            names=[self.to_name_representation(name) for name in names],
+            descriptions=[self.to_description_representation(description) for description in descriptions],
+            extras=row['extras'],
+            retired=row['retired'],
+            source=row['parent__mnemonic'],
+            source_url=row['parent__uri'],
+            owner=str(owner or ''),
+            owner_name=str(owner or ''),
+            owner_url=owner_url,
+            version=row['version'],
+            created_on=self.to_datetime_representation(row['created_at']),
+            updated_on=self.to_datetime_representation(row['updated_at']),
+            version_created_on=self.to_datetime_representation(row['created_at']),
+            version_created_by=row['created_by__username'],
+            update_comment=row['comment'],
+            is_latest_version=row['is_latest_version'],
+            locale=get(next((name for name in names if name['type'] == ISO_639_1), None), 'name'),
+            url=drop_version(row['uri']),
+            owner_type=owner_type,
+            version_url=self.get_version_url(row),
+            mappings=[],
+            previous_version_url=row['previous_version_uri'],
+        )
+        if data['version_url'] is None and row['id'] == row['versioned_object_id']:
+            data.pop('version_url')
+
+        return data
+
+    @staticmethod
+    def to_name_representation(name):  # in the field order of LocalizedNameSerializer
+        return dict(
+            uuid=str(name['id']), name=name['name'], external_id=name['external_id'], type='ConceptName',
+            locale=name['locale'], locale_preferred=name['locale_preferred'], name_type=name['type']
+        )
+
+    @staticmethod
+    def to_description_representation(description):  # in the field order of LocalizedDescriptionSerializer
+        return dict(
+            uuid=str(description['id']), description=description['name'], external_id=description['external_id'],
+            type='ConceptDescription', locale=description['locale'], locale_preferred=description['locale_preferred'],
+            description_type=description['type']
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.9 on 2026-10-19 09:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concepts', '0006_auto_20210115_0823'),
+    ]
+
+    # md5(name) instead of name, descriptions are in localized_texts too and can exceed btree's max row size
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS localized_texts_locale_name_md5 ON localized_texts (locale, md5(name));',
+            reverse_sql='DROP INDEX IF EXISTS localized_texts_locale_name_md5;',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.0.9 on 2026-10-19 12:00
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concepts', '0007_auto_20261019_0900'),
+    ]
+
+    # for the postgres search backend (core.common.db_search), expressions are the ones django generates for
+    # icontains/iexact lookups and SearchVector with the 'simple' config
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS concepts_mnemonic_trgm ON concepts '
+                'USING gin (UPPER(mnemonic::text) gin_trgm_ops);',
+            reverse_sql='DROP INDEX IF EXISTS concepts_mnemonic_trgm;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS localized_texts_name_trgm ON localized_texts '
+                'USING gin (UPPER(name::text) gin_trgm_ops);',
+            reverse_sql='DROP INDEX IF EXISTS localized_texts_name_trgm;',
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS localized_texts_name_tsvector ON localized_texts "
+                "USING gin (to_tsvector('simple'::regconfig, COALESCE(name, '')));",
+            reverse_sql='DROP INDEX IF EXISTS localized_texts_name_tsvector;',
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models, IntegrityError, transaction
+from django.db import models, IntegrityError, transaction, connection
 from django.db.models import F
+from django.db.models.functions import MD5
 from pydash import get, compact
 
 from core.common.constants import ISO_639_1, INCLUDE_RETIRED_PARAM
@@ -14,6 +15,9 @@ from core.concepts.constants import CONCEPT_TYPE, LOCALES_FULLY_SPECIFIED, LOCAL
 from core.concepts.mixins import ConceptValidationMixin
 
 
+models.TextField.register_lookup(MD5)
+
+
 class LocalizedText(models.Model):
     class Meta:
         db_table = 'localized_texts'
@@ -551,6 +555,63 @@ class Concept(ConceptValidationMixin, SourceChildMixin, VersionedModel):  # pyli
 
         return queryset.distinct()
 
+    def get_mappings_graph(
+            self, depth=1, map_types=None, direction=None, source_ids=None, include_retired=False
+    ):  # pylint: disable=too-many-arguments
+        """
+        Walks mappings from this concept up to depth hops in a single recursive query, following mappings
+        from -> to (direction 'forward'), to -> from ('inverse') or both ways (default).
+        Only mappings of source_ids sources (default: concept's own source) and of map_types (default: all) are walked.
+        Returns ({versioned concept id: hops}, [versioned mapping ids]).
+        """
+        mapping_filters = [
+            'mappings.id = mappings.versioned_object_id', 'mappings.is_active',
+            'mappings.parent_id = ANY(%(source_ids)s)',
+        ]
+        if not include_retired:
+            mapping_filters.append('NOT mappings.retired')
+        if map_types:
+            mapping_filters.append('UPPER(mappings.map_type) = ANY(%(map_types)s)')
+
+        branch = """
+            SELECT {to}_concepts.versioned_object_id AS concept_id, mappings.id AS mapping_id
+            FROM concepts AS {from}_concepts
+            JOIN mappings ON mappings.{from}_concept_id = {from}_concepts.id
+            JOIN concepts AS {to}_concepts ON {to}_concepts.id = mappings.{to}_concept_id
+            WHERE {from}_concepts.versioned_object_id = graph.concept_id AND {filters}
+        """
+        branches = []
+        if direction in [None, 'both', 'forward']:
+            branches.append(branch.format(**{'from': 'from', 'to': 'to', 'filters': ' AND '.join(mapping_filters)}))
+        if direction in [None, 'both', 'inverse']:
+            branches.append(branch.format(**{'from': 'to', 'to': 'from', 'filters': ' AND '.join(mapping_filters)}))
+
+        sql = """
+            WITH RECURSIVE graph(concept_id, mapping_id, depth) AS (
+                SELECT %(concept_id)s::bigint, NULL::bigint, 0
+                UNION
+                SELECT neighbours.concept_id, neighbours.mapping_id, graph.depth + 1
+                FROM graph CROSS JOIN LATERAL ({branches}) AS neighbours
+                WHERE graph.depth < %(depth)s
+            )
+            SELECT concept_id, mapping_id, depth FROM graph
+        """.format(branches=' UNION ALL '.join(branches))
+        params = dict(
+            concept_id=self.versioned_object_id, depth=depth, source_ids=list(source_ids or [self.parent_id]),
+            map_types=[map_type.upper() for map_type in map_types or []]
+        )
+
+        concept_depths = dict()
+        mapping_ids = set()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for concept_id, mapping_id, hops in cursor.fetchall():
+                concept_depths[concept_id] = min(hops, concept_depths.get(concept_id, hops))
+                if mapping_id:
+                    mapping_ids.add(mapping_id)
+
+        return concept_depths, sorted(mapping_ids)
+
     @staticmethod
     def get_latest_versions_for_queryset(concepts_qs):
         """Takes any concepts queryset and returns queryset of latest_version of each of those concepts"""
@@ -569,14 +630,8 @@ class Concept(ConceptValidationMixin, SourceChildMixin, VersionedModel):  # pyli
     def update_mappings(self):
         from core.mappings.models import Mapping
         parent_uris = compact([self.parent.uri, self.parent.canonical_url])
-        for mapping in Mapping.objects.filter(
-                to_concept_code=self.mnemonic, to_source_url__in=parent_uris, to_concept__isnull=True
-        ):
-            mapping.to_concept = self
-            mapping.save()
-
-        for mapping in Mapping.objects.filter(
-                from_concept_code=self.mnemonic, from_source_url__in=parent_uris, from_concept__isnull=True
-        ):
-            mapping.from_concept = self
-            mapping.save()
+        mapping_ids = [
+            *Mapping.link_dangling('to_concept', self, parent_uris, self.mnemonic),
+            *Mapping.link_dangling('from_concept', self, parent_uris, self.mnemonic),
+        ]
+        Mapping.batch_index(mapping_ids)
@@ -12,6 +12,8 @@ class ConceptSearch(CommonSearch):
         'source', 'owner', 'owner_type', 'is_latest_version', 'is_active', 'name', 'collection',
     ]
 
+    ngram_fields = ['name']
+
     facets = {
         'datatype': TermsFacet(field='datatype'),
         'conceptClass': TermsFacet(field='concept_class'),
@@ -1,4 +1,5 @@
 import factory
+from mock import patch
 from pydash import omit
 
 from core.common.constants import CUSTOM_VALIDATION_SCHEMA_OPENMRS, HEAD, ACCESS_TYPE_EDIT, ACCESS_TYPE_VIEW
@@ -12,8 +13,10 @@ from core.concepts.constants import (
     OPENMRS_CONCEPT_CLASS, OPENMRS_DATATYPE, OPENMRS_DESCRIPTION_TYPE, OPENMRS_NAME_LOCALE, OPENMRS_DESCRIPTION_LOCALE)
 from core.concepts.models import Concept
 from core.concepts.tests.factories import LocalizedTextFactory, ConceptFactory
-from core.concepts.validators import ValidatorSpecifier
+from core.concepts.validators import ValidatorSpecifier, ReferenceValuesCache
+from core.mappings.models import Mapping
 from core.mappings.tests.factories import MappingFactory
+from core.sources.models import Source
 from core.sources.tests.factories import OrganizationSourceFactory
 
 
@@ -427,6 +430,29 @@ class ConceptTest(OCLTestCase):
         mappings = concept4.get_indirect_mappings()
         self.assertEqual(mappings.count(), 0)
 
+    @patch('core.mappings.models.Mapping.batch_index')
+    def test_update_mappings(self, batch_index_mock):
+        source = OrganizationSourceFactory(canonical_url='http://some/canonical/url')
+        mapping1 = MappingFactory(to_concept=None, to_concept_code='c1', to_source_url=source.uri)
+        mapping2 = MappingFactory(from_concept=None, from_concept_code='c1', from_source_url=source.canonical_url)
+        mapping3 = MappingFactory(to_concept=None, to_concept_code='c2', to_source_url=source.uri)
+        concept = ConceptFactory(parent=source, mnemonic='c1')
+
+        concept.update_mappings()
+
+        mapping1.refresh_from_db()
+        mapping2.refresh_from_db()
+        mapping3.refresh_from_db()
+        self.assertEqual(mapping1.to_concept, concept)
+        self.assertEqual(mapping2.from_concept, concept)
+        self.assertIsNone(mapping3.to_concept)
+        batch_index_mock.assert_called_once()
+        self.assertEqual(
+            sorted(batch_index_mock.call_args[0][0]),
+            sorted(Mapping.objects.filter(
+                versioned_object_id__in=[mapping1.id, mapping2.id]).values_list('id', flat=True))
+        )
+
     def test_get_parent_and_owner_filters_from_uri(self):
         self.assertEqual(Concept.get_parent_and_owner_filters_from_uri(None), dict())
         self.assertEqual(Concept.get_parent_and_owner_filters_from_uri(''), dict())
@@ -792,3 +818,87 @@ class ValidatorSpecifierTest(OCLTestCase):
         self.assertEqual(
             sorted(expected_reference_values['DescriptionTypes']), sorted(actual_reference_values['DescriptionTypes'])
         )
+
+
+class ReferenceValuesCacheTest(OCLTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_lookup_concept_classes()
+
+    def test_get_is_cached_until_reference_source_changes(self):
+        reference_values = ReferenceValuesCache.get()
+
+        self.assertIsInstance(reference_values['Classes'], frozenset)
+        self.assertIn('Diagnosis', reference_values['Classes'])
+        with self.assertNumQueries(0):
+            self.assertIs(ReferenceValuesCache.get(), reference_values)
+
+        classes_source = Source.objects.get(organization__mnemonic='OCL', mnemonic='Classes', version=HEAD)
+        ConceptFactory(parent=classes_source, concept_class='Concept Class', names=[LocalizedTextFactory(name='Misc')])
+
+        self.assertIsNone(ReferenceValuesCache.values)
+        self.assertIn('Misc', ReferenceValuesCache.get()['Classes'])
+
+    def test_reverse_names_change_invalidates_for_the_concepts_of_the_name(self):
+        classes_source = Source.objects.get(organization__mnemonic='OCL', mnemonic='Classes', version=HEAD)
+        concept = ConceptFactory(parent=classes_source, concept_class='Concept Class')
+        name = LocalizedTextFactory(name='Misc')
+        ReferenceValuesCache.get()
+
+        name.name_locales.add(concept)
+
+        self.assertIsNone(ReferenceValuesCache.values)
+
+        ReferenceValuesCache.get()
+        name.name_locales.add(ConceptFactory())
+
+        self.assertIsNotNone(ReferenceValuesCache.values)
+
+
+class ConceptDocumentTest(OCLTestCase):
+    def test_prepare_from_indexing_queryset(self):
+        from core.collections.tests.factories import OrganizationCollectionFactory
+        from core.concepts.documents import ConceptDocument
+        source = OrganizationSourceFactory(default_locale='en', supported_locales=['en', 'fr'])
+        concept = ConceptFactory(
+            parent=source, names=[LocalizedTextFactory(locale='fr', name='Nom'), LocalizedTextFactory(locale='en')]
+        )
+        concept.sources.add(source)
+        collection = OrganizationCollectionFactory()
+        collection.concepts.add(concept)
+        document = ConceptDocument()
+        display_name = concept.display_name
+
+        instance = [instance for instance in document.get_indexing_queryset() if instance.id == concept.id][0]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(document.prepare_locale(instance), ['en', 'fr'])
+            self.assertEqual(document.prepare_collection(instance), [collection.mnemonic])
+            self.assertEqual(
+                [document.prepare_membership(container, member_id)
+                 for container, member_id in document.get_memberships([instance])],
+                [
+                    dict(
+                        membership_join=dict(name='membership', parent=concept.id), source=source.mnemonic,
+                        source_version=HEAD
+                    ),
+                    dict(
+                        membership_join=dict(name='membership', parent=concept.id), collection=collection.mnemonic,
+                        collection_version=collection.version, collection_owner_url=collection.parent_url
+                    ),
+                ]
+            )
+            self.assertEqual(instance.display_name, display_name)
+            self.assertEqual(instance.owner_name, str(source.organization))
+
+    def test_prepare_summary(self):
+        from core.concepts.documents import ConceptDocument
+        from core.concepts.serializers import ConceptListSerializer
+        concept = ConceptFactory(extras=dict(foo='bar'))
+
+        summary = ConceptDocument.prepare_summary(concept)
+
+        self.assertEqual(summary, ConceptListSerializer(concept).data)
+        self.assertEqual(summary['uuid'], str(concept.id))
+        self.assertEqual(summary['mappings'], [])
+        self.assertFalse('extras' in summary)
@@ -6,6 +6,7 @@ from . import views
 
 urlpatterns = [
     re_path(r'^$', views.ConceptListView.as_view(), name='concept-list'),
+    re_path(r'^\$lookup/$', views.ConceptLookupView.as_view(), name='concept-lookup'),
     re_path(
         r"^(?P<concept>{pattern})/$".format(pattern=NAMESPACE_PATTERN),
         views.ConceptRetrieveUpdateDestroyView.as_view(),
@@ -52,11 +53,21 @@ urlpatterns = [
         views.ConceptVersionsView.as_view(),
         name='concept-version-list'
     ),
+    re_path(
+        r"^(?P<concept>{pattern})/versions/diff/$".format(pattern=NAMESPACE_PATTERN),
+        views.ConceptVersionsDiffView.as_view(),
+        name='concept-version-diff'
+    ),
     re_path(
         r"^(?P<concept>{pattern})/mappings/$".format(pattern=NAMESPACE_PATTERN),
         views.ConceptMappingsView.as_view(),
         name='concept-mapping-list'
     ),
+    re_path(
+        r"^(?P<concept>{pattern})/mappings/graph/$".format(pattern=NAMESPACE_PATTERN),
+        views.ConceptMappingsGraphView.as_view(),
+        name='concept-mappings-graph'
+    ),
     re_path(
         r'^(?P<concept>{pattern})/(?P<concept_version>{pattern})/$'.format(pattern=NAMESPACE_PATTERN),
         views.ConceptVersionRetrieveView.as_view(),
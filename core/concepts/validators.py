@@ -1,11 +1,12 @@
-from django.core.cache import cache
+import time
+
 from django.core.exceptions import ValidationError
+from django.db.models import Max
 
 from core.common.constants import (
     NA, YES, NO, CUSTOM_VALIDATION_SCHEMA_OPENMRS, FIVE_MINS, HEAD, REFERENCE_VALUE_SOURCE_MNEMONICS
 )
-from core.orgs.models import Organization
-from .constants import BASIC_DESCRIPTION_CANNOT_BE_EMPTY, BASIC_NAMES_CANNOT_BE_EMPTY
+from .constants import BASIC_DESCRIPTION_CANNOT_BE_EMPTY, BASIC_NAMES_CANNOT_BE_EMPTY, LOCALES_SHORT
 
 
 def message_with_name_details(message, name):
@@ -18,6 +19,95 @@ def message_with_name_details(message, name):
     return "{}: {} (locale: {}, preferred: {})".format(message, name_str, locale, preferred)
 
 
+class ReferenceValuesCache:
+    """
+    Process local cache of OpenMRS reference values (names of OCL lookup concepts) held as frozensets.
+    Values are keyed by the HEAD versions of the lookup sources and their last concept update. The key is re-checked
+    at most once every FIVE_MINS, writes to lookup sources in this process invalidate it right away.
+    """
+    values = None
+    stamp = None
+    source_ids = frozenset()
+    checked_at = None
+
+    @classmethod
+    def get(cls):
+        if cls.values is None or cls.is_check_due():
+            stamp = cls.get_stamp()
+            if cls.values is None or stamp != cls.stamp:
+                cls.load(stamp)
+            cls.checked_at = time.monotonic()
+
+        return cls.values
+
+    @classmethod
+    def is_check_due(cls):
+        return cls.checked_at is None or time.monotonic() - cls.checked_at > FIVE_MINS
+
+    @staticmethod
+    def get_reference_sources():
+        from core.sources.models import Source
+        return Source.objects.filter(
+            organization__mnemonic='OCL', mnemonic__in=REFERENCE_VALUE_SOURCE_MNEMONICS, version=HEAD
+        )
+
+    @classmethod
+    def get_stamp(cls):
+        return tuple(
+            cls.get_reference_sources().annotate(
+                last_concept_update=Max('concepts_set__updated_at')
+            ).order_by('id').values_list('id', 'updated_at', 'last_concept_update')
+        )
+
+    @classmethod
+    def load(cls, stamp):
+        sources = list(cls.get_reference_sources())
+        cls.values = {
+            source.mnemonic: frozenset(source.get_concept_name_locales().values_list('name', flat=True))
+            for source in sources
+        }
+        cls.source_ids = frozenset(source.id for source in sources)
+        cls.stamp = stamp
+
+    @classmethod
+    def invalidate(cls):
+        cls.values = None
+        cls.stamp = None
+        cls.checked_at = None
+
+    @classmethod
+    def invalidate_for(cls, instance):
+        from core.sources.models import Source
+        if isinstance(instance, Source):
+            is_reference_source = instance.mnemonic in REFERENCE_VALUE_SOURCE_MNEMONICS
+        else:
+            is_reference_source = instance.parent_id in cls.source_ids
+
+        if is_reference_source:
+            cls.invalidate()
+
+
+class RepoNamesIndex:
+    """
+    In memory lookup of the names of all latest, active and unretired concepts of a repo, loaded with one query.
+    Lets source level name uniqueness checks run for many concepts of the repo without a query per name.
+    """
+    def __init__(self, repo):
+        self.versioned_object_ids = dict()
+        rows = repo.concepts_set.filter(
+            is_active=True, retired=False, is_latest_version=True
+        ).values_list('versioned_object_id', 'names__locale', 'names__name', 'names__type')
+
+        with_short_names = {row[0] for row in rows if row[3] in LOCALES_SHORT}
+        for versioned_object_id, locale, name, _ in rows:
+            if versioned_object_id in with_short_names or name is None:
+                continue
+            self.versioned_object_ids.setdefault((locale, name), set()).add(versioned_object_id)
+
+    def has_other_record(self, name, versioned_object_id):
+        return bool(self.versioned_object_ids.get((name.locale, name.name), set()) - {versioned_object_id})
+
+
 class ValidatorSpecifier:
     def __init__(self):
         from core.concepts.custom_validators import OpenMRSConceptValidator
@@ -26,6 +116,7 @@ class ValidatorSpecifier:
         }
         self.reference_values = dict()
         self.repo = None
+        self.repo_names_index = None
         self.validation_schema = None
 
     def with_validation_schema(self, schema):
@@ -38,32 +129,21 @@ class ValidatorSpecifier:
         return self
 
     def with_reference_values(self):
-        ocl_org_filter = Organization.objects.get(mnemonic='OCL')
-        if 'reference_sources' not in cache:
-            cache.set(
-                'reference_sources',
-                ocl_org_filter.source_set.filter(mnemonic__in=REFERENCE_VALUE_SOURCE_MNEMONICS, version=HEAD),
-                FIVE_MINS
-            )
+        self.reference_values = ReferenceValuesCache.get()
 
-        sources = cache.get('reference_sources')
+        return self
 
-        self.reference_values = dict()
-        for source in sources:
-            if source.mnemonic not in cache:
-                cache.set(source.mnemonic, self._get_reference_values(source), FIVE_MINS)
-            reference_values = cache.get(source.mnemonic)
-            self.reference_values[source.mnemonic] = reference_values
+    def with_repo_names_index(self):
+        if self.repo:
+            self.repo_names_index = RepoNamesIndex(self.repo)
 
         return self
 
-    @staticmethod
-    def _get_reference_values(reference_value_source):
-        return list(reference_value_source.get_concept_name_locales().values_list('name', flat=True))
-
     def get(self):
         validator_class = self.validator_map.get(self.validation_schema, BasicConceptValidator)
-        return validator_class(repo=self.repo, reference_values=self.reference_values)
+        return validator_class(
+            repo=self.repo, reference_values=self.reference_values, repo_names_index=self.repo_names_index
+        )
 
 
 class BaseConceptValidator:
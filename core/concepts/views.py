@@ -1,26 +1,34 @@
-from django.db.models import F
+from django.db.models import F, Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from pydash import get
+from pydash import get, compact
 from rest_framework import status
 from rest_framework.generics import RetrieveAPIView, DestroyAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView, \
     ListAPIView, UpdateAPIView
 from rest_framework.mixins import CreateModelMixin
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
 from rest_framework.response import Response
 
 from core.common.constants import (
-    HEAD, INCLUDE_INVERSE_MAPPINGS_PARAM, INCLUDE_RETIRED_PARAM)
+    HEAD, ACCESS_TYPE_NONE, INCLUDE_INVERSE_MAPPINGS_PARAM, INCLUDE_RETIRED_PARAM, MAP_TYPES_PARAM, DIRECTION_PARAM,
+    DEPTH_PARAM, SOURCES_PARAM, INCLUDE_MAPPINGS_PARAM)
+from core.common.db_search import get_owner_db_fields
 from core.common.exceptions import Http409
 from core.common.mixins import ListWithHeadersMixin, ConceptDictionaryMixin
+from core.common.permissions import CanViewConceptDictionary
 from core.common.swagger_parameters import (
     q_param, limit_param, sort_desc_param, page_param, exact_match_param, sort_asc_param, verbose_param,
     include_facets_header, updated_since_param, include_inverse_mappings_param, include_retired_param,
-    compress_header)
+    compress_header, diff_from_param, diff_to_param, map_types_param, direction_param, depth_param, sources_param,
+    cursor_param)
 from core.common.views import SourceChildCommonBaseView, SourceChildExtrasView, \
     SourceChildExtraRetrieveUpdateDestroyView
-from core.concepts.constants import PARENT_VERSION_NOT_LATEST_CANNOT_UPDATE_CONCEPT
+from core.concepts.constants import PARENT_VERSION_NOT_LATEST_CANNOT_UPDATE_CONCEPT, MAX_MAPPINGS_GRAPH_DEPTH, \
+    MAPPINGS_GRAPH_DIRECTIONS, INVALID_MAPPINGS_GRAPH_PARAMS, MAX_LOOKUP_CONCEPTS, INVALID_LOOKUP_PAYLOAD
+from core.concepts.diff import ConceptVersionsDiff
 from core.concepts.documents import ConceptDocument
 from core.concepts.models import Concept, LocalizedText
 from core.concepts.permissions import CanViewParentDictionary, CanEditParentDictionary
@@ -29,7 +37,9 @@ from core.concepts.serializers import (
     ConceptDetailSerializer, ConceptListSerializer, ConceptDescriptionSerializer, ConceptNameSerializer,
     ConceptVersionDetailSerializer,
     ConceptVersionListSerializer)
+from core.mappings.models import Mapping
 from core.mappings.serializers import MappingListSerializer
+from core.sources.models import Source
 
 
 class ConceptBaseView(SourceChildCommonBaseView):
@@ -39,8 +49,8 @@ class ConceptBaseView(SourceChildCommonBaseView):
     document_model = ConceptDocument
     facet_class = ConceptSearch
     es_fields = {
-        'id': {'sortable': True, 'filterable': True},
-        'name': {'sortable': True, 'filterable': True, 'exact': True},
+        'id': {'sortable': True, 'filterable': True, 'ngram': True},
+        'name': {'sortable': True, 'filterable': True, 'exact': True, 'ngram': True},
         'last_update': {'sortable': True, 'filterable': False, 'default': 'desc'},
         'is_latest_version': {'sortable': False, 'filterable': True},
         'concept_class': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
@@ -52,6 +62,21 @@ class ConceptBaseView(SourceChildCommonBaseView):
         'owner': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
         'owner_type': {'sortable': False, 'filterable': True, 'facet': True, 'exact': True},
     }
+    db_search_fields = {
+        'id': 'mnemonic',
+        'name': 'names__name',
+        'last_update': 'updated_at',
+        'is_latest_version': 'is_latest_version',
+        'is_active': 'is_active',
+        'concept_class': 'concept_class',
+        'datatype': 'datatype',
+        'locale': 'names__locale',
+        'retired': 'retired',
+        'source': 'parent__mnemonic',
+        'collection': 'collection_set__mnemonic',
+        **get_owner_db_fields(),
+    }
+    db_full_text_fields = ['names__name']
     default_filters = dict(is_active=True)
 
     def get_detail_serializer(self, obj, data=None, files=None, partial=False):
@@ -78,15 +103,121 @@ class ConceptVersionListAllView(ConceptBaseView, ListWithHeadersMixin):
         manual_parameters=[
             q_param, limit_param, sort_desc_param, sort_asc_param, exact_match_param, page_param, verbose_param,
             include_retired_param, include_inverse_mappings_param, updated_since_param,
-            include_facets_header, compress_header
+            include_facets_header, compress_header, cursor_param
         ]
     )
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
 
+class ConceptLookupView(ConceptBaseView):
+    """
+    Resolves many concepts at once, by code (in a source/collection version) and/or by url.
+    Returns the found concepts keyed by the requested code/url and the list of the ones not found.
+    """
+    permission_classes = (AllowAny,)
+
+    def get_container(self):
+        from core.collections.models import Collection
+        if 'source' in self.kwargs:
+            model, mnemonic = Source, self.kwargs['source']
+        elif 'collection' in self.kwargs:
+            model, mnemonic = Collection, self.kwargs['collection']
+        else:
+            return None
+
+        if 'org' in self.kwargs:
+            filters = dict(organization__mnemonic=self.kwargs['org'])
+        else:
+            username = self.request.user.username if self.user_is_self else self.kwargs.get('user')
+            filters = dict(user__username=username)
+
+        container = model.get_version(mnemonic, self.kwargs.get('version', HEAD), filters)
+        if not container:
+            raise Http404()
+        if not CanViewConceptDictionary().has_object_permission(self.request, self, container):
+            raise PermissionDenied()
+
+        return container
+
+    def get_queryset(self, container=None):  # pylint: disable=arguments-differ
+        if container:
+            queryset = super().get_queryset('id')
+            if 'collection' not in self.kwargs and 'version' not in self.kwargs:
+                queryset = queryset.filter(is_latest_version=True)
+        else:
+            queryset = Concept.objects.filter(is_active=True)
+            if not self.request.user.is_staff:
+                queryset = queryset.exclude(public_access=ACCESS_TYPE_NONE)
+
+        queryset = queryset.annotate(versioned_object_uri=F('versioned_object__uri')).select_related(
+            'parent__organization', 'parent__user', 'created_by'
+        ).prefetch_related('names')
+        if self.is_verbose():
+            queryset = queryset.prefetch_related('descriptions')
+
+        return queryset
+
+    def get_serializer_class(self):
+        return ConceptDetailSerializer if self.is_verbose() else ConceptListSerializer
+
+    @staticmethod
+    def is_valid_lookup(codes, urls):
+        if not isinstance(codes, list) or not isinstance(urls, list):
+            return False
+
+        return 0 < len(codes) + len(urls) <= MAX_LOOKUP_CONCEPTS and all(
+            isinstance(key, str) and key for key in codes + urls
+        )
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT, properties=dict(
+                codes=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                urls=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+            )
+        ),
+        manual_parameters=[verbose_param]
+    )
+    def post(self, request, *args, **kwargs):  # pylint: disable=unused-argument
+        codes = get(request.data, 'codes') or []
+        urls = get(request.data, 'urls') or []
+        if not self.is_valid_lookup(codes, urls):
+            return Response(dict(detail=INVALID_LOOKUP_PAYLOAD), status=status.HTTP_400_BAD_REQUEST)
+
+        container = self.get_container()
+        criteria = Q(versioned_object__uri__in=urls, is_latest_version=True) | Q(uri__in=urls) & ~Q(
+            id=F('versioned_object_id'))
+        # codes are matched case insensitively (like mnemonic filters elsewhere), urls exactly
+        keys = set(urls)
+        codes_by_lower = dict()
+        if container:
+            criteria |= Concept.get_iexact_or_criteria('mnemonic', codes)
+            for code in codes:
+                codes_by_lower.setdefault(code.lower(), []).append(code)
+
+        found = dict()
+        for concept in self.get_queryset(container).filter(criteria):
+            for key in [concept.uri, concept.versioned_object_uri]:
+                if key in keys:
+                    found.setdefault(key, concept)
+            for key in codes_by_lower.get(concept.mnemonic.lower(), []):
+                if key not in found or concept.mnemonic == key:
+                    found[key] = concept
+
+        serializer_class = self.get_serializer_class()
+        return Response(dict(
+            found={
+                key: serializer_class(concept, context=dict(request=request)).data for key, concept in found.items()
+            },
+            missing=[key for key in codes + urls if key not in found],
+        ))
+
+
 class ConceptListView(ConceptBaseView, ListWithHeadersMixin, CreateModelMixin):
     serializer_class = ConceptListSerializer
+    search_hits_enabled = True
+    response_cache_enabled = True
 
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -100,6 +231,14 @@ class ConceptListView(ConceptBaseView, ListWithHeadersMixin, CreateModelMixin):
 
         return ConceptListSerializer
 
+    def should_serve_search_hits(self):
+        query_params = self.request.query_params
+        return super().should_serve_search_hits() and not any(
+            query_params.get(param) in ['true', True] for param in [
+                INCLUDE_MAPPINGS_PARAM, INCLUDE_INVERSE_MAPPINGS_PARAM
+            ]
+        )
+
     def get_queryset(self, _=None):
         is_latest_version = 'collection' not in self.kwargs and 'version' not in self.kwargs
         queryset = super().get_queryset()
@@ -236,6 +375,37 @@ class ConceptVersionsView(ConceptBaseView, ConceptDictionaryMixin, ListWithHeade
         return self.list(request, *args, **kwargs)
 
 
+class ConceptVersionsDiffView(ConceptBaseView):
+    permission_classes = (CanViewParentDictionary,)
+
+    def get_queryset(self, _=None):
+        return super().get_queryset(None).exclude(id=F('versioned_object_id'))
+
+    @swagger_auto_schema(manual_parameters=[diff_from_param, diff_to_param])
+    def get(self, request, *args, **kwargs):
+        from_version = request.query_params.get('from', None)
+        to_version = request.query_params.get('to', None)
+        if not from_version:
+            return Response(dict(detail='from version is required.'), status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        from_instance = queryset.filter(version=from_version).first()
+        to_instance = queryset.filter(
+            version=to_version
+        ).first() if to_version else queryset.filter(is_latest_version=True).first()
+        if not from_instance or not to_instance:
+            raise Http404()
+
+        self.check_object_permissions(request, to_instance)
+
+        return Response(
+            dict(
+                from_version=from_instance.version, to_version=to_instance.version,
+                **ConceptVersionsDiff([(from_instance.id, to_instance.id)]).get(from_instance.id, to_instance.id)
+            )
+        )
+
+
 class ConceptMappingsView(ConceptBaseView, ListAPIView):
     serializer_class = MappingListSerializer
     permission_classes = (CanViewParentDictionary,)
@@ -255,6 +425,66 @@ class ConceptMappingsView(ConceptBaseView, ListAPIView):
         return mappings_queryset
 
 
+class ConceptMappingsGraphView(ConceptBaseView):
+    permission_classes = (CanViewParentDictionary,)
+
+    def get_source_ids(self, concept):
+        urls = compact(self.request.query_params.get(SOURCES_PARAM, '').split(','))
+        if not urls:
+            return [concept.parent_id]
+
+        return [
+            source.id for source in Source.objects.filter(uri__in=urls, version=HEAD)
+            if CanViewConceptDictionary().has_object_permission(self.request, self, source)
+        ]
+
+    @swagger_auto_schema(
+        manual_parameters=[map_types_param, direction_param, depth_param, sources_param, include_retired_param]
+    )
+    def get(self, request, *args, **kwargs):
+        concept = self.get_queryset(None).first()
+        if not concept:
+            raise Http404()
+        self.check_object_permissions(request, concept)
+
+        direction = request.query_params.get(DIRECTION_PARAM, 'both')
+        depth = request.query_params.get(DEPTH_PARAM, '1')
+        if not depth.isdigit() or not 1 <= int(depth) <= MAX_MAPPINGS_GRAPH_DEPTH or \
+                direction not in MAPPINGS_GRAPH_DIRECTIONS:
+            return Response(dict(detail=INVALID_MAPPINGS_GRAPH_PARAMS), status=status.HTTP_400_BAD_REQUEST)
+
+        concept_depths, mapping_ids = concept.get_mappings_graph(
+            depth=int(depth), map_types=compact(request.query_params.get(MAP_TYPES_PARAM, '').split(',')),
+            direction=direction, source_ids=self.get_source_ids(concept),
+            include_retired=request.query_params.get(INCLUDE_RETIRED_PARAM, None) in ['true', True]
+        )
+
+        concepts = sorted(
+            Concept.objects.filter(id__in=concept_depths.keys()).select_related(
+                'parent__organization', 'parent__user', 'created_by'
+            ).prefetch_related('names'), key=lambda instance: (concept_depths[instance.id], instance.mnemonic)
+        )
+        mappings = Mapping.objects.filter(id__in=mapping_ids).values_list(
+            'mnemonic', 'uri', 'map_type', 'retired', 'from_concept__versioned_object__uri',
+            'to_concept__versioned_object__uri'
+        )
+
+        return Response(dict(
+            depth=int(depth),
+            concepts=[
+                dict(**data, depth=concept_depths[instance.id]) for instance, data in zip(
+                    concepts, ConceptListSerializer(concepts, many=True, context=dict(request=request)).data
+                )
+            ],
+            mappings=[
+                dict(
+                    id=mnemonic, url=uri, map_type=map_type, retired=retired, from_concept_url=from_concept_url,
+                    to_concept_url=to_concept_url
+                ) for mnemonic, uri, map_type, retired, from_concept_url, to_concept_url in mappings
+            ]
+        ))
+
+
 class ConceptVersionRetrieveView(ConceptBaseView, RetrieveAPIView):
     serializer_class = ConceptVersionDetailSerializer
     permission_classes = (CanViewParentDictionary,)
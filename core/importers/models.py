@@ -15,7 +15,7 @@ from core.common.services import RedisService
 from core.common.tasks import bulk_import_parts_inline
 from core.common.utils import drop_version
 from core.concepts.models import Concept
-from core.mappings.models import Mapping
+from core.mappings.models import Mapping, MappingRelationsResolver
 from core.orgs.models import Organization
 from core.sources.models import Source
 from core.users.models import UserProfile
@@ -361,9 +361,10 @@ class MappingImporter(BaseResourceImporter):
         "to_concept_name", "extras", "external_id"
     ]
 
-    def __init__(self, data, user, update_if_exists):
+    def __init__(self, data, user, update_if_exists, resolver=None):
         super().__init__(data, user, update_if_exists)
         self.version = False
+        self.resolver = resolver
 
     def exists(self):
         return self.get_queryset().exists()
@@ -415,9 +416,9 @@ class MappingImporter(BaseResourceImporter):
     def process(self):
         if self.version:
             instance = self.get_queryset().first().clone()
-            errors = Mapping.create_new_version_for(instance, self.data, self.user)
+            errors = Mapping.create_new_version_for(instance, self.data, self.user, self.resolver)
             return errors or UPDATED
-        instance = Mapping.persist_new(self.data, self.user)
+        instance = Mapping.persist_new(self.data, self.user, self.resolver)
         if instance.id:
             return CREATED
         return instance.errors or FAILED
@@ -483,6 +484,7 @@ class BulkImportInline(BaseImporter):
         self.total = len(self.input_list)
         self.start_time = time.time()
         self.elapsed_seconds = 0
+        self.mapping_relations_resolver = MappingRelationsResolver()
 
     def handle_item_import_result(self, result, item):
         if result is None:
@@ -518,6 +520,9 @@ class BulkImportInline(BaseImporter):
             print("****STARTED SUBPROCESS****")
             print("TASK ID: {}".format(self.self_task_id))
             print("***************")
+        self.mapping_relations_resolver.resolve(
+            [item for item in self.input_list if item.get('type', '').lower() == 'mapping']
+        )
         for original_item in self.input_list:
             self.processed += 1
             logger.info('Processing %s of %s', str(self.processed), str(self.total))
@@ -558,7 +563,9 @@ class BulkImportInline(BaseImporter):
                 continue
             if item_type == 'mapping':
                 self.handle_item_import_result(
-                    MappingImporter(item, self.user, self.update_if_exists).run(), original_item
+                    MappingImporter(
+                        item, self.user, self.update_if_exists, self.mapping_relations_resolver
+                    ).run(), original_item
                 )
                 continue
             if item_type == 'reference':
@@ -2,6 +2,7 @@ from mock import ANY
 
 from core.common.constants import CUSTOM_VALIDATION_SCHEMA_OPENMRS
 from core.common.tests import OCLAPITestCase
+from core.concepts.constants import INVALID_LOOKUP_PAYLOAD
 from core.concepts.models import Concept
 from core.concepts.tests.factories import ConceptFactory, LocalizedTextFactory
 from core.mappings.tests.factories import MappingFactory
@@ -862,6 +863,59 @@ class ConceptVersionsViewTest(OCLAPITestCase):
         self.assertEqual(prev_latest_version['datatype'], 'None')
 
 
+class ConceptVersionsDiffViewTest(OCLAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.concept = ConceptFactory(names=[LocalizedTextFactory(locale='en', name='c1 name')], extras=dict(foo='bar'))
+        self.user = UserProfileFactory(organizations=[self.concept.parent.organization])
+        self.token = self.user.get_token()
+
+    def test_get_400(self):
+        response = self.client.get(self.concept.uri + 'versions/diff/')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_404(self):
+        response = self.client.get(self.concept.uri + 'versions/diff/?from=foobar')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_200(self):
+        first_version = self.concept.get_latest_version()
+        response = self.client.put(
+            self.concept.uri,
+            {'names': [{
+                'locale': 'ab', 'locale_preferred': True, 'name': 'c1 name', 'name_type': 'Fully Specified'
+            }], 'datatype': 'foobar', 'extras': dict(foo='baz', tao='ching'), 'update_comment': 'Updated datatype'},
+            HTTP_AUTHORIZATION='Token ' + self.token,
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        latest_version = self.concept.get_latest_version()
+
+        response = self.client.get(self.concept.uri + 'versions/diff/?from=' + first_version.version)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['from_version'], first_version.version)
+        self.assertEqual(response.data['to_version'], latest_version.version)
+        self.assertEqual(response.data['attributes'], dict(datatype={'from': 'None', 'to': 'foobar'}))
+        self.assertEqual(
+            response.data['extras'], dict(added=dict(tao='ching'), changed=dict(foo={'from': 'bar', 'to': 'baz'}))
+        )
+        self.assertEqual([name['locale'] for name in response.data['names']['added']], ['ab'])
+        self.assertEqual([name['locale'] for name in response.data['names']['removed']], ['en'])
+        self.assertFalse('descriptions' in response.data)
+
+        response = self.client.get(
+            self.concept.uri + 'versions/diff/?from={}&to={}'.format(latest_version.version, latest_version.version)
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data, dict(from_version=latest_version.version, to_version=latest_version.version)
+        )
+
+
 class ConceptMappingsViewTest(OCLAPITestCase):
     def setUp(self):
         super().setUp()
@@ -916,3 +970,136 @@ class ConceptMappingsViewTest(OCLAPITestCase):
             sorted([mapping['uuid'] for mapping in response.data]),
             sorted([str(direct_mapping.id), str(indirect_mapping.id)])
         )
+
+
+class ConceptMappingsGraphViewTest(OCLAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = OrganizationSourceFactory()
+        self.concept1 = ConceptFactory(parent=self.source, names=[LocalizedTextFactory()])
+        self.concept2 = ConceptFactory(parent=self.source, names=[LocalizedTextFactory()])
+        self.concept3 = ConceptFactory(parent=self.source, names=[LocalizedTextFactory()])
+        self.mapping1 = MappingFactory(
+            parent=self.source, from_concept=self.concept1, to_concept=self.concept2, map_type='SAME-AS'
+        )
+        self.mapping2 = MappingFactory(
+            parent=self.source, from_concept=self.concept2, to_concept=self.concept3, map_type='NARROWER-THAN'
+        )
+        self.graph_url = self.concept1.uri + 'mappings/graph/'
+
+    def test_get_200(self):
+        response = self.client.get(self.graph_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['depth'], 1)
+        self.assertEqual(
+            [(concept['url'], concept['depth']) for concept in response.data['concepts']],
+            [(self.concept1.uri, 0), (self.concept2.uri, 1)]
+        )
+        self.assertEqual([mapping['url'] for mapping in response.data['mappings']], [self.mapping1.uri])
+        self.assertEqual(response.data['mappings'][0]['from_concept_url'], self.concept1.uri)
+        self.assertEqual(response.data['mappings'][0]['to_concept_url'], self.concept2.uri)
+
+        response = self.client.get(self.graph_url + '?depth=2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(concept['url'], concept['depth']) for concept in response.data['concepts']],
+            [(self.concept1.uri, 0), (self.concept2.uri, 1), (self.concept3.uri, 2)]
+        )
+        self.assertEqual(
+            sorted([mapping['url'] for mapping in response.data['mappings']]),
+            sorted([self.mapping1.uri, self.mapping2.uri])
+        )
+
+        response = self.client.get(self.graph_url + '?depth=2&mapTypes=same-as')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['concepts']), 2)
+        self.assertEqual([mapping['url'] for mapping in response.data['mappings']], [self.mapping1.uri])
+
+        response = self.client.get(self.concept3.uri + 'mappings/graph/?depth=2&direction=forward')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([concept['url'] for concept in response.data['concepts']], [self.concept3.uri])
+        self.assertEqual(response.data['mappings'], [])
+
+        response = self.client.get(self.concept3.uri + 'mappings/graph/?depth=2&direction=inverse')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['concepts']), 3)
+
+    def test_get_400(self):
+        response = self.client.get(self.graph_url + '?depth=10')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.graph_url + '?direction=foo')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConceptLookupViewTest(OCLAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = OrganizationSourceFactory()
+        self.concept1 = ConceptFactory(parent=self.source, names=[LocalizedTextFactory()])
+        self.concept2 = ConceptFactory(parent=self.source, names=[LocalizedTextFactory()])
+
+    def test_post_200(self):
+        response = self.client.post(
+            self.source.concepts_url + '$lookup/',
+            dict(codes=[self.concept1.mnemonic, 'foobar'], urls=[self.concept2.uri]),
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['found'].keys()), sorted([self.concept1.mnemonic, self.concept2.uri]))
+        self.assertEqual(
+            response.data['found'][self.concept1.mnemonic]['uuid'], str(self.concept1.get_latest_version().id)
+        )
+        self.assertEqual(response.data['found'][self.concept2.uri]['url'], self.concept2.uri)
+        self.assertEqual(response.data['missing'], ['foobar'])
+
+    def test_post_200_codes_case_insensitive(self):
+        response = self.client.post(
+            self.source.concepts_url + '$lookup/', dict(codes=[self.concept1.mnemonic.upper()]), format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['found'].keys()), [self.concept1.mnemonic.upper()])
+        self.assertEqual(
+            response.data['found'][self.concept1.mnemonic.upper()]['uuid'],
+            str(self.concept1.get_latest_version().id)
+        )
+        self.assertEqual(response.data['missing'], [])
+
+    def test_post_200_global(self):
+        response = self.client.post(
+            '/concepts/$lookup/?verbose=true',
+            dict(codes=[self.concept1.mnemonic], urls=[self.concept2.uri, '/orgs/foo/sources/bar/concepts/c1/']),
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['found'].keys()), [self.concept2.uri])
+        self.assertEqual(
+            response.data['found'][self.concept2.uri]['uuid'], str(self.concept2.get_latest_version().id)
+        )
+        self.assertTrue('names' in response.data['found'][self.concept2.uri])
+        self.assertEqual(
+            response.data['missing'], [self.concept1.mnemonic, '/orgs/foo/sources/bar/concepts/c1/']
+        )
+
+    def test_post_400(self):
+        for payload in [dict(codes=[]), dict(codes=[dict(a=1)]), dict(codes=['c1', '']), dict(urls=['/c1/', None])]:
+            response = self.client.post(self.source.concepts_url + '$lookup/', payload, format='json')
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, dict(detail=INVALID_LOOKUP_PAYLOAD))
+
+    def test_post_404(self):
+        response = self.client.post(
+            '/orgs/{}/sources/foobar/concepts/$lookup/'.format(self.source.organization.mnemonic),
+            dict(codes=['c1']), format='json'
+        )
+
+        self.assertEqual(response.status_code, 404)
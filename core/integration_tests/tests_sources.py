@@ -11,7 +11,7 @@ from core.common.tasks import export_source
 from core.common.tests import OCLAPITestCase
 from core.common.utils import get_latest_dir_in_path
 from core.concepts.serializers import ConceptVersionDetailSerializer
-from core.concepts.tests.factories import ConceptFactory
+from core.concepts.tests.factories import ConceptFactory, LocalizedTextFactory
 from core.mappings.serializers import MappingDetailSerializer
 from core.mappings.tests.factories import MappingFactory
 from core.orgs.models import Organization
@@ -203,6 +203,51 @@ class SourceCreateUpdateDestroyViewTest(OCLAPITestCase):
         self.assertEqual(response.data['full_name'], source.full_name)
         self.assertEqual(response.data['full_name'], 'Full name')
 
+    @patch('core.common.mixins.AsyncResult')
+    @patch('core.common.mixins.RedisService')
+    @patch('core.common.models.update_validation_schema')
+    def test_put_202_validates_large_source_in_background(
+            self, update_validation_schema_mock, redis_service_mock, async_result_mock
+    ):
+        source = OrganizationSourceFactory(organization=self.organization)
+        ConceptFactory(parent=source)
+        ConceptFactory(parent=source)
+
+        with self.settings(INLINE_CHILD_CONCEPTS_VALIDATION_LIMIT=1):
+            response = self.client.put(
+                source.uri,
+                {'custom_validation_schema': 'OpenMRS'},
+                HTTP_AUTHORIZATION='Token ' + self.token,
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, 202)
+        task_id = response.data['task']
+        self.assertIsNone(response.data['custom_validation_schema'])
+        update_validation_schema_mock.apply_async.assert_called_once_with((source.id, 'OpenMRS'), task_id=task_id)
+
+        details = dict(url=source.uri, processed=2, total=2, failed_concept_validations=[])
+        redis_service_mock.return_value.get_formatted.side_effect = lambda key: details if key == task_id else None
+        async_result_mock.return_value = Mock(
+            state='SUCCESS', failed=Mock(return_value=False), successful=Mock(return_value=True)
+        )
+        response = self.client.get(
+            source.uri + 'HEAD/processing/?task=' + task_id,
+            HTTP_AUTHORIZATION='Token ' + self.token,
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, dict(task=task_id, state='SUCCESS', details=details))
+
+        response = self.client.get(
+            source.uri + 'HEAD/processing/?task=unknown',
+            HTTP_AUTHORIZATION='Token ' + self.token,
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 404)
+
     def test_delete_204(self):
         source = OrganizationSourceFactory(organization=self.organization)
         response = self.client.delete(
@@ -455,6 +500,74 @@ class SourceVersionRetrieveUpdateDestroyViewTest(OCLAPITestCase):
         self.assertTrue(self.source.versions.filter(version='v1').exists())
 
 
+class SourceVersionConceptsDiffViewTest(OCLAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = OrganizationSourceFactory()
+        self.user = UserProfileFactory(organizations=[self.source.organization])
+        self.token = self.user.get_token()
+        self.unchanged_concept = ConceptFactory(parent=self.source)
+        self.removed_concept = ConceptFactory(parent=self.source)
+        self.changed_concept = ConceptFactory(
+            parent=self.source, names=[LocalizedTextFactory(locale='en', name='c1 name')]
+        )
+        self.source_v1 = OrganizationSourceFactory(
+            mnemonic=self.source.mnemonic, organization=self.source.organization, version='v1'
+        )
+        self.source_v1.seed_concepts()
+
+    def test_get_400(self):
+        response = self.client.get(
+            self.source.uri + 'HEAD/diff/', HTTP_AUTHORIZATION='Token ' + self.token, format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_404(self):
+        response = self.client.get(
+            self.source.uri + 'HEAD/diff/?from=v2', HTTP_AUTHORIZATION='Token ' + self.token, format='json'
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_200(self):
+        removed_version = self.removed_concept.get_latest_version()
+        self.source.concepts.remove(removed_version)
+        added_concept = ConceptFactory(parent=self.source)
+        response = self.client.put(
+            self.changed_concept.uri,
+            {'names': [{
+                'locale': 'en', 'locale_preferred': True, 'name': 'c1 name', 'name_type': 'Fully Specified'
+            }], 'datatype': 'Numeric', 'update_comment': 'Updated datatype'},
+            HTTP_AUTHORIZATION='Token ' + self.token,
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        changed_version = self.changed_concept.get_latest_version()
+
+        response = self.client.get(
+            self.source.uri + 'HEAD/diff/?from=v1', HTTP_AUTHORIZATION='Token ' + self.token, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['from_version'], 'v1')
+        self.assertEqual(response.data['to_version'], 'HEAD')
+        self.assertEqual(response.data['concepts']['added'], [added_concept.get_latest_version().uri])
+        self.assertEqual(response.data['concepts']['removed'], [removed_version.uri])
+        self.assertEqual(list(response.data['concepts']['changed'].keys()), [changed_version.uri])
+        self.assertEqual(
+            response.data['concepts']['changed'][changed_version.uri]['attributes'],
+            dict(datatype={'from': 'None', 'to': 'Numeric'})
+        )
+
+        response = self.client.get(
+            self.source_v1.uri + 'diff/?from=v1', HTTP_AUTHORIZATION='Token ' + self.token, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['concepts'], dict(added=[], removed=[], changed=dict()))
+
+
 class SourceExtraRetrieveUpdateDestroyViewTest(OCLAPITestCase):
     def setUp(self):
         super().setUp()
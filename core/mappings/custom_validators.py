@@ -13,15 +13,7 @@ class OpenMRSMappingValidator:
         self.lookup_attributes_should_be_valid()
 
     def pair_must_be_unique(self):
-        from .models import Mapping
-        queryset = Mapping.objects.filter(
-            parent=self.mapping.parent, is_active=True, retired=False,
-            from_source_url=self.mapping.from_source_url, from_concept_code=self.mapping.from_concept_code,
-            to_source_url=self.mapping.to_source_url, to_concept_code=self.mapping.to_concept_code,
-        )
-
-        if self.mapping.versioned_object_id:
-            queryset = queryset.exclude(versioned_object_id=self.mapping.versioned_object_id)
+        queryset = self.mapping.get_natural_key_duplicates().filter(retired=False)
 
         if queryset.exists():
             raise ValidationError(OPENMRS_SINGLE_MAPPING_BETWEEN_TWO_CONCEPTS)
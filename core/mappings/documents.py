@@ -1,12 +1,17 @@
 from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
+from elasticsearch_dsl import Join, Keyword
 from pydash import get
 
+from core.common.constants import MEMBER_DOCUMENT, MEMBERSHIP_DOCUMENT
+from core.common.documents import MembershipDocumentMixin
+from core.common.search import get_ngram_subfields
+from core.common.utils import chunked_queryset_iterator
 from core.mappings.models import Mapping
 
 
 @registry.register_document
-class MappingDocument(Document):
+class MappingDocument(MembershipDocumentMixin, Document):
     class Index:
         name = 'mappings'
         settings = {'number_of_shards': 1, 'number_of_replicas': 0}
@@ -16,7 +21,9 @@ class MappingDocument(Document):
         fields = [
             'external_id'
         ]
+        queryset_pagination = 1000
 
+    db_id = fields.KeywordField(attr='id')
     last_update = fields.DateField(attr='updated_at')
     owner = fields.KeywordField(attr='owner_name', normalizer="lowercase")
     owner_type = fields.KeywordField(attr='owner_type')
@@ -25,9 +32,9 @@ class MappingDocument(Document):
     is_active = fields.KeywordField(attr='is_active')
     is_latest_version = fields.KeywordField(attr='is_latest_version')
     map_type = fields.KeywordField(attr='map_type', normalizer="lowercase")
-    from_concept = fields.ListField(fields.KeywordField())
-    to_concept = fields.ListField(fields.KeywordField())
-    concept = fields.ListField(fields.KeywordField())
+    from_concept = fields.ListField(fields.KeywordField(fields=get_ngram_subfields()))
+    to_concept = fields.ListField(fields.KeywordField(fields=get_ngram_subfields()))
+    concept = fields.ListField(fields.KeywordField(fields=get_ngram_subfields()))
     concept_source = fields.ListField(fields.KeywordField())
     concept_owner = fields.ListField(fields.KeywordField())
     from_concept_owner = fields.KeywordField(attr='from_source_owner')
@@ -37,13 +44,28 @@ class MappingDocument(Document):
     to_concept_owner_type = fields.KeywordField(attr='to_source_owner_type')
     from_concept_source = fields.KeywordField(attr='from_source_name')
     to_concept_source = fields.KeywordField(attr='to_source_name')
-    source_version = fields.ListField(fields.KeywordField())
-    collection_version = fields.ListField(fields.KeywordField())
     collection = fields.ListField(fields.KeywordField())
-    collection_owner_url = fields.ListField(fields.KeywordField())
     public_can_view = fields.BooleanField(attr='public_can_view')
-    id = fields.KeywordField(attr='mnemonic', normalizer="lowercase")
+    id = fields.KeywordField(attr='mnemonic', normalizer="lowercase", fields=get_ngram_subfields())
     extras = fields.ObjectField()
+    summary = fields.ObjectField(enabled=False)
+    membership_join = Join(relations={MEMBER_DOCUMENT: MEMBERSHIP_DOCUMENT})
+    # membership documents only, see MembershipDocumentMixin
+    source_version = Keyword()
+    collection_version = Keyword()
+    collection_owner_url = Keyword()
+
+    def get_queryset(self):
+        return super().get_queryset().select_related(
+            'parent__organization', 'parent__user', 'from_concept__parent', 'to_concept__parent',
+            'from_source__organization', 'from_source__user', 'to_source__organization', 'to_source__user',
+        ).prefetch_related(
+            'from_concept__names', 'to_concept__names', 'sources', 'collection_set__organization',
+            'collection_set__user'
+        )
+
+    def get_indexing_queryset(self):
+        return chunked_queryset_iterator(self.get_queryset(), self.django.queryset_pagination)
 
     @staticmethod
     def prepare_from_concept(instance):
@@ -69,22 +91,15 @@ class MappingDocument(Document):
     def prepare_concept_owner_type(instance):
         return [instance.from_source_owner_type, instance.to_source_owner_type]
 
-    @staticmethod
-    def prepare_source_version(instance):
-        return list(instance.sources.values_list('version', flat=True))
-
-    @staticmethod
-    def prepare_collection_version(instance):
-        return list(instance.collection_set.values_list('version', flat=True))
-
     @staticmethod
     def prepare_collection(instance):
-        return list(set(list(instance.collection_set.values_list('mnemonic', flat=True))))
-
-    @staticmethod
-    def prepare_collection_owner_url(instance):
-        return list({coll.parent_url for coll in instance.collection_set.select_related('user', 'organization')})
+        return list({collection.mnemonic for collection in instance.collection_set.all()})
 
     @staticmethod
     def prepare_extras(instance):
         return instance.extras or {}
+
+    @staticmethod
+    def prepare_summary(instance):
+        from core.mappings.serializers import MappingListSerializer
+        return MappingListSerializer(instance).data
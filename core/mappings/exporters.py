@@ -0,0 +1,117 @@
+from pydash import get
+
+from core.common.exporters import BaseExporter
+from core.common.utils import drop_version
+from core.concepts.exporters import get_localized_texts, get_preferred_name
+from core.mappings.constants import MAPPING_TYPE
+from core.mappings.models import Mapping
+
+
+class MappingExporter(BaseExporter):
+    """Same documents as MappingDetailSerializer"""
+    model = Mapping
+    fields = (
+        'id', 'mnemonic', 'external_id', 'retired', 'map_type', 'extras', 'version', 'created_at', 'updated_at',
+        'created_by__username', 'comment', 'is_latest_version', 'uri', 'versioned_object_id',
+        'from_concept', 'from_concept__uri', 'from_concept_code', 'from_concept_name',
+        'from_concept__parent__default_locale', 'from_concept__parent__supported_locales',
+        'to_concept', 'to_concept__uri', 'to_concept_code', 'to_concept_name',
+        'to_concept__parent__default_locale', 'to_concept__parent__supported_locales',
+        'from_source_url', 'from_source_version', 'from_source_mnemonic', 'from_owner_mnemonic', 'from_owner_type',
+        'to_source_url', 'to_source_version', 'to_source_mnemonic', 'to_owner_mnemonic', 'to_owner_type',
+    )
+
+    def get_owner_fields(self):
+        return [
+            *super().get_owner_fields(),
+            *self.get_source_fields('from_source'), *self.get_source_fields('from_concept__parent'),
+            *self.get_source_fields('to_source'), *self.get_source_fields('to_concept__parent'),
+        ]
+
+    def to_representations(self, rows):
+        names = get_localized_texts(
+            self.get_ids(rows, 'from_concept') | self.get_ids(rows, 'to_concept'), 'name_locales')
+        return [self.to_representation(row, names) for row in rows]
+
+    def to_representation(self, row, names):
+        owner, owner_type, _ = self.get_source_owner(row)
+        from_source_name, from_source_owner, from_source_owner_type = self.get_mapped_source(row, 'from')
+        to_source_name, to_source_owner, to_source_owner_type = self.get_mapped_source(row, 'to')
+        data = dict(
+            external_id=row['external_id'],
+            retired=row['retired'],
+            map_type=row['map_type'],
+            source=row['parent__mnemonic'],
+            owner=str(owner or ''),
+            owner_type=owner_type,
+            from_concept_code=row['from_concept_code'],
+            from_concept_name=row['from_concept_name'],
+            from_concept_url=row['from_concept__uri'] if row['from_concept'] else '',
+            to_concept_code=row['to_concept_code'],
+            to_concept_name=row['to_concept_name'],
+            to_concept_url=row['to_concept__uri'],
+            from_source_owner=from_source_owner or '',
+            from_source_owner_type=from_source_owner_type,
+            from_source_url=row['from_source_url'],
+            from_source_name=from_source_name,
+            to_source_owner=to_source_owner or '',
+            to_source_owner_type=to_source_owner_type,
+            to_source_url=row['to_source_url'],
+            to_source_name=to_source_name,
+            url=drop_version(row['uri']),
+            version=row['version'],
+            id=row['mnemonic'],
+            versioned_object_id=row['versioned_object_id'],
+            versioned_object_url=drop_version(row['uri']),
+            is_latest_version=row['is_latest_version'],
+            update_comment=row['comment'],
+            version_url=self.get_version_url(row),
+            uuid=str(row['id']),
+            version_created_on=self.to_datetime_representation(row['created_at']),
+            from_source_version=row['from_source_version'],
+            to_source_version=row['to_source_version'],
+            from_concept_name_resolved=self.get_concept_display_name(row, 'from_concept', names),
+            to_concept_name_resolved=self.get_concept_display_name(row, 'to_concept', names),
+            extras=row['extras'],
+            type=MAPPING_TYPE,
+            created_on=self.to_datetime_representation(row['created_at']),
+            updated_on=self.to_datetime_representation(row['updated_at']),
+            created_by=row['created_by__username'],
+            updated_by=row['created_by__username'],
+            previous_version_url=row['previous_version_uri'],
+        )
+        # fields the serializer skips, their source raising an AttributeError
+        if data['version_url'] is None and row['id'] == row['versioned_object_id']:
+            data.pop('version_url')
+        for concept_field in ['from_concept', 'to_concept']:
+            if not row[concept_field]:
+                data.pop(concept_field + '_name_resolved')
+        if row['created_by__username'] is None:
+            data.pop('created_by')
+            data.pop('updated_by')
+
+        return data
+
+    def get_mapped_source(self, row, direction):
+        """(name, owner mnemonic, owner type) of Mapping.get_from_source/get_to_source, unless populated"""
+        source_lookup = direction + '_source'
+        if not row[source_lookup]:
+            source_lookup = direction + '_concept__parent' if row[direction + '_concept'] else None
+
+        name, owner, owner_type = None, None, None
+        if source_lookup:
+            owner, owner_type, _ = self.get_source_owner(row, source_lookup)
+            name = row[source_lookup + '__mnemonic']
+
+        return (
+            row[direction + '_source_mnemonic'] or name,
+            row[direction + '_owner_mnemonic'] or owner,
+            row[direction + '_owner_type'] or owner_type,
+        )
+
+    @staticmethod
+    def get_concept_display_name(row, concept_field, names):
+        return get(get_preferred_name(
+            names.get(row[concept_field], []), row[concept_field + '__parent__default_locale'],
+            row[concept_field + '__parent__supported_locales']
+        ), 'name')
@@ -0,0 +1,42 @@
+# Generated by Django 3.0.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mappings', '0013_auto_20210115_0823'),
+    ]
+
+    # same as Mapping.get_natural_key_hash, older duplicates (if any) are left without hash so the index can be built
+    operations = [
+        migrations.AddField(
+            model_name='mapping',
+            name='natural_key_hash',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE mappings SET natural_key_hash = md5(concat_ws(
+                '|', parent_id::text, coalesce(from_source_url, ''), from_concept_code,
+                coalesce(to_source_url, ''), to_concept_code
+            ))
+            WHERE coalesce(from_concept_code, '') != '' AND coalesce(to_concept_code, '') != '';
+            UPDATE mappings SET natural_key_hash = NULL WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (PARTITION BY natural_key_hash, map_type ORDER BY id DESC) AS position
+                    FROM mappings WHERE natural_key_hash IS NOT NULL AND is_latest_version AND is_active
+                ) AS natural_keys WHERE position > 1
+            );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='mapping',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('is_active', True), ('is_latest_version', True)),
+                fields=('natural_key_hash', 'map_type'), name='mappings_natural_key_hash_unique'
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.0.9 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+def get_denormalize_sql(direction):
+    return """
+    UPDATE mappings SET
+        {direction}_source_mnemonic = sources.mnemonic,
+        {direction}_owner_mnemonic = COALESCE(organizations.mnemonic, user_profiles.username),
+        {direction}_owner_type = CASE WHEN sources.organization_id IS NOT NULL THEN 'Organization' ELSE 'User' END
+    FROM sources
+    LEFT JOIN organizations ON organizations.id = sources.organization_id
+    LEFT JOIN user_profiles ON user_profiles.id = sources.user_id
+    WHERE sources.id = COALESCE(
+        mappings.{direction}_source_id,
+        (SELECT concepts.parent_id FROM concepts WHERE concepts.id = mappings.{direction}_concept_id)
+    );
+    """.format(direction=direction)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mappings', '0014_auto_20261019_1000'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mapping',
+            name='from_owner_mnemonic',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mapping',
+            name='from_owner_type',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mapping',
+            name='from_source_mnemonic',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mapping',
+            name='to_owner_mnemonic',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mapping',
+            name='to_owner_type',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mapping',
+            name='to_source_mnemonic',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunSQL(sql=get_denormalize_sql('from'), reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(sql=get_denormalize_sql('to'), reverse_sql=migrations.RunSQL.noop),
+    ]
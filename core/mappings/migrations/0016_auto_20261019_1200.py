@@ -0,0 +1,26 @@
+# Generated by Django 3.0.9 on 2026-10-19 12:00
+
+from django.db import migrations
+
+
+def get_trigram_index_operation(column):
+    return migrations.RunSQL(
+        sql='CREATE INDEX IF NOT EXISTS mappings_{column}_trgm ON mappings '
+            'USING gin (UPPER({column}::text) gin_trgm_ops);'.format(column=column),
+        reverse_sql='DROP INDEX IF EXISTS mappings_{column}_trgm;'.format(column=column),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concepts', '0008_auto_20261019_1200'),
+        ('mappings', '0015_auto_20261019_1100'),
+    ]
+
+    # for the postgres search backend (core.common.db_search), pg_trgm is created by concepts 0008
+    operations = [
+        get_trigram_index_operation(column) for column in [
+            'mnemonic', 'from_concept_code', 'from_concept_name', 'to_concept_code', 'to_concept_name'
+        ]
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.9 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mappings', '0016_auto_20261019_1200'),
+    ]
+
+    # 0014 left the duplicates without hash, they have to stay so when saved again
+    operations = [
+        migrations.AddField(
+            model_name='mapping',
+            name='is_legacy_natural_key_duplicate',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE mappings SET is_legacy_natural_key_duplicate = true
+            WHERE natural_key_hash IS NULL
+            AND coalesce(from_concept_code, '') != '' AND coalesce(to_concept_code, '') != '';
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -12,7 +12,6 @@ from .custom_validators import OpenMRSMappingValidator
 
 class MappingValidationMixin:
     def clean(self):
-        from .models import Mapping
         errors = []
         if not self.from_concept_code:
             errors.append(MUST_SPECIFY_FROM_CONCEPT)
@@ -20,13 +19,9 @@ class MappingValidationMixin:
             errors.append(MUST_SPECIFY_TO_CONCEPT_OR_TO_SOURCE)
         if self.is_from_same_as_to():
             errors.append(CANNOT_MAP_CONCEPT_TO_SELF)
-        if Mapping.objects.exclude(
+        if self.get_natural_key_duplicates().exclude(
                 versioned_object_id=self.versioned_object_id
-        ).filter(
-            parent_id=self.parent_id, map_type=self.map_type,
-            from_concept_code=self.from_concept_code, to_concept_code=self.to_concept_code,
-            to_source_url=self.to_source_url, from_source_url=self.from_source_url
-        ).exists():
+        ).filter(map_type=self.map_type).exists():
             errors.append(TO_SOURCE_UNIQUE_ATTRIBUTES_ERROR_MESSAGE)
 
         if errors:
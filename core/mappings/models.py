@@ -1,8 +1,10 @@
+import hashlib
 import uuid
 
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models, IntegrityError, transaction
+from django.db import models, IntegrityError, transaction, connection
+from django.utils import timezone
 from pydash import get, compact
 
 from core.common.constants import INCLUDE_RETIRED_PARAM, NAMESPACE_REGEX, HEAD
@@ -18,6 +20,12 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
     class Meta:
         db_table = 'mappings'
         unique_together = ('mnemonic', 'version', 'parent')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['natural_key_hash', 'map_type'], name='mappings_natural_key_hash_unique',
+                condition=models.Q(is_latest_version=True, is_active=True)
+            )
+        ]
 
     parent = models.ForeignKey('sources.Source', related_name='mappings_set', on_delete=models.CASCADE)
     map_type = models.TextField(db_index=True)
@@ -55,6 +63,19 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
     to_source_url = models.TextField(null=True, blank=True, db_index=True)
     to_source_version = models.TextField(null=True, blank=True)
 
+    # denormalized from from/to source (or concept's parent), see populate_source_owner_fields
+    from_source_mnemonic = models.TextField(null=True, blank=True)
+    from_owner_mnemonic = models.TextField(null=True, blank=True)
+    from_owner_type = models.TextField(null=True, blank=True)
+    to_source_mnemonic = models.TextField(null=True, blank=True)
+    to_owner_mnemonic = models.TextField(null=True, blank=True)
+    to_owner_type = models.TextField(null=True, blank=True)
+
+    # md5 of parent, from/to source url and concept code, kept in sync on save, unique with map_type on latest versions
+    natural_key_hash = models.CharField(max_length=32, null=True, blank=True)
+    # latest versions duplicating another one when the hash was introduced, they are saved without hash
+    is_legacy_natural_key_duplicate = models.BooleanField(default=False)
+
     logo_path = None
     name = None
     full_name = None
@@ -73,6 +94,30 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
     def mapping(self):  # for url kwargs
         return self.mnemonic
 
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        self.natural_key_hash = None if self.is_legacy_natural_key_duplicate else self.get_natural_key_hash()
+        super().save(force_insert, force_update, using, update_fields)
+
+    def get_natural_key_hash(self):
+        if not self.from_concept_code or not self.to_concept_code:
+            return None
+
+        return hashlib.md5('|'.join([
+            str(self.parent_id), self.from_source_url or '', self.from_concept_code,
+            self.to_source_url or '', self.to_concept_code
+        ]).encode('utf-8')).hexdigest()
+
+    def get_natural_key_duplicates(self):
+        natural_key_hash = self.get_natural_key_hash()
+        if not natural_key_hash:
+            return Mapping.objects.none()
+
+        queryset = Mapping.objects.filter(natural_key_hash=natural_key_hash, is_latest_version=True, is_active=True)
+        if self.versioned_object_id:
+            queryset = queryset.exclude(versioned_object_id=self.versioned_object_id)
+
+        return queryset
+
     @property
     def source(self):
         return get(self, 'parent.mnemonic')
@@ -83,19 +128,19 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
 
     @property
     def from_source_owner(self):
-        return str(get(self.get_from_source(), 'parent', ''))
+        return self.from_source_owner_mnemonic or ''
 
     @property
     def from_source_owner_mnemonic(self):
-        return get(self.get_from_source(), 'parent.mnemonic')
+        return self.from_owner_mnemonic or get(self.get_from_source(), 'parent.mnemonic')
 
     @property
     def from_source_owner_type(self):
-        return get(self.get_from_source(), 'parent.resource_type')
+        return self.from_owner_type or get(self.get_from_source(), 'parent.resource_type')
 
     @property
     def from_source_name(self):
-        return get(self.get_from_source(), 'mnemonic')
+        return self.from_source_mnemonic or get(self.get_from_source(), 'mnemonic')
 
     @property
     def from_source_shorthand(self):
@@ -125,25 +170,37 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
 
         return None
 
+    def populate_source_owner_fields(self):
+        from_source = self.get_from_source()
+        to_source = self.get_to_source()
+        self.from_source_mnemonic = get(from_source, 'mnemonic')
+        self.from_owner_mnemonic = get(from_source, 'parent.mnemonic')
+        self.from_owner_type = get(from_source, 'parent.resource_type')
+        self.to_source_mnemonic = get(to_source, 'mnemonic')
+        self.to_owner_mnemonic = get(to_source, 'parent.mnemonic')
+        self.to_owner_type = get(to_source, 'parent.resource_type')
+
     @property
     def to_source_name(self):
-        return get(self.get_to_source(), 'mnemonic')
+        return self.to_source_mnemonic or get(self.get_to_source(), 'mnemonic')
 
     @property
     def to_source_owner(self):
-        return str(get(self.get_to_source(), 'parent', ''))
+        return self.to_source_owner_mnemonic or ''
 
     @property
     def to_source_owner_mnemonic(self):
-        return get(self.get_to_source(), 'parent.mnemonic')
+        return self.to_owner_mnemonic or get(self.get_to_source(), 'parent.mnemonic')
 
     @property
     def to_source_owner_type(self):
-        return get(self.get_to_source(), 'parent.resource_type')
+        return self.to_owner_type or get(self.get_to_source(), 'parent.resource_type')
 
     @property
     def to_source_shorthand(self):
-        return self.get_to_source() and "%s:%s" % (self.to_source_owner_mnemonic, self.to_source_name)
+        if not self.to_source_id and not self.to_concept_id:  # get_to_source() is None, without loading it
+            return None
+        return "%s:%s" % (self.to_source_owner_mnemonic, self.to_source_name)
 
     def get_to_concept_name(self):
         return self.to_concept_name or get(self, 'to_concept.display_name')
@@ -192,6 +249,12 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
             from_source_id=self.from_source_id,
             from_source_url=self.from_source_url,
             from_source_version=self.from_source_version,
+            from_source_mnemonic=self.from_source_mnemonic,
+            from_owner_mnemonic=self.from_owner_mnemonic,
+            from_owner_type=self.from_owner_type,
+            to_source_mnemonic=self.to_source_mnemonic,
+            to_owner_mnemonic=self.to_owner_mnemonic,
+            to_owner_type=self.to_owner_type,
         )
         if user:
             mapping.created_by = mapping.updated_by = user
@@ -208,37 +271,17 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
         initial_version.save()
         return initial_version
 
-    def populate_fields_from_relations(self, data):
-        from core.concepts.models import Concept
-        from core.sources.models import Source
+    def populate_fields_from_relations(self, data, resolver=None):
+        resolver = resolver or MappingRelationsResolver()
 
         to_concept_url = data.get('to_concept_url', None)
         from_concept_url = data.get('from_concept_url', None)
         to_source_url = data.get('to_source_url', None)
         from_source_url = data.get('from_source_url', None)
 
-        def get_concept(expression):
-            concept = Concept.objects.filter(uri=expression).first()
-            if concept:
-                return concept
-
-            parent_uri = to_parent_uri(expression)
-            code = expression.replace(parent_uri, '').replace('concepts/', '').split('/')[0]
-            return dict(mnemonic=code)
-
-        def get_source_info(parent_uri, child_uri, existing_version, concept):
-            if not parent_uri and not child_uri:
-                return existing_version, get(concept, 'parent.uri')
-
-            if parent_uri:
-                version, uri = separate_version(parent_uri)
-            else:
-                version, uri = separate_version(to_parent_uri(child_uri))
-
-            return version or existing_version, uri or get(concept, 'parent.uri')
-
-        from_concept = get_concept(from_concept_url) if from_concept_url else get(self, 'from_concept')
-        to_concept = get_concept(to_concept_url) if to_concept_url else get(self, 'to_concept')
+        resolver.resolve_concepts(compact([from_concept_url, to_concept_url]))
+        from_concept = resolver.get_concept(from_concept_url) if from_concept_url else get(self, 'from_concept')
+        to_concept = resolver.get_concept(to_concept_url) if to_concept_url else get(self, 'to_concept')
 
         self.from_concept_id = get(from_concept, 'id')
         self.to_concept_id = get(to_concept, 'id')
@@ -249,23 +292,25 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
         self.to_concept_code = data.get('to_concept_code', None) or get(to_concept, 'mnemonic') or self.to_concept_code
         self.to_concept_name = data.get('to_concept_name', None) or self.to_concept_name
 
-        self.from_source_version, self.from_source_url = get_source_info(
+        self.from_source_version, self.from_source_url = resolver.get_source_info(
             from_source_url, from_concept_url, self.from_source_version, from_concept
         )
-        self.to_source_version, self.to_source_url = get_source_info(
+        self.to_source_version, self.to_source_url = resolver.get_source_info(
             to_source_url, to_concept_url, self.to_source_version, to_concept
         )
 
-        self.to_source = Source.objects.filter(
-            models.Q(uri=self.to_source_url) | models.Q(canonical_url=self.to_source_url)
-        ).filter(version=HEAD).first()
-        self.from_source = Source.objects.filter(
-            models.Q(uri=self.from_source_url) | models.Q(canonical_url=self.from_source_url)
-        ).filter(version=HEAD).first()
+        resolver.resolve_sources(compact([self.from_source_url, self.to_source_url]))
+        self.to_source = resolver.get_source(self.to_source_url)
+        self.from_source = resolver.get_source(self.from_source_url)
+        if isinstance(from_concept, models.Model):
+            self.from_concept = from_concept
+        if isinstance(to_concept, models.Model):
+            self.to_concept = to_concept
+        self.populate_source_owner_fields()
 
     @classmethod
-    def create_new_version_for(cls, instance, data, user):
-        instance.populate_fields_from_relations(data)
+    def create_new_version_for(cls, instance, data, user, resolver=None):
+        instance.populate_fields_from_relations(data, resolver)
         instance.extras = data.get('extras', instance.extras)
         instance.external_id = data.get('external_id', instance.external_id)
         instance.comment = data.get('update_comment') or data.get('comment')
@@ -276,13 +321,13 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
         return cls.persist_clone(instance, user)
 
     @classmethod
-    def persist_new(cls, data, user):
+    def persist_new(cls, data, user, resolver=None):
         related_fields = ['from_concept_url', 'to_concept_url', 'to_source_url', 'from_source_url']
         field_data = {k: v for k, v in data.items() if k not in related_fields}
         url_params = {k: v for k, v in data.items() if k in related_fields}
 
         mapping = Mapping(**field_data, created_by=user, updated_by=user)
-        mapping.populate_fields_from_relations(url_params)
+        mapping.populate_fields_from_relations(url_params, resolver)
 
         temp_version = generate_temp_version()
         mapping.mnemonic = data.get('mnemonic', temp_version)
@@ -331,6 +376,13 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
         mapping.from_source_url = self.from_source_url
         mapping.from_source_version = self.from_source_version
 
+        mapping.from_source_mnemonic = self.from_source_mnemonic
+        mapping.from_owner_mnemonic = self.from_owner_mnemonic
+        mapping.from_owner_type = self.from_owner_type
+        mapping.to_source_mnemonic = self.to_source_mnemonic
+        mapping.to_owner_mnemonic = self.to_owner_mnemonic
+        mapping.to_owner_type = self.to_owner_type
+
         mapping.save()
 
     @classmethod
@@ -350,18 +402,18 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
             with transaction.atomic():
                 cls.pause_indexing()
 
+                # previous latest version is unflagged first, only one latest version can hold the natural key
+                latest_version = obj.versioned_object.versions.filter(is_latest_version=True).first()
+                if latest_version:
+                    latest_version.is_latest_version = False
+                    latest_version.save()
+
                 obj.is_latest_version = True
                 obj.save(**kwargs)
                 if obj.id:
                     obj.version = str(obj.id)
                     obj.save()
                     obj.update_versioned_object()
-                    versioned_object = obj.versioned_object
-                    latest_version = versioned_object.versions.exclude(id=obj.id).filter(is_latest_version=True).first()
-                    if latest_version:
-                        latest_version.is_latest_version = False
-                        latest_version.save()
-
                     obj.sources.set(compact([parent, parent_head]))
                     persisted = True
                     cls.resume_indexing()
@@ -374,6 +426,8 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
                     transaction.on_commit(index_all)
         except ValidationError as err:
             errors.update(err.message_dict)
+        except IntegrityError as err:
+            errors.update(dict(__all__=err.args))
         finally:
             cls.resume_indexing()
             if not persisted:
@@ -437,5 +491,112 @@ class Mapping(MappingValidationMixin, SourceChildMixin, VersionedModel):
 
         return queryset
 
+    @classmethod
+    def link_dangling(cls, relation, resource, source_urls, concept_code=None):
+        """
+        Links all mappings not yet linked on relation (from_concept/to_concept/from_source/to_source), and pointing
+        to any of the source_urls (and concept_code), to resource in a single UPDATE statement.
+        Denormalized source/owner fields of the direction are filled in, if not already.
+        Returns ids of the linked mappings.
+        """
+        if relation not in ['from_concept', 'to_concept', 'from_source', 'to_source'] or not source_urls:
+            return []
+
+        direction = relation.split('_')[0]
+        source = resource.parent if relation.endswith('_concept') else resource
+        sql = "UPDATE {table} SET {relation}_id = %s, updated_at = %s, " \
+              "{direction}_source_mnemonic = COALESCE({direction}_source_mnemonic, %s), " \
+              "{direction}_owner_mnemonic = COALESCE({direction}_owner_mnemonic, %s), " \
+              "{direction}_owner_type = COALESCE({direction}_owner_type, %s) " \
+              "WHERE {relation}_id IS NULL AND {direction}_source_url = ANY(%s)"
+        params = [
+            resource.id, timezone.now(), source.mnemonic, get(source, 'parent.mnemonic'),
+            get(source, 'parent.resource_type'), list(source_urls)
+        ]
+        if concept_code is not None:
+            sql += " AND {direction}_concept_code = %s"
+            params.append(concept_code)
+        sql += " RETURNING id"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=cls._meta.db_table, relation=relation, direction=direction), params)
+            return [row[0] for row in cursor.fetchall()]
+
     def is_from_same_as_to(self):
         return self.from_concept_code == self.to_concept_code and self.from_source_url == self.to_source_url
+
+
+class MappingRelationsResolver:
+    """
+    Resolves from/to concepts and HEAD sources referred by mapping payloads, with one query per distinct set of urls.
+    Resolved concepts are memoized by uri and HEAD sources by uri and canonical_url. Unresolved urls are not memoized,
+    they are looked up again next time as they can be created in between (e.g. further down the same import).
+    """
+    def __init__(self):
+        self.concepts = dict()
+        self.sources = dict()
+
+    def resolve(self, payloads):
+        concept_urls = [data.get(direction + '_concept_url') for data in payloads for direction in ['from', 'to']]
+        self.resolve_concepts(compact(concept_urls))
+
+        source_urls = []
+        for data in payloads:
+            for direction in ['from', 'to']:
+                concept_url = data.get(direction + '_concept_url')
+                source_urls.append(self.get_source_info(
+                    data.get(direction + '_source_url'), concept_url, None,
+                    self.get_concept(concept_url) if concept_url else None
+                )[1])
+        self.resolve_sources(compact(source_urls))
+
+        return self
+
+    def resolve_concepts(self, urls):
+        from core.concepts.models import Concept
+        urls = set(urls) - set(self.concepts)
+        if urls:
+            queryset = Concept.objects.select_related('parent__organization', 'parent__user').filter(uri__in=urls)
+            for concept in queryset:
+                self.concepts[concept.uri] = concept
+
+    def resolve_sources(self, urls):
+        from core.sources.models import Source
+        queryset = Source.objects.select_related('organization', 'user').filter(version=HEAD)
+        urls = set(urls) - set(self.sources)
+        if urls:
+            for source in queryset.filter(uri__in=urls):
+                self.memoize_source(source)
+        urls = urls - set(self.sources)
+        if urls:
+            for source in queryset.filter(canonical_url__in=urls):
+                self.memoize_source(source)
+
+    def memoize_source(self, source):
+        self.sources.setdefault(source.uri, source)
+        if source.canonical_url:
+            self.sources.setdefault(source.canonical_url, source)
+
+    def get_concept(self, expression):
+        concept = self.concepts.get(expression)
+        if concept:
+            return concept
+
+        parent_uri = to_parent_uri(expression)
+        code = expression.replace(parent_uri, '').replace('concepts/', '').split('/')[0]
+        return dict(mnemonic=code)
+
+    def get_source(self, url):
+        return self.sources.get(url) if url else None
+
+    @staticmethod
+    def get_source_info(parent_uri, child_uri, existing_version, concept):
+        if not parent_uri and not child_uri:
+            return existing_version, get(concept, 'parent.uri')
+
+        if parent_uri:
+            version, uri = separate_version(parent_uri)
+        else:
+            version, uri = separate_version(to_parent_uri(child_uri))
+
+        return version or existing_version, uri or get(concept, 'parent.uri')
@@ -15,6 +15,8 @@ class MappingSearch(CommonSearch):
         'from_concept_source', 'to_concept_source', 'collection',
     ]
 
+    ngram_fields = ['from_concept', 'to_concept', 'concept']
+
     facets = {
         'toConceptSource': TermsFacet(field='to_concept_source'),
         'fromConceptSource': TermsFacet(field='from_concept_source'),
@@ -11,10 +11,11 @@ from core.sources.tests.factories import OrganizationSourceFactory
 def sync_latest_version(self):
     latest_version = self.get_latest_version()
     if not latest_version:
-        latest_version = self.clone()
-        latest_version.save()
         self.is_latest_version = False
         self.save()
+        latest_version = self.clone()
+        latest_version.is_latest_version = True
+        latest_version.save()
         latest_version.version = latest_version.id
         latest_version.save()
         latest_version.sources.add(latest_version.parent)
@@ -1,10 +1,13 @@
+import hashlib
+
 import factory
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 
 from core.common.constants import HEAD, CUSTOM_VALIDATION_SCHEMA_OPENMRS
 from core.common.tests import OCLTestCase
 from core.concepts.tests.factories import ConceptFactory, LocalizedTextFactory
-from core.mappings.models import Mapping
+from core.mappings.models import Mapping, MappingRelationsResolver
 from core.mappings.tests.factories import MappingFactory
 from core.orgs.models import Organization
 from core.orgs.tests.factories import OrganizationFactory
@@ -94,6 +97,41 @@ class MappingTest(OCLTestCase):
 
         self.assertEqual(mapping.get_to_source(), concept.parent)
 
+    def test_populate_source_owner_fields(self):
+        from_concept = ConceptFactory(
+            parent=OrganizationSourceFactory(mnemonic='foobar', organization=OrganizationFactory(mnemonic='org-foo'))
+        )
+        to_source = OrganizationSourceFactory(mnemonic='to-source', organization=OrganizationFactory(mnemonic='org-to'))
+        mapping = Mapping(from_concept=from_concept, to_source=to_source)
+        mapping.populate_source_owner_fields()
+
+        self.assertEqual(mapping.from_source_mnemonic, 'foobar')
+        self.assertEqual(mapping.from_owner_mnemonic, 'org-foo')
+        self.assertEqual(mapping.from_owner_type, 'Organization')
+        self.assertEqual(mapping.to_source_mnemonic, 'to-source')
+        self.assertEqual(mapping.to_owner_mnemonic, 'org-to')
+        self.assertEqual(mapping.to_owner_type, 'Organization')
+
+        mapping = Mapping(
+            from_concept_id=from_concept.id, from_source_mnemonic='foobar', from_owner_mnemonic='org-foo',
+            from_owner_type='Organization'
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(mapping.from_source_owner, 'org-foo')
+            self.assertEqual(mapping.from_source_owner_type, 'Organization')
+            self.assertEqual(mapping.from_source_shorthand, 'org-foo:foobar')
+            self.assertEqual(mapping.to_source_owner, '')
+            self.assertIsNone(mapping.to_source_name)
+            self.assertIsNone(mapping.to_source_shorthand)
+
+        mapping = Mapping(
+            to_concept_id=from_concept.id, to_concept_code='concept-foo', to_source_mnemonic='foobar',
+            to_owner_mnemonic='org-foo', to_owner_type='Organization'
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(mapping.to_source_shorthand, 'org-foo:foobar')
+            self.assertEqual(mapping.to_concept_shorthand, 'org-foo:foobar:concept-foo')
+
     def test_get_to_concept_name(self):
         mapping = Mapping()
 
@@ -146,6 +184,9 @@ class MappingTest(OCLTestCase):
         self.assertEqual(mapping.errors, {})
         self.assertIsNotNone(mapping.id)
         self.assertEqual(mapping.version, str(mapping.id))
+        self.assertEqual(mapping.from_source_mnemonic, source.mnemonic)
+        self.assertEqual(mapping.to_owner_mnemonic, source.organization.mnemonic)
+        self.assertEqual(mapping.get_latest_version().to_owner_mnemonic, source.organization.mnemonic)
         self.assertEqual(source.mappings_set.count(), 2)
         self.assertEqual(source.mappings.count(), 2)
         self.assertEqual(
@@ -194,6 +235,79 @@ class MappingTest(OCLTestCase):
             persisted_mapping.version_url, persisted_mapping.uri
         )
 
+    def test_natural_key_hash(self):
+        source = OrganizationSourceFactory(version=HEAD)
+        fields = dict(
+            parent=source, map_type='Q-AND-A', from_concept_code='c1', from_source_url=source.uri,
+            to_concept_code='A73', to_source_url='/orgs/WHO/sources/ICPC-2/'
+        )
+        mapping = MappingFactory(**fields)
+        latest_version = mapping.get_latest_version()
+
+        self.assertEqual(
+            mapping.natural_key_hash,
+            hashlib.md5('{}|{}|c1|/orgs/WHO/sources/ICPC-2/|A73'.format(source.id, source.uri).encode()).hexdigest()
+        )
+        self.assertEqual(latest_version.natural_key_hash, mapping.natural_key_hash)
+        self.assertIsNone(Mapping(parent=source, from_concept_code='c1').get_natural_key_hash())
+        self.assertEqual(
+            list(Mapping(**fields).get_natural_key_duplicates().values_list('id', flat=True)), [latest_version.id]
+        )
+        self.assertFalse(mapping.get_natural_key_duplicates().exists())
+
+        Mapping(**{**fields, 'map_type': 'SAME-AS', 'mnemonic': 'm2', 'version': 'v1'}).save()
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Mapping(**{**fields, 'mnemonic': 'm3', 'version': 'v1'}).save()
+
+        legacy_duplicate = Mapping(
+            **{**fields, 'mnemonic': 'm4', 'version': 'v1'}, is_legacy_natural_key_duplicate=True
+        )
+        legacy_duplicate.save()
+        legacy_duplicate.comment = 'saved again'
+        legacy_duplicate.save()
+
+        self.assertIsNone(legacy_duplicate.natural_key_hash)
+
+
+class MappingRelationsResolverTest(OCLTestCase):
+    def test_resolve(self):
+        source = OrganizationSourceFactory()
+        concept1 = ConceptFactory(parent=source)
+        concept2 = ConceptFactory(parent=source)
+        other_source = OrganizationSourceFactory(canonical_url='https://foo.bar/source')
+
+        resolver = MappingRelationsResolver()
+        with self.assertNumQueries(3):
+            resolver.resolve([
+                dict(from_concept_url=concept1.uri, to_concept_url=concept2.uri),
+                dict(from_concept_url=concept1.uri, to_source_url='https://foo.bar/source', to_concept_code='c3'),
+                dict(from_concept_url=source.uri + 'concepts/c4/', to_concept_url=concept2.uri),
+            ])
+
+        self.assertEqual(resolver.get_concept(concept1.uri), concept1)
+        self.assertEqual(resolver.get_concept(concept2.uri), concept2)
+        self.assertEqual(resolver.get_concept(source.uri + 'concepts/c4/'), dict(mnemonic='c4'))
+        self.assertEqual(resolver.get_source(source.uri), source)
+        self.assertEqual(resolver.get_source('https://foo.bar/source'), other_source)
+        self.assertEqual(resolver.get_source(other_source.uri), other_source)
+
+        with self.assertNumQueries(0):
+            resolver.resolve([dict(from_concept_url=concept1.uri, to_source_url=other_source.uri)])
+
+        with self.assertNumQueries(0):
+            mapping = Mapping()
+            mapping.populate_fields_from_relations(
+                dict(from_concept_url=concept1.uri, to_concept_url=concept2.uri), resolver
+            )
+
+        self.assertEqual(mapping.from_concept_id, concept1.id)
+        self.assertEqual(mapping.to_concept_id, concept2.id)
+        self.assertEqual(mapping.from_source, source)
+        self.assertEqual(mapping.to_source, source)
+        self.assertEqual(mapping.to_concept_code, concept2.mnemonic)
+
 
 class OpenMRSMappingValidatorTest(OCLTestCase):
     def setUp(self):
@@ -7,13 +7,16 @@ from rest_framework.generics import DestroyAPIView, UpdateAPIView, RetrieveAPIVi
 from rest_framework.mixins import CreateModelMixin
 from rest_framework.response import Response
 
-from core.common.constants import HEAD
+from core.common.constants import (
+    HEAD, MAPPING_LOOKUP_CONCEPTS, MAPPING_LOOKUP_FROM_CONCEPT, MAPPING_LOOKUP_TO_CONCEPT, MAPPING_LOOKUP_SOURCES,
+    MAPPING_LOOKUP_FROM_SOURCE, MAPPING_LOOKUP_TO_SOURCE)
+from core.common.db_search import get_owner_db_fields
 from core.common.exceptions import Http409
 from core.common.mixins import ListWithHeadersMixin, ConceptDictionaryMixin
 from core.common.swagger_parameters import (
     q_param, limit_param, sort_desc_param, page_param, exact_match_param, sort_asc_param, verbose_param,
     include_facets_header, updated_since_param, include_retired_param,
-    compress_header)
+    compress_header, cursor_param)
 from core.common.views import SourceChildCommonBaseView, SourceChildExtrasView, \
     SourceChildExtraRetrieveUpdateDestroyView
 from core.concepts.permissions import CanEditParentDictionary, CanViewParentDictionary
@@ -31,11 +34,11 @@ class MappingBaseView(SourceChildCommonBaseView):
     document_model = MappingDocument
     facet_class = MappingSearch
     es_fields = {
-        'id': {'sortable': True, 'filterable': True},
+        'id': {'sortable': True, 'filterable': True, 'ngram': True},
         'last_update': {'sortable': True, 'filterable': False, 'facet': False, 'default': 'desc'},
-        'concept': {'sortable': False, 'filterable': True, 'facet': False, 'exact': True},
-        'from_concept': {'sortable': False, 'filterable': True, 'facet': True, 'exact': True},
-        'to_concept': {'sortable': False, 'filterable': True, 'facet': True, 'exact': True},
+        'concept': {'sortable': False, 'filterable': True, 'facet': False, 'exact': True, 'ngram': True},
+        'from_concept': {'sortable': False, 'filterable': True, 'facet': True, 'exact': True, 'ngram': True},
+        'to_concept': {'sortable': False, 'filterable': True, 'facet': True, 'exact': True, 'ngram': True},
         'retired': {'sortable': False, 'filterable': True, 'facet': True},
         'map_type': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
         'source': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
@@ -52,6 +55,29 @@ class MappingBaseView(SourceChildCommonBaseView):
         'from_concept_owner_type': {'sortable': False, 'filterable': True, 'facet': True},
         'to_concept_owner_type': {'sortable': False, 'filterable': True, 'facet': True},
     }
+    db_search_fields = {
+        'id': 'mnemonic',
+        'last_update': 'updated_at',
+        'is_latest_version': 'is_latest_version',
+        'is_active': 'is_active',
+        'concept': ['from_concept_code', 'from_concept_name', 'to_concept_code', 'to_concept_name'],
+        'from_concept': ['from_concept_code', 'from_concept_name'],
+        'to_concept': ['to_concept_code', 'to_concept_name'],
+        'retired': 'retired',
+        'map_type': 'map_type',
+        'source': 'parent__mnemonic',
+        'collection': 'collection_set__mnemonic',
+        'concept_source': ['from_source_mnemonic', 'to_source_mnemonic'],
+        'from_concept_source': 'from_source_mnemonic',
+        'to_concept_source': 'to_source_mnemonic',
+        'concept_owner': ['from_owner_mnemonic', 'to_owner_mnemonic'],
+        'from_concept_owner': 'from_owner_mnemonic',
+        'to_concept_owner': 'to_owner_mnemonic',
+        'concept_owner_type': ['from_owner_type', 'to_owner_type'],
+        'from_concept_owner_type': 'from_owner_type',
+        'to_concept_owner_type': 'to_owner_type',
+        **get_owner_db_fields(),
+    }
 
     @staticmethod
     def get_detail_serializer(obj, data=None, files=None, partial=False):
@@ -63,6 +89,8 @@ class MappingBaseView(SourceChildCommonBaseView):
 
 class MappingListView(MappingBaseView, ListWithHeadersMixin, CreateModelMixin):
     serializer_class = MappingListSerializer
+    search_hits_enabled = True
+    response_cache_enabled = True
 
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -76,6 +104,15 @@ class MappingListView(MappingBaseView, ListWithHeadersMixin, CreateModelMixin):
 
         return MappingListSerializer
 
+    def should_serve_search_hits(self):
+        query_params = self.request.query_params
+        return super().should_serve_search_hits() and not any(
+            query_params.get(param) in ['true', True] for param in [
+                MAPPING_LOOKUP_CONCEPTS, MAPPING_LOOKUP_FROM_CONCEPT, MAPPING_LOOKUP_TO_CONCEPT,
+                MAPPING_LOOKUP_SOURCES, MAPPING_LOOKUP_FROM_SOURCE, MAPPING_LOOKUP_TO_SOURCE
+            ]
+        )
+
     def get_queryset(self, _=None):
         is_latest_version = 'collection' not in self.kwargs and 'version' not in self.kwargs
         queryset = super().get_queryset()
@@ -241,7 +278,7 @@ class MappingVersionListAllView(MappingBaseView, ListWithHeadersMixin):
         manual_parameters=[
             q_param, limit_param, sort_desc_param, sort_asc_param, exact_match_param, page_param, verbose_param,
             include_retired_param, updated_since_param,
-            include_facets_header, compress_header
+            include_facets_header, compress_header, cursor_param
         ]
     )
     def get(self, request, *args, **kwargs):
@@ -10,6 +10,7 @@ class OrganizationDocument(Document):
         name = 'organizations'
         settings = {'number_of_shards': 1, 'number_of_replicas': 0}
 
+    db_id = fields.KeywordField(attr='id')
     last_update = fields.DateField(attr='updated_at')
     public_can_view = fields.BooleanField(attr='public_can_view')
     name = fields.KeywordField(attr='name', normalizer="lowercase")
@@ -268,6 +268,8 @@ AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY', '')
 AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', 'oclapi2-dev')
 AWS_REGION_NAME = os.environ.get('AWS_REGION_NAME', 'us-east-2')
 DISABLE_VALIDATION = os.environ.get('DISABLE_VALIDATION', False)
+# sources with more concepts than this are validated against a new custom_validation_schema in background
+INLINE_CHILD_CONCEPTS_VALIDATION_LIMIT = int(os.environ.get('INLINE_CHILD_CONCEPTS_VALIDATION_LIMIT', 5000))
 API_SUPERUSER_PASSWORD = os.environ.get('API_SUPERUSER_PASSWORD', 'Root123')  # password for ocladmin superuser
 API_SUPERUSER_TOKEN = os.environ.get(
     'API_SUPERUSER_TOKEN', '891b4b17feab99f3ff7e5b5d04ccc5da7aa96da6'
@@ -296,10 +298,18 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TASK_ROUTES = {
     'core.common.tasks.handle_save': {'queue': 'indexing'},
+    'core.common.tasks.sync_indexes': {'queue': 'indexing'},
     'core.common.tasks.handle_m2m_changed': {'queue': 'indexing'},
+    'core.common.tasks.sync_memberships': {'queue': 'indexing'},
+    'core.common.tasks.delete_memberships': {'queue': 'indexing'},
     'core.common.tasks.handle_pre_delete': {'queue': 'indexing'},
     'core.common.tasks.populate_indexes': {'queue': 'indexing'},
-    'core.common.tasks.rebuild_indexes': {'queue': 'indexing'}
+    'core.common.tasks.rebuild_indexes': {'queue': 'indexing'},
+    'core.common.tasks.index_partition': {'queue': 'indexing'},
+    'core.common.tasks.swap_index_alias': {'queue': 'indexing'},
+    'core.common.tasks.export_partition': {'queue': 'concurrent'},
+    'core.common.tasks.finish_export': {'queue': 'concurrent'},
+    'core.common.tasks.abort_export': {'queue': 'concurrent'},
 }
 CELERY_RESULT_BACKEND = 'redis://%s:%s/%s' % (REDIS_HOST, REDIS_PORT, REDIS_DB)
 CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = {
@@ -324,6 +334,13 @@ ELASTICSEARCH_DSL_AUTO_REFRESH = True
 ELASTICSEARCH_DSL_AUTOSYNC = True
 ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = 'core.common.models.CelerySignalProcessor'
 ES_SYNC = True
+ES_SYNC_INTERVAL = int(os.environ.get('ES_SYNC_INTERVAL', 500))  # ms between two drains of the index sync queue
+ES_SYNC_BATCH_SIZE = int(os.environ.get('ES_SYNC_BATCH_SIZE', 2000))
+ES_REBUILD_PARTITIONS = int(os.environ.get('ES_REBUILD_PARTITIONS', 8))
+EXPORT_PARTITIONS = int(os.environ.get('EXPORT_PARTITIONS', 8))  # max parallel tasks per export
+EXPORT_PARTITION_MIN_SIZE = int(os.environ.get('EXPORT_PARTITION_MIN_SIZE', 20000))  # rows
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'elasticsearch')  # or 'postgres' for the views supporting it
+SEARCH_RESPONSE_CACHE_TTL = int(os.environ.get('SEARCH_RESPONSE_CACHE_TTL', 300))  # seconds, 0 disables the cache
 USE_X_FORWARDED_HOST = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 ENV = os.environ.get('ENVIRONMENT', 'development')
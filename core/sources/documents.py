@@ -2,6 +2,7 @@ from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
 from pydash import get
 
+from core.common.search import get_ngram_subfields
 from core.common.utils import jsonify_safe
 from core.sources.models import Source
 
@@ -12,6 +13,7 @@ class SourceDocument(Document):
         name = 'sources'
         settings = {'number_of_shards': 1, 'number_of_replicas': 0}
 
+    db_id = fields.KeywordField(attr='id')
     locale = fields.ListField(fields.KeywordField())
     last_update = fields.DateField(attr='updated_at')
     owner = fields.KeywordField(attr='parent_resource', normalizer='lowercase')
@@ -20,9 +22,9 @@ class SourceDocument(Document):
     source_type = fields.KeywordField(attr='source_type', normalizer='lowercase')
     is_active = fields.KeywordField(attr='is_active')
     version = fields.KeywordField(attr='version')
-    name = fields.KeywordField(attr='name', normalizer='lowercase')
+    name = fields.KeywordField(attr='name', normalizer='lowercase', fields=get_ngram_subfields())
     canonical_url = fields.KeywordField(attr='canonical_url', normalizer='lowercase')
-    mnemonic = fields.KeywordField(attr='mnemonic', normalizer='lowercase')
+    mnemonic = fields.KeywordField(attr='mnemonic', normalizer='lowercase', fields=get_ngram_subfields())
     extras = fields.ObjectField()
     identifier = fields.ObjectField()
     jurisdiction = fields.ObjectField()
@@ -106,10 +106,8 @@ class Source(ConceptContainerModel):
     def update_mappings(self):
         from core.mappings.models import Mapping
         uris = compact([self.uri, self.canonical_url])
-        for mapping in Mapping.objects.filter(to_source__isnull=True, to_source_url__in=uris):
-            mapping.to_source = self
-            mapping.save()
-
-        for mapping in Mapping.objects.filter(from_source__isnull=True, from_source_url__in=uris):
-            mapping.from_source = self
-            mapping.save()
+        mapping_ids = [
+            *Mapping.link_dangling('to_source', self, uris),
+            *Mapping.link_dangling('from_source', self, uris),
+        ]
+        Mapping.batch_index(mapping_ids)
@@ -9,6 +9,8 @@ class SourceSearch(CommonSearch):
     doc_types = [Source]
     fields = ['source_type', 'locale', 'owner', 'owner_type', 'is_active', 'version']
 
+    ngram_fields = ['name', 'mnemonic']
+
     facets = {
         'sourceType': TermsFacet(field='source_type'),
         'locale': TermsFacet(field='locale'),
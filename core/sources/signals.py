@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
+from core.concepts.models import Concept
+from core.concepts.validators import ReferenceValuesCache
 from core.sources.models import Source
 
 
@@ -11,3 +13,29 @@ def propagate_parent_attributes(sender, instance=None, created=False, **kwargs):
         instance.concepts_set.exclude(public_access=instance.public_access).update(public_access=instance.public_access)
         instance.mappings_set.exclude(is_active=instance.is_active).update(is_active=instance.is_active)
         instance.mappings_set.exclude(public_access=instance.public_access).update(public_access=instance.public_access)
+
+
+@receiver(post_save, sender=Source)
+@receiver(post_delete, sender=Source)
+@receiver(post_save, sender=Concept)
+@receiver(post_delete, sender=Concept)
+def invalidate_reference_values(sender, instance=None, **kwargs):  # pylint: disable=unused-argument
+    if instance:
+        ReferenceValuesCache.invalidate_for(instance)
+
+
+@receiver(m2m_changed, sender=Concept.names.through)
+def invalidate_reference_values_on_names_change(
+        sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs
+):  # pylint: disable=unused-argument
+    if not instance or action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
+    if not reverse:
+        ReferenceValuesCache.invalidate_for(instance)
+    elif action == 'post_clear':
+        # the concepts of a cleared name are gone from the through table by now
+        ReferenceValuesCache.invalidate()
+    elif pk_set:
+        for concept in Concept.objects.filter(id__in=pk_set).only('id', 'parent_id'):
+            ReferenceValuesCache.invalidate_for(concept)
@@ -1,10 +1,12 @@
 from django.db import transaction, IntegrityError
 from mock import patch, Mock
 
-from core.common.constants import HEAD
+from core.common.constants import HEAD, CUSTOM_VALIDATION_SCHEMA_OPENMRS
 from core.common.tasks import seed_children
 from core.common.tests import OCLTestCase
-from core.concepts.tests.factories import ConceptFactory
+from core.concepts.constants import OPENMRS_FULLY_SPECIFIED_NAME_UNIQUE_PER_SOURCE_LOCALE
+from core.concepts.tests.factories import ConceptFactory, LocalizedTextFactory
+from core.mappings.models import Mapping
 from core.mappings.tests.factories import MappingFactory
 from core.sources.models import Source
 from core.sources.tests.factories import OrganizationSourceFactory
@@ -359,6 +361,76 @@ class SourceTest(OCLTestCase):
         source.refresh_from_db()
         self.assertEqual(source._background_process_ids, ['123', '123', 'abc'])  # pylint: disable=protected-access
 
+    @patch('core.mappings.models.Mapping.batch_index')
+    def test_update_mappings(self, batch_index_mock):
+        source = OrganizationSourceFactory(canonical_url='http://some/canonical/url')
+        mapping1 = MappingFactory(to_source_url=source.uri)
+        mapping2 = MappingFactory(from_source_url=source.canonical_url)
+        mapping3 = MappingFactory(to_source_url='/orgs/foo/sources/bar/')
+
+        source.update_mappings()
+
+        mapping1.refresh_from_db()
+        mapping2.refresh_from_db()
+        mapping3.refresh_from_db()
+        self.assertEqual(mapping1.to_source, source)
+        self.assertIsNone(mapping1.from_source)
+        self.assertEqual(mapping2.from_source, source)
+        self.assertIsNone(mapping2.to_source)
+        self.assertIsNone(mapping3.to_source)
+        batch_index_mock.assert_called_once()
+        self.assertEqual(
+            sorted(batch_index_mock.call_args[0][0]),
+            sorted(Mapping.objects.filter(
+                versioned_object_id__in=[mapping1.id, mapping2.id]).values_list('id', flat=True))
+        )
+
+    def test_validate_child_concepts(self):
+        self.create_lookup_concept_classes()
+        source = OrganizationSourceFactory(version=HEAD)
+        concept1 = ConceptFactory(
+            parent=source, names=[LocalizedTextFactory(name='Malaria', locale_preferred=True)]
+        )
+        concept2 = ConceptFactory(
+            parent=source, names=[LocalizedTextFactory(name='Malaria', locale_preferred=True)]
+        )
+        ConceptFactory(parent=source, names=[LocalizedTextFactory(name='Fever', locale_preferred=True)])
+        source.custom_validation_schema = CUSTOM_VALIDATION_SCHEMA_OPENMRS
+        notify_progress = Mock()
+
+        failed_concept_validations = source.validate_child_concepts(notify_progress)
+
+        self.assertEqual(
+            sorted([failed['mnemonic'] for failed in failed_concept_validations]),
+            sorted([concept1.mnemonic, concept2.mnemonic])
+        )
+        self.assertEqual(
+            failed_concept_validations[0]['errors'],
+            dict(names=[
+                OPENMRS_FULLY_SPECIFIED_NAME_UNIQUE_PER_SOURCE_LOCALE + ': Malaria (locale: en, preferred: yes)'
+            ])
+        )
+        notify_progress.assert_called_once_with(3, 3)
+
+    @patch('core.common.models.update_validation_schema')
+    def test_persist_changes_validates_large_source_in_background(self, update_validation_schema_mock):
+        source = OrganizationSourceFactory(version=HEAD)
+        ConceptFactory(parent=source)
+        ConceptFactory(parent=source)
+        source.custom_validation_schema = CUSTOM_VALIDATION_SCHEMA_OPENMRS
+
+        with self.settings(INLINE_CHILD_CONCEPTS_VALIDATION_LIMIT=1):
+            errors = Source.persist_changes(source, self.user)
+
+        self.assertEqual(errors, {})
+        self.assertIsNotNone(source.validation_task_id)
+        source.refresh_from_db()
+        self.assertIsNone(source.custom_validation_schema)
+        self.assertTrue(source.has_processing(source.validation_task_id))
+        update_validation_schema_mock.apply_async.assert_called_once_with(
+            (source.id, CUSTOM_VALIDATION_SCHEMA_OPENMRS), task_id=source.validation_task_id
+        )
+
 
 class TasksTest(OCLTestCase):
     def test_seed_children_task(self):
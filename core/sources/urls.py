@@ -64,6 +64,11 @@ urlpatterns = [
         views.SourceVersionSummaryView.as_view(),
         name='source-version-summary'
     ),
+    re_path(
+        r'^(?P<source>{pattern})/(?P<version>{pattern})/diff/$'.format(pattern=NAMESPACE_PATTERN),
+        views.SourceVersionConceptsDiffView.as_view(),
+        name='source-version-diff'
+    ),
     re_path(
         r"^(?P<source>{pattern})/extras/(?P<extra>{pattern})/$".format(pattern=NAMESPACE_PATTERN),
         views.SourceExtraRetrieveUpdateDestroyView.as_view(),
@@ -20,10 +20,12 @@ from core.common.mixins import ListWithHeadersMixin, ConceptDictionaryCreateMixi
 from core.common.permissions import CanViewConceptDictionary, CanEditConceptDictionary, HasAccessToVersionedObject, \
     CanViewConceptDictionaryVersion
 from core.common.swagger_parameters import q_param, limit_param, sort_desc_param, sort_asc_param, exact_match_param, \
-    page_param, verbose_param, include_retired_param, updated_since_param, include_facets_header, compress_header
+    page_param, verbose_param, include_retired_param, updated_since_param, include_facets_header, compress_header, \
+    diff_from_param, cursor_param
 from core.common.tasks import export_source
 from core.common.utils import parse_boolean_query_param, compact_dict_by_values
 from core.common.views import BaseAPIView, BaseLogoView
+from core.concepts.diff import ConceptVersionsDiff
 from core.sources.constants import DELETE_FAILURE, DELETE_SUCCESS, VERSION_ALREADY_EXISTS
 from core.sources.documents import SourceDocument
 from core.sources.models import Source
@@ -82,8 +84,8 @@ class SourceListView(SourceBaseView, ConceptDictionaryCreateMixin, ListWithHeade
     is_searchable = True
     es_fields = {
         'source_type': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
-        'mnemonic': {'sortable': True, 'filterable': True, 'exact': True},
-        'name': {'sortable': True, 'filterable': True, 'exact': True},
+        'mnemonic': {'sortable': True, 'filterable': True, 'exact': True, 'ngram': True},
+        'name': {'sortable': True, 'filterable': True, 'exact': True, 'ngram': True},
         'last_update': {'sortable': True, 'filterable': False, 'default': 'desc'},
         'locale': {'sortable': False, 'filterable': True, 'facet': True},
         'owner': {'sortable': True, 'filterable': True, 'facet': True, 'exact': True},
@@ -106,7 +108,7 @@ class SourceListView(SourceBaseView, ConceptDictionaryCreateMixin, ListWithHeade
     @swagger_auto_schema(
         manual_parameters=[
             q_param, limit_param, sort_desc_param, sort_asc_param, exact_match_param, page_param, verbose_param,
-            include_retired_param, updated_since_param, include_facets_header, compress_header
+            include_retired_param, updated_since_param, include_facets_header, compress_header, cursor_param
         ]
     )
     def get(self, request, *args, **kwargs):
@@ -367,10 +369,12 @@ class SourceVersionExportView(ConceptContainerExportMixin, SourceVersionBaseView
     permission_classes = (CanViewConceptDictionary,)
     serializer_class = SourceVersionExportSerializer
 
-    def handle_export_version(self):
+    def handle_export_version(self, base_version=None):
         version = self.get_object()
         try:
-            export_source.apply_async((version.id, ), queue='concurrent')
+            export_source.apply_async(
+                (version.id, base_version.id) if base_version else (version.id, ), queue='concurrent'
+            )
             return status.HTTP_202_ACCEPTED
         except AlreadyQueued:
             return status.HTTP_409_CONFLICT
@@ -392,6 +396,31 @@ class SourceVersionSummaryView(SourceVersionBaseView, RetrieveAPIView):
         return get_object_or_404(self.get_queryset())
 
 
+class SourceVersionConceptsDiffView(SourceVersionBaseView, RetrieveAPIView):
+    permission_classes = (CanViewConceptDictionary,)
+
+    def get_object(self, queryset=None):
+        return get_object_or_404(self.get_queryset())
+
+    @swagger_auto_schema(manual_parameters=[diff_from_param])
+    def get(self, request, *args, **kwargs):
+        from_version = request.query_params.get('from', None)
+        if not from_version:
+            return Response(dict(detail='from version is required.'), status=status.HTTP_400_BAD_REQUEST)
+
+        version = self.get_object()
+        base_version = version.versions.filter(version=from_version).first()
+        if not base_version:
+            raise Http404()
+
+        return Response(
+            dict(
+                from_version=base_version.version, to_version=version.version,
+                concepts=ConceptVersionsDiff.for_containers(base_version, version)
+            )
+        )
+
+
 class SourceLatestVersionSummaryView(SourceVersionBaseView, RetrieveAPIView, UpdateAPIView):
     serializer_class = SourceVersionSummaryDetailSerializer
     permission_classes = (CanViewConceptDictionary,)
@@ -50,6 +50,7 @@ urlpatterns = [
     path('orgs/', include('core.orgs.urls'), name='orgs_url'),
     path('sources/', include('core.sources.urls'), name='sources_url'),
     path('collections/', include('core.collections.urls'), name='collections_urls'),
+    path('concepts/$lookup/', concept_views.ConceptLookupView.as_view(), name='all_concepts_lookup_url'),
     path('concepts/', concept_views.ConceptVersionListAllView.as_view(), name='all_concepts_urls'),
     path('mappings/', mapping_views.MappingVersionListAllView.as_view(), name='all_mappings_urls'),
     path('importers/', include('core.importers.urls'), name='importer_urls'),